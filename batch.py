@@ -0,0 +1,157 @@
+''' batch.py
+
+Non-interactive counterpart of main.py for server runs. Each input path
+file (.dat, .npy or a .py defining user_function()) is transformed, the
+control field is solved with PathToField and the noise is analyzed with
+NoiseAnalyser. Neither tkinter nor matplotlib is imported.
+
+Results of input file <name>.<ext> are saved by DataContainer.save to
+<outdir>/<name>.npz and can be read back with DataContainer.load. The
+state at every time point is only saved with --states.
+
+With --checkpoint N, the solve of <name>.<ext> is checkpointed to
+<outdir>/<name>.ckpt every N steps. A run that finds this file (e.g.
+after being preempted) resumes the solve from its last checkpoint. The
+file is removed once the results are saved.
+
+Progress of the solves is shown as tqdm bars by default. With
+--progress log it is logged instead (every 1000 steps, at most every
+10 s), and --progress none turns it off.
+
+With --profile, the hot path of each solve is profiled (see
+profiler.Profiler) and the timings are written as JSON to
+<outdir>/<name>.profile.json.
+
+Usage::
+
+    python batch.py path1.dat path2.py ... [--outdir results]
+        [--processors 4] [--noise-processors 1] [--numfield 8]
+        [--variance 0.01] [--no-noise] [--states] [--m 8]
+        [--checkpoint 1000] [--progress {tqdm,log,none}] [--profile]
+
+'''
+import sys, os
+import argparse
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'modules'))
+
+
+def run_file(filename, outdir, numfield, variance, noise_processors, states,
+             m=None, checkpoint=0, progress='tqdm', profile=False):
+    """Run the pipeline of main.py on one path file and save the results.
+
+    Returns
+    -------
+    out : str
+        Filename of the saved results.
+
+    """
+    # imported here so that the command line is parsed without loading
+    # the numerical modules
+    from loadPath import load_path
+    from dataContainer import DataContainer
+    import solvers
+    from molecule import Rotor
+    from noiseAnalyzer import NoiseAnalyser
+    import observers
+    from profiler import Profiler
+
+    name = os.path.splitext(os.path.basename(filename))[0]
+    ckpt = os.path.join(outdir, name + '.ckpt')
+    data = DataContainer(load_path(filename))
+    observer = {'tqdm': observers.TqdmObserver,
+                'log': observers.LoggingObserver,
+                'none': observers.NullObserver}[progress]()
+    s = solvers.PathToField(data.path_desired, data.dt_atomic, Rotor(m),
+                            observer=observer)
+    profiler = Profiler()
+    if profile:
+        profiler.enable()
+    resumed = False
+    if checkpoint and os.path.exists(ckpt):
+        try:
+            s.resume(ckpt, interval=checkpoint)
+            resumed = True
+        except ValueError:
+            # no complete checkpoint in the file, start over
+            pass
+    if checkpoint and not resumed:
+        s.solve(checkpoint=ckpt, interval=checkpoint)
+    elif not checkpoint:
+        s.solve()
+    if profile:
+        profiler.disable()
+        with open(os.path.join(outdir, name + '.profile.json'), 'w') as fout:
+            fout.write(profiler.to_json(indent=1))
+    data.t, data.field, data.path_actual, data.state = s.export()
+    if numfield > 0:
+        myNA = NoiseAnalyser(data.field, data.dt_atomic, variance=variance,
+                             numfield=numfield, processors=noise_processors, m=m)
+        data.noise_stat_mean, data.noise_stat_var = myNA.analyze()
+
+    if not states:
+        data.state = None
+    out = os.path.join(outdir, name + '.npz')
+    data.save(out)
+    if checkpoint:
+        os.remove(ckpt)
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Solve control fields for path files without a GUI.")
+    parser.add_argument('paths', nargs='+',
+                        help="path files (.dat, .npy or .py with user_function())")
+    parser.add_argument('--outdir', default='.',
+                        help="directory to write <name>.npz results to")
+    parser.add_argument('--processors', type=int, default=1,
+                        help="number of path files solved in parallel")
+    parser.add_argument('--noise-processors', type=int, default=1,
+                        help="number of processes used by each NoiseAnalyser")
+    parser.add_argument('--numfield', type=int, default=8,
+                        help="number of noisy fields per path")
+    parser.add_argument('--variance', type=float, default=0.01,
+                        help="variance of the noise of the fields")
+    parser.add_argument('--no-noise', dest='numfield', action='store_const',
+                        const=0, help="skip the noise analysis")
+    parser.add_argument('--states', action='store_true',
+                        help="also save the state at every time point")
+    parser.add_argument('--m', type=int, default=None,
+                        help="maximum energy quantum number of the rotor "
+                             "(default: constants.m)")
+    parser.add_argument('--checkpoint', type=int, default=0, metavar='N',
+                        help="checkpoint each solve every N steps to "
+                             "<outdir>/<name>.ckpt and resume from it")
+    parser.add_argument('--progress', choices=('tqdm', 'log', 'none'),
+                        default='tqdm',
+                        help="report the progress of the solves as tqdm "
+                             "bars, log records or not at all")
+    parser.add_argument('--profile', action='store_true',
+                        help="write timings of the solver hot path to "
+                             "<outdir>/<name>.profile.json")
+    args = parser.parse_args(argv)
+    if args.progress == 'log':
+        import logging
+        logging.basicConfig(level=logging.INFO,
+                            format="%(asctime)s %(message)s")
+
+    names = [os.path.splitext(os.path.basename(p))[0] for p in args.paths]
+    if len(set(names)) != len(names):
+        parser.error("input files must have distinct names")
+    os.makedirs(args.outdir, exist_ok=True)
+    jobs = [(p, args.outdir, args.numfield, args.variance,
+             args.noise_processors, args.states, args.m, args.checkpoint,
+             args.progress, args.profile)
+            for p in args.paths]
+    if args.processors == 1 or len(jobs) == 1:
+        outs = [run_file(*job) for job in jobs]
+    else:
+        from joblib import Parallel, delayed
+        outs = Parallel(n_jobs=args.processors)(
+            delayed(run_file)(*job) for job in jobs)
+    for out in outs:
+        print(out)
+
+
+if __name__ == '__main__':
+    main()
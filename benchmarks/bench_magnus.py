@@ -0,0 +1,70 @@
+'''Benchmark of accuracy versus cost of the FieldToPath integrators for
+a smooth time-dependent field.
+
+The field is a rotating pulse with a sin^2 envelope over two rotor
+periods. For a range of numbers of time points, the path is solved with
+the field held constant over each step ('fixed') and with 4th order
+Magnus steps ('magnus4'). The error is measured against 'magnus4' on a
+grid 16 times finer.
+
+Usage::
+
+    python benchmarks/bench_magnus.py [propagator]
+
+where `propagator` is the Rotor propagator used by both integrators
+(default 'exact').
+
+'''
+
+import sys
+import time
+from os.path import dirname, abspath, join
+sys.path.append(join(dirname(dirname(abspath(__file__))), "modules"))
+sys.path.append(join(dirname(dirname(abspath(__file__))), "tests"))
+import numpy as np
+import constants as const
+import solvers as s
+from molecule import Rotor
+from helpers import PULSE_DURATION, rotating_pulse
+
+#: list; Numbers of time points of the benchmarked grids
+POINTS = [100, 200, 400, 800, 1600]
+#: int; Refinement of the reference grid
+REFINE = 16
+#: float; Duration of the pulse in atomic units
+T_FINAL = PULSE_DURATION
+
+
+def pulse(t):
+    """Rotating field with a sin^2 envelope, in V/angstrom."""
+    return rotating_pulse(t, amplitude=0.0005)
+
+
+def run(n, integrator, propagator):
+    """Solve on n time points and return wall time and path."""
+    dt = T_FINAL / n
+    fields = pulse(np.arange(n)*dt)
+    solver = s.FieldToPath(fields, dt, Rotor(const.m, propagator=propagator),
+                           integrator=integrator)
+    start = time.perf_counter()
+    solver.solve()
+    elapsed = time.perf_counter() - start
+    _, path, _ = solver.export()
+    return elapsed, path
+
+
+def main(propagator='exact'):
+    print("{:<10}{:>8}{:>12}{:>12}".format("method", "points", "time [s]",
+                                          "path err"))
+    for n in POINTS:
+        _, reference = run(REFINE*n, 'magnus4', propagator)
+        reference = reference[::REFINE]
+        for integrator in ('fixed', 'magnus4'):
+            elapsed, path = run(n, integrator, propagator)
+            err = np.abs(path - reference).max()
+            print("{:<10}{:>8}{:>12.3f}{:>12.2e}".format(integrator, n,
+                                                        elapsed, err))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,184 @@
+'''Benchmark of the stages of the main.py pipeline, run headless.
+
+Each stage (transform_path, timed as the DataContainer that runs it,
+PathToField.solve, PathToField.export, NoiseAnalyser.analyze and
+Visualization) is timed separately over a
+sweep of path sources, path lengths, `m` and `numfield`. Wall time,
+peak memory traced by tracemalloc and time points per second are
+reported per stage as JSON, one record per stage and configuration.
+
+Usage::
+
+    python benchmarks/bench_pipeline.py [--sources circle spiral]
+        [--n 200 1000] [--m 8] [--numfield 8] [--processors 2]
+        [--repeat 1] [--no-visualization] [--out results.json]
+
+Path sources are 'circle', a synthetic circle, and the example user
+functions in tests: 'spiral' (example_user_function.py) and
+'spiral_long' (example_user_function_long.py). The transformed path
+is truncated to `n` points before solving.
+
+The `m` sweep applies to PathToField; NoiseAnalyser and Visualization
+use constants.m, and Visualization is skipped for other values.
+
+Peak memory only covers allocations of this process; memory used by
+the NoiseAnalyser worker processes is not included.
+
+'''
+
+import sys
+import os
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from importlib import util
+from os.path import dirname, abspath, join
+sys.path.append(join(dirname(dirname(abspath(__file__))), "modules"))
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import constants as const
+import solvers
+from molecule import Rotor
+from dataContainer import DataContainer
+from noiseAnalyzer import NoiseAnalyser
+from visualization import Visualization
+
+TESTS = join(dirname(dirname(abspath(__file__))), "tests")
+
+
+def circle_path():
+    """Synthetic path: a circle of radius 0.2 through the origin."""
+    t = np.linspace(0, 2*np.pi, 500)
+    return 0.2*np.stack((np.cos(t) - 1, np.sin(t)), axis=1)
+
+
+def user_function_path(fname):
+    """Path returned by user_function() in a file of tests."""
+    spec = util.spec_from_file_location(fname[:-3], join(TESTS, fname))
+    mod = util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    coords = np.array(mod.user_function(), dtype=float)
+    return coords - coords[0]
+
+
+#: dict; Functions returning raw (untransformed) paths, keyed by name
+SOURCES = {'circle': circle_path,
+           'spiral': lambda: user_function_path('example_user_function.py'),
+           'spiral_long':
+               lambda: user_function_path('example_user_function_long.py')}
+
+
+def measure(func, *args):
+    """Call func(*args) and return its result, wall time in seconds
+    and peak traced memory in bytes.
+
+    Tracing is started and stopped around each call, which resets the
+    peak (tracemalloc.reset_peak needs python 3.9).
+
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def visualize(data, folder):
+    """Draw and save all figures of main.py."""
+    vis = Visualization(data)
+    vis.trajectory(out=join(folder, 'trajectory.png'))
+    vis.fields(out=join(folder, 'fields.png'))
+    vis.density(out=join(folder, 'density.png'))
+    vis.noise_variance(out=join(folder, 'noise_variance.png'))
+    plt.close('all')
+
+
+def run_pipeline(raw, n, m, numfield, processors, visualization):
+    """Run all stages once and return {stage: (wall time, peak memory,
+    number of time points)}.
+
+    """
+    stages = {}
+    data, elapsed, peak = measure(DataContainer, raw)
+    stages['transform_path'] = (elapsed, peak, data.n)
+
+    path, dt = data.path_desired[:n], data.dt_atomic
+    data.path_desired = path
+    data.n = len(path)
+    solver = solvers.PathToField(path, dt, Rotor(m))
+    _, elapsed, peak = measure(solver.solve)
+    stages['PathToField.solve'] = (elapsed, peak, len(path))
+    (data.t, data.field, data.path_actual, data.state), elapsed, peak = \
+        measure(solver.export)
+    stages['PathToField.export'] = (elapsed, peak, len(path))
+
+    analyser = NoiseAnalyser(data.field, dt, variance=0.01,
+                             numfield=numfield, processors=processors)
+    (data.noise_stat_mean, data.noise_stat_var), elapsed, peak = \
+        measure(analyser.analyze)
+    stages['NoiseAnalyser.analyze'] = (elapsed, peak, len(path)*numfield)
+
+    # Visualization reads m from constants
+    if visualization and m == const.m:
+        with tempfile.TemporaryDirectory() as folder:
+            _, elapsed, peak = measure(visualize, data, folder)
+        stages['Visualization'] = (elapsed, peak, len(path))
+    return stages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sources', nargs='+', default=['circle', 'spiral'],
+                        choices=sorted(SOURCES))
+    parser.add_argument('--n', nargs='+', type=int, default=[200, 1000],
+                        help='number of time points solved')
+    parser.add_argument('--m', nargs='+', type=int, default=[const.m])
+    parser.add_argument('--numfield', nargs='+', type=int, default=[8])
+    parser.add_argument('--processors', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='runs per configuration, the fastest is kept')
+    parser.add_argument('--no-visualization', dest='visualization',
+                        action='store_false')
+    parser.add_argument('--out', default=None,
+                        help='write JSON to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    records = []
+    for source in args.sources:
+        raw = SOURCES[source]()
+        for n in args.n:
+            for m in args.m:
+                for numfield in args.numfield:
+                    runs = [run_pipeline(raw, n, m, numfield, args.processors,
+                                         args.visualization)
+                            for r in range(args.repeat)]
+                    for stage in runs[0]:
+                        elapsed, peak, steps = min(run[stage] for run in runs)
+                        records.append({'source': source, 'n': n, 'm': m,
+                                        'numfield': numfield, 'stage': stage,
+                                        'wall_time_s': elapsed,
+                                        'peak_memory_bytes': peak,
+                                        'steps_per_s': steps / elapsed})
+    result = {'python': platform.python_version(),
+              'numpy': np.__version__,
+              'processors': args.processors,
+              'records': records}
+    if args.out is None:
+        json.dump(result, sys.stdout, indent=1)
+        sys.stdout.write('\n')
+    else:
+        with open(args.out, 'w') as fout:
+            json.dump(result, fout, indent=1)
+
+
+if __name__ == '__main__':
+    main()
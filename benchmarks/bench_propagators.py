@@ -0,0 +1,64 @@
+'''Benchmark of the molecule.Rotor propagators against the matrix 
+exponential on the sigmoid test cases in tests/testdata_solver.
+
+Usage::
+
+    python benchmarks/bench_propagators.py [n]
+
+where `n` is the number of time points to solve (default 2000).
+
+'''
+
+import sys
+import time
+from os.path import dirname, abspath, join
+sys.path.append(join(dirname(dirname(abspath(__file__))), "modules"))
+import numpy as np
+import constants as const
+import solvers as s
+from molecule import Rotor
+
+DATA = join(dirname(dirname(abspath(__file__))), "tests", "testdata_solver")
+
+#: list; (propagator, substeps) pairs to benchmark, reference first
+CASES = [('expm', 1), ('exact', 1), ('split', 1), ('split', 4), ('krylov', 1)]
+
+
+def load_case(n):
+    """Load the first `n` points of the sigmoid path and its fields."""
+    fields = np.genfromtxt(join(DATA, 'fields_real_for_sigmoid_path.txt'),
+                           dtype=float, delimiter=',', max_rows=n)
+    path = np.genfromtxt(join(DATA, 'sigmoid_path.txt'),
+                         dtype=float, delimiter=',', max_rows=n)
+    dt = 100 / const.B / 100000
+    return fields, path, dt
+
+
+def run(solver):
+    """Solve and return wall time and exported results."""
+    start = time.perf_counter()
+    solver.solve()
+    elapsed = time.perf_counter() - start
+    return elapsed, solver.export()
+
+
+def main(n=2000):
+    fields, path, dt = load_case(n)
+    print("{:<8}{:>9}{:>12}{:>12}{:>12}{:>12}".format(
+        "method", "substeps", "F2P [s]", "F2P err", "P2F [s]", "P2F err"))
+    reference = None
+    for name, substeps in CASES:
+        rotor = Rotor(const.m, propagator=name, substeps=substeps)
+        t_f2p, (_, f2p_path, _) = run(s.FieldToPath(fields, dt, rotor))
+        rotor = Rotor(const.m, propagator=name, substeps=substeps)
+        t_p2f, (_, _, p2f_path, _) = run(s.PathToField(path, dt, rotor))
+        if reference is None:
+            reference = f2p_path, p2f_path
+        err_f2p = np.abs(f2p_path - reference[0]).max()
+        err_p2f = np.abs(p2f_path - reference[1]).max()
+        print("{:<8}{:>9}{:>12.3f}{:>12.2e}{:>12.3f}{:>12.2e}".format(
+            name, substeps, t_f2p, err_f2p, t_p2f, err_p2f))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,69 @@
+'''Benchmark of the time needed to import the modules in a fresh
+interpreter, as paid by every joblib worker process.
+
+For each module the import is timed in new python processes, both in
+total and on top of an already imported numpy, and the heavy optional
+dependencies that got loaded with it are listed.
+
+Usage::
+
+    python benchmarks/bench_startup.py [repeat] [module ...]
+
+where `repeat` is the number of fresh interpreters per module (default
+5, the median is reported).
+
+'''
+
+import sys
+import json
+import subprocess
+from os.path import dirname, abspath, join
+
+MODULES_DIR = join(dirname(dirname(abspath(__file__))), "modules")
+
+#: list; Modules timed by default
+MODULES = ['functions', 'molecule', 'solvers', 'noiseAnalyzer', 'transform',
+           'dataContainer', 'loadPath']
+
+#: tuple; Dependencies that should only be loaded on first use
+HEAVY = ('scipy', 'tqdm', 'joblib', 'pandas', 'matplotlib', 'tkinter')
+
+SCRIPT = '''
+import sys, time, json
+sys.path.append({modules_dir!r})
+start = time.perf_counter()
+import numpy
+numpy_done = time.perf_counter()
+import {module}
+end = time.perf_counter()
+print(json.dumps([end - start, end - numpy_done,
+                  [m for m in {heavy!r} if m in sys.modules]]))
+'''
+
+
+def time_import(module, repeat):
+    """Return median total and module-only import times in seconds and
+    the heavy dependencies loaded by importing `module`.
+
+    """
+    script = SCRIPT.format(modules_dir=MODULES_DIR, module=module,
+                           heavy=HEAVY)
+    runs = [json.loads(subprocess.check_output([sys.executable, '-c', script]))
+            for r in range(repeat)]
+    total = sorted(run[0] for run in runs)[repeat // 2]
+    own = sorted(run[1] for run in runs)[repeat // 2]
+    return total, own, runs[0][2]
+
+
+def main(repeat=5, *modules):
+    modules = modules or MODULES
+    print("{:<16}{:>12}{:>16}  {}".format(
+        "module", "total [ms]", "w/o numpy [ms]", "heavy dependencies loaded"))
+    for module in modules:
+        total, own, heavy = time_import(module, int(repeat))
+        print("{:<16}{:>12.1f}{:>16.1f}  {}".format(
+            module, 1e3*total, 1e3*own, ", ".join(heavy) or "-"))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
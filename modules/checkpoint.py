@@ -0,0 +1,180 @@
+'''Periodic checkpoints of a molecule during a long solve, so that the
+solve can be resumed after it was interrupted.
+
+A checkpoint file is append-only. It is a sequence of records, each an
+uncompressed .npz archive preceded by its length in bytes. A record
+holds the solver step to continue from, the current time, field and
+state of the molecule, and the history records added since the
+previous checkpoint, so the cost of a checkpoint does not grow with
+the length of the solve. A record that was cut short (e.g. by the
+process being killed while writing) is ignored and overwritten on
+resume.
+
+'''
+
+import io
+import os
+import contextlib
+import struct
+import numpy as np
+
+#: struct format of the length prefix of a record
+_PREFIX = struct.Struct('<Q')
+
+
+class Checkpoint(object):
+    """Writer and reader of the checkpoints of a molecule.molecule.Rotor
+    in a solver.
+
+    Parameters
+    ----------
+    filename: str
+        Checkpoint file.
+
+    interval: int, optional (default=1000)
+        Number of solver steps between two checkpoints.
+
+    Attributes
+    ----------
+    filename: str
+        Checkpoint file.
+
+    interval: int
+        Number of solver steps between two checkpoints.
+
+    """
+
+    def __init__(self, filename, interval=1000):
+        if interval < 1:
+            raise ValueError("Expect interval to be a positive integer.")
+        ## Checkpoint file
+        self.filename = filename
+        ## Number of solver steps between two checkpoints
+        self.interval = int(interval)
+        # history records (stored per channel) already in the file
+        self._saved = {}
+
+    def due(self, step):
+        """Return True if a checkpoint is due after `step` steps."""
+        return step % self.interval == 0
+
+    def start(self, step, molecule):
+        """Start a new checkpoint file with the complete current
+        history of the molecule.
+
+        The first record is written to a temporary file that then 
+        replaces `filename`, so an interruption never leaves a file 
+        without a complete checkpoint behind.
+
+        Parameters
+        ----------
+        step: int
+            Solver step to continue from.
+
+        molecule: Rotor object
+            Molecule of the solver.
+
+        """
+        self._saved = dict.fromkeys(molecule.history, 0)
+        temporary = self.filename + '.tmp'
+        try:
+            with open(temporary, 'wb') as fout:
+                self._write(fout, step, molecule)
+        except BaseException:
+            # the temporary file may not have been created
+            with contextlib.suppress(OSError):
+                os.remove(temporary)
+            raise
+        os.replace(temporary, self.filename)
+
+    def save(self, step, molecule):
+        """Append a checkpoint with the history added since the last
+        one.
+
+        Parameters
+        ----------
+        step: int
+            Solver step to continue from.
+
+        molecule: Rotor object
+            Molecule of the solver.
+
+        """
+        with open(self.filename, 'ab') as fout:
+            self._write(fout, step, molecule)
+
+    def _write(self, fout, step, molecule):
+        """Write a record with the history added since the last one to 
+        an open file and flush it to disk."""
+        history = molecule.history
+        arrays = {'step': step, 'time': molecule.time,
+                  'field': np.asarray(molecule.field),
+                  'state': molecule.state.value,
+                  'm_active': getattr(molecule, 'm_active', molecule.m)}
+        for channel, (pushed, stored) in history.counts().items():
+            arrays['rows_' + channel] = history[channel][self._saved[channel]:]
+            arrays['pushed_' + channel] = pushed
+            self._saved[channel] = stored
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        record = buffer.getvalue()
+        fout.write(_PREFIX.pack(len(record)) + record)
+        fout.flush()
+        os.fsync(fout.fileno())
+
+    def load(self, molecule):
+        """Restore the molecule from the last complete checkpoint.
+
+        The history of the molecule is replaced by the recorded one,
+        and later checkpoints are appended after the last complete
+        record.
+
+        Parameters
+        ----------
+        molecule: Rotor object
+            Molecule of a solver set up like the checkpointed one.
+
+        Returns
+        -------
+        step: int
+            Solver step to continue from.
+
+        Raises
+        ------
+        ValueError:
+            If the file holds no complete checkpoint.
+
+        """
+        rows, last, end = {}, None, 0
+        with open(self.filename, 'rb') as fin:
+            while True:
+                prefix = fin.read(_PREFIX.size)
+                if len(prefix) < _PREFIX.size:
+                    break
+                size, = _PREFIX.unpack(prefix)
+                record = fin.read(size)
+                if len(record) < size:
+                    break
+                last = dict(np.load(io.BytesIO(record)))
+                end = fin.tell()
+                for key in last:
+                    if key.startswith('rows_'):
+                        rows.setdefault(key[5:], []).append(last[key])
+        if last is None:
+            raise ValueError("No complete checkpoint in " + str(self.filename) + ".")
+        # drop an incomplete last record before appending new ones
+        with open(self.filename, 'r+b') as fout:
+            fout.truncate(end)
+
+        history = molecule.history
+        for channel, parts in rows.items():
+            history.restore(channel, np.concatenate(parts),
+                            int(last['pushed_' + channel]))
+        self._saved = {channel: history.counts()[channel][1]
+                       for channel in history}
+        molecule.time = float(last['time'])
+        molecule.field = last['field']
+        molecule.state.update(last['state'])
+        if hasattr(molecule, 'm_active'):
+            molecule.m_active = int(last['m_active'])
+        return int(last['step'])
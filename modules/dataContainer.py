@@ -3,6 +3,7 @@ data provided by user and generated by other classes.
 
 '''
 
+import os
 import numpy as np
 from collections import namedtuple
 from transform import transform_path
@@ -21,6 +22,10 @@ class DataContainer(object):
         A desired path of dipole moment projection provided by the 
         user. Each row contains the x- and y-projection at each time 
         point.
+
+    B : float, optional (default=constants.B)
+        Rotational constant of the molecule, which sets the time scale 
+        of the transformed path.
         
 
     Attributes
@@ -60,7 +65,7 @@ class DataContainer(object):
 
     """
 
-    def __init__(self, path):      
+    def __init__(self, path, B=None):      
         #check type and shape of input path
         if not isinstance(path, np.ndarray):
             errmsg = ("DataContainer can only be instantiated with "
@@ -80,14 +85,14 @@ class DataContainer(object):
         ## User-specified path that is processed by interpolating 
         ## and smoothing for compatibility with solver. 
         ## n-by-2 np.ndarray
-        path_transformed,dt = transform_path(path[:,0:].astype(float))
+        path_transformed,dt,t = transform_path(path[:,0:].astype(float),
+                                               return_time=True, B=B)
         self.path_desired = path_transformed
         ## Number of time points
         self.n = path_transformed.shape[0]
         ## Time difference between two adjacent time points in atomic units
         self.dt_atomic = dt
-        self._t_atomic = np.arange(self.n*self.dt_atomic,
-                                   step=self.dt_atomic, dtype=float)
+        self._t_atomic = t
         
         #attr initialized with all entries being zeros but of correct
         #shapes
@@ -107,7 +112,176 @@ class DataContainer(object):
         ## Standard deviation of paths from noisy fields.
         self.noise_stat_var = np.zeros((self.n, 2))
 
+    def save(self, filename, compression=4):
+        """Save all data to disk.
+
+        The format is chosen by the extension of `filename`:
+
+        - '.h5' or '.hdf5': HDF5 file with chunked, gzip-compressed 
+          datasets (requires h5py). 
+        - '.npz': compressed numpy archive, one member per array.
+        - anything else: directory with one uncompressed '.npy' file 
+          per array, which can be memory-mapped when loaded. '.npy' 
+          files already in the directory are removed first.
+
+        Parameters
+        ----------
+        filename : str
+            File or directory to write.
+
+        compression : int, optional (default=4)
+            Compression level from 0 to 9, only used for HDF5.
+
+        """
+        arrays = {name: getattr(self, name) for name in _ARRAYS
+                  if getattr(self, name) is not None}
+        scalars = {name: getattr(self, name) for name in _SCALARS}
+        fmt = _format(filename)
+        if fmt == 'h5':
+            h5py = _import_h5py()
+            with h5py.File(filename, 'w') as fout:
+                for name, value in arrays.items():
+                    value = np.asarray(value)
+                    if value.size == 0:
+                        # empty datasets cannot be chunked
+                        fout.create_dataset(name, data=value)
+                        continue
+                    # chunks of the state hold all amplitudes of a block
+                    # of time points
+                    if name == 'state':
+                        chunks = (value.shape[0], min(value.shape[1], 4096))
+                    else:
+                        chunks = True
+                    fout.create_dataset(name, data=value, chunks=chunks,
+                                        compression='gzip',
+                                        compression_opts=compression)
+                fout.attrs.update(scalars)
+        elif fmt == 'npz':
+            np.savez_compressed(filename, **arrays, **scalars)
+        else:
+            os.makedirs(filename, exist_ok=True)
+            # arrays left from an earlier save would be loaded again
+            for name in os.listdir(filename):
+                if name.endswith('.npy'):
+                    os.remove(os.path.join(filename, name))
+            for name, value in dict(arrays, **scalars).items():
+                np.save(os.path.join(filename, name + '.npy'), np.asarray(value))
+
+    @classmethod
+    def load(cls, filename, mmap=True):
+        """Load data saved by DataContainer.save.
+
+        Arrays are loaded lazily: HDF5 datasets (h5py.Dataset) and 
+        arrays of a directory (numpy.memmap) are only read from disk 
+        when sliced, and an array of a '.npz' archive is decompressed 
+        when the attribute is first accessed. An HDF5 file or '.npz' 
+        archive stays open until DataContainer.close is called or all 
+        its arrays have been read.
+
+        Parameters
+        ----------
+        filename : str
+            File or directory written by DataContainer.save.
+
+        mmap : bool, optional (default=True)
+            Keep arrays on disk instead of reading them into memory. 
+            If False, all arrays are read into memory and the file is 
+            closed.
+
+        Returns
+        -------
+        data : DataContainer object
+
+        """
+        data = cls.__new__(cls)
+        data._store = None
+        data._pending = None
+        fmt = _format(filename)
+        if fmt == 'h5':
+            h5py = _import_h5py()
+            fin = h5py.File(filename, 'r')
+            values = dict(fin.attrs)
+            for name in fin:
+                values[name] = fin[name] if mmap else fin[name][()]
+            if mmap:
+                data._store = fin
+            else:
+                fin.close()
+        elif fmt == 'npz':
+            fin = np.load(filename)
+            names = [os.path.splitext(name)[0] for name in fin.files]
+            if mmap:
+                # arrays are read by __getattr__ on first access
+                values = {name: fin[name] for name in names
+                          if name in _SCALARS}
+                data._store = fin
+                data._pending = set(names) - set(values)
+            else:
+                with fin:
+                    values = {name: fin[name] for name in names}
+        else:
+            mode = 'r' if mmap else None
+            values = {os.path.splitext(name)[0]:
+                          np.load(os.path.join(filename, name), mmap_mode=mode)
+                      for name in os.listdir(filename) if name.endswith('.npy')}
+        for name, value in values.items():
+            if name in _SCALARS:
+                value = np.asarray(value).item()
+            setattr(data, name, value)
+        return data
+
+    def __getattr__(self, name):
+        """Read an array of a '.npz' archive opened by 
+        DataContainer.load on first access."""
+        pending = self.__dict__.get('_pending')
+        if not pending or name not in pending:
+            if name in _OPTIONAL:
+                # not calculated when the data was saved
+                return None
+            raise AttributeError(name)
+        value = self._store[name]
+        setattr(self, name, value)
+        pending.discard(name)
+        if not pending:
+            self.close()
+        return value
+
+    def close(self):
+        """Close the file opened by DataContainer.load, if any. Arrays 
+        of a '.npz' archive that were not read yet are read first."""
+        store = self.__dict__.get('_store')
+        if store is None:
+            return
+        for name in list(self.__dict__.get('_pending') or ()):
+            setattr(self, name, store[name])
+        self._pending = None
+        self._store = None
+        store.close()
+
+
+#: tuple; Array attributes of DataContainer written by DataContainer.save
+_ARRAYS = ('path_desired', '_t_atomic', 't', 'field', 'path_actual', 'state',
+           'noise_stat_mean', 'noise_stat_var')
+#: tuple; Array attributes that are None until calculated
+_OPTIONAL = ('t', 'state')
+#: tuple; Scalar attributes of DataContainer written by DataContainer.save
+_SCALARS = ('n', 'dt_atomic')
 
 
+def _format(filename):
+    """Return 'h5', 'npz' or 'dir' depending on the extension."""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in ('.h5', '.hdf5'):
+        return 'h5'
+    if ext == '.npz':
+        return 'npz'
+    return 'dir'
 
 
+def _import_h5py():
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError("Saving to and loading from HDF5 requires h5py. "
+                          "Use a '.npz' file or a directory instead.")
+    return h5py
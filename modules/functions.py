@@ -2,10 +2,307 @@
 
 '''
 
+import functools
 import numpy as np
-from state import State
 
-def cosphi(m):
+
+class BandedOperator(object):
+    """Compact representation of an operator with few nonzero 
+    diagonals.
+
+    The operators used in this project (cosphi, sinphi, ddphi, 
+    d2dphi2 and their products) only have a handful of nonzero 
+    diagonals. Storing those diagonals instead of the dense 
+    (2m+1,2m+1) matrix makes matrix-vector products and expectation 
+    values cost O(m) instead of O(m^2).
+
+    Parameters
+    ----------
+    offsets: sequence of int
+        Offsets of the stored diagonals. Offset k holds the elements 
+        M[i,i+k]; positive offsets are above the main diagonal.
+
+    data: numpy.array, shape=(len(offsets),N)
+        Row-indexed diagonals, i.e. data[j,i] = M[i,i+offsets[j]]. 
+        Entries that fall outside the matrix are ignored.
+
+    Attributes
+    ----------
+    offsets: tuple of int
+        Sorted offsets of the stored diagonals.
+
+    data: numpy.array, shape=(len(offsets),N)
+        Row-indexed diagonals with entries outside the matrix set to 
+        zero.
+
+    """
+
+    # make numpy defer `ndarray @ BandedOperator` to __rmatmul__
+    __array_ufunc__ = None
+
+    def __init__(self, offsets, data):
+        data = np.atleast_2d(np.asarray(data))
+        if len(offsets) != data.shape[0]:
+            errmsg = "Expect one row of data for each offset."
+            raise ValueError(errmsg)
+        order = np.argsort(offsets)
+        ## Sorted offsets of the stored diagonals
+        self.offsets = tuple(int(offsets[j]) for j in order)
+        ## Row-indexed diagonals
+        self.data = data[order].copy()
+        n = self.data.shape[1]
+        for j, k in enumerate(self.offsets):
+            if abs(k) >= n:
+                errmsg = "Offset " + str(k) + " is outside the matrix."
+                raise ValueError(errmsg)
+            if k > 0:
+                self.data[j, n-k:] = 0
+            elif k < 0:
+                self.data[j, :-k] = 0
+
+    @classmethod
+    def from_dense(cls, matrix):
+        """Create a BandedOperator from the nonzero diagonals of a 
+        dense square matrix.
+
+        Parameters
+        ----------
+        matrix: numpy.array, shape=(N,N)
+            Dense matrix representation of an operator.
+
+        Returns
+        -------
+        BandedOperator
+
+        """
+        matrix = np.asarray(matrix)
+        n = matrix.shape[0]
+        offsets, data = [], []
+        for k in range(-n+1, n):
+            diagonal = np.diagonal(matrix, offset=k)
+            if np.any(diagonal):
+                row = np.zeros(n, dtype=matrix.dtype)
+                if k >= 0:
+                    row[:n-k] = diagonal
+                else:
+                    row[-k:] = diagonal
+                offsets.append(k)
+                data.append(row)
+        if not offsets:
+            offsets, data = [0], [np.zeros(n, dtype=matrix.dtype)]
+        return cls(offsets, np.array(data))
+
+    @property
+    def shape(self):
+        """tuple; Shape of the equivalent dense matrix."""
+        n = self.data.shape[1]
+        return (n, n)
+
+    @property
+    def dtype(self):
+        """numpy.dtype; Data type of the stored diagonals."""
+        return self.data.dtype
+
+    def toarray(self):
+        """Return the dense matrix representation.
+
+        Returns
+        -------
+        matrix: numpy.array, shape=(N,N)
+
+        """
+        n = self.shape[0]
+        matrix = np.zeros((n, n), dtype=self.dtype)
+        for k, row in zip(self.offsets, self.data):
+            if k >= 0:
+                matrix += np.diag(row[:n-k], k=k)
+            else:
+                matrix += np.diag(row[-k:], k=k)
+        return matrix
+
+    def matvec(self, x):
+        """Multiply the operator with a vector or with the columns of 
+        a matrix.
+
+        Parameters
+        ----------
+        x: numpy.array, shape=(N,) or (N,k)
+            Vector or stack of column vectors.
+
+        Returns
+        -------
+        y: numpy.array, shape=(N,) or (N,k)
+            Operator applied to `x`.
+
+        """
+        x = np.asarray(x)
+        n = self.shape[0]
+        y = np.zeros(x.shape, dtype=np.result_type(self.dtype, x.dtype))
+        data = self.data.reshape(self.data.shape + (1,)*(x.ndim-1))
+        for k, row in zip(self.offsets, data):
+            if k >= 0:
+                y[:n-k] += row[:n-k] * x[k:]
+            else:
+                y[-k:] += row[-k:] * x[:n+k]
+        return y
+
+    def expt(self, ket):
+        """Calculate the expectation value < ket | operator | ket >.
+
+        Parameters
+        ----------
+        ket: numpy.array, shape=(N,) or (N,k)
+            State amplitudes, or a stack of them as columns.
+
+        Returns
+        -------
+        expt: complex or numpy.array, shape=(k,)
+            Expectation value for each state.
+
+        """
+        ket = np.asarray(ket)
+        if ket.ndim == 1:
+            return np.sum(np.conj(ket) * self.matvec(ket))
+        # sum each state over contiguous memory, so that its expectation 
+        # value does not depend on the other states in the stack
+        products = np.empty(ket.shape[::-1], dtype=np.result_type(ket, self.data))
+        np.multiply(np.conj(ket).T, self.matvec(ket).T, out=products)
+        return products.sum(axis=1)
+
+    def __getitem__(self, index):
+        i, j = index
+        n = self.shape[0]
+        if not (0 <= i < n and 0 <= j < n):
+            raise IndexError("Index out of range.")
+        if j-i in self.offsets:
+            return self.data[self.offsets.index(j-i), i]
+        return self.dtype.type(0)
+
+    def __matmul__(self, other):
+        if isinstance(other, BandedOperator):
+            n = self.shape[0]
+            diagonals = {}
+            for p, a in zip(self.offsets, self.data):
+                for q, b in zip(other.offsets, other.data):
+                    if abs(p+q) >= n:
+                        continue
+                    shifted = np.zeros(n, dtype=b.dtype)
+                    if p >= 0:
+                        shifted[:n-p] = b[p:]
+                    else:
+                        shifted[-p:] = b[:n+p]
+                    diagonals[p+q] = diagonals.get(p+q, 0) + a*shifted
+            offsets = sorted(diagonals)
+            return BandedOperator(offsets, [diagonals[k] for k in offsets])
+        if isinstance(other, np.ndarray):
+            return self.matvec(other)
+        return NotImplemented
+
+    def __rmatmul__(self, other):
+        if isinstance(other, np.ndarray):
+            return other @ self.toarray()
+        return NotImplemented
+
+    def __add__(self, other):
+        if isinstance(other, np.ndarray):
+            return self.toarray() + other
+        if not isinstance(other, BandedOperator):
+            return NotImplemented
+        n = self.shape[0]
+        diagonals = {}
+        for op in (self, other):
+            for k, row in zip(op.offsets, op.data):
+                diagonals[k] = diagonals.get(k, np.zeros(n, dtype=int)) + row
+        offsets = sorted(diagonals)
+        return BandedOperator(offsets, [diagonals[k] for k in offsets])
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __neg__(self):
+        return BandedOperator(self.offsets, -self.data)
+
+    def __sub__(self, other):
+        if isinstance(other, (BandedOperator, np.ndarray)):
+            return self + (-other)
+        return NotImplemented
+
+    def __rsub__(self, other):
+        return (-self).__add__(other)
+
+    def __mul__(self, scalar):
+        if not np.isscalar(scalar):
+            return NotImplemented
+        return BandedOperator(self.offsets, self.data*scalar)
+
+    def __rmul__(self, scalar):
+        return self.__mul__(scalar)
+
+    def __repr__(self):
+        return ("BandedOperator(shape=" + str(self.shape) + ", offsets="
+                + str(self.offsets) + ")")
+
+
+class BandedStack(object):
+    """Several banded operators evaluated together.
+
+    BandedStack computes the expectation values of all its operators 
+    in a single pass over the state vector: the products 
+    conj(ket[i])*ket[i+k] are formed once for every offset k used by 
+    any operator, and all expectation values follow from one 
+    matrix-vector product with the stacked diagonals.
+
+    Parameters
+    ----------
+    operators: sequence of BandedOperator
+        Operators of identical shape.
+
+    Attributes
+    ----------
+    offsets: tuple of int
+        Union of the offsets of all operators.
+
+    """
+
+    def __init__(self, operators):
+        n = operators[0].shape[0]
+        ## Union of the offsets of all operators
+        self.offsets = tuple(sorted(set(k for op in operators
+                                        for k in op.offsets)))
+        data = np.zeros((len(operators), len(self.offsets), n),
+                        dtype=np.result_type(*[op.dtype for op in operators]))
+        for i, op in enumerate(operators):
+            for k, row in zip(op.offsets, op.data):
+                data[i, self.offsets.index(k)] = row
+        self._data = data.reshape((len(operators), -1))
+        self._products = np.zeros((len(self.offsets), n), dtype=complex)
+
+    def expt(self, ket):
+        """Calculate the expectation values of all operators.
+
+        Parameters
+        ----------
+        ket: numpy.array, shape=(N,)
+            State amplitudes.
+
+        Returns
+        -------
+        expt: numpy.array, shape=(len(operators),)
+            Expectation value of each operator, in order.
+
+        """
+        n = ket.shape[0]
+        products = self._products
+        bra = np.conj(ket)
+        for j, k in enumerate(self.offsets):
+            if k >= 0:
+                np.multiply(bra[:n-k], ket[k:], out=products[j, :n-k])
+            else:
+                np.multiply(bra[-k:], ket[:n+k], out=products[j, -k:])
+        return self._data @ products.ravel()
+
+
+def cosphi(m, banded=False):
     """Get operator for x-component of dipole moment projection.
 
     Parameters
@@ -13,18 +310,23 @@ def cosphi(m):
     m : int
         Maxium energy quantum number.
 
+    banded : bool, optional (default=False)
+        If True, return a BandedOperator instead of a dense matrix.
+
     Returns
     -------
-    cosphi : numpy.array, shape=(2m+1,2m+1)
+    cosphi : numpy.array or BandedOperator, shape=(2m+1,2m+1)
         Matrix representation of operator for x-component of dipole 
         moment projection.
 
     """
+    if banded:
+        return BandedOperator([-1, 1], np.full((2, 2*m+1), 0.5))
     cosphi_input=np.full((2*m),0.5)
     cosphi=np.diag(cosphi_input,k=1)+np.diag(cosphi_input,k=-1)
     return cosphi
 
-def sinphi(m):
+def sinphi(m, banded=False):
     """Get operator for y-component of dipole moment projection.
     
     Parameters
@@ -32,19 +334,25 @@ def sinphi(m):
     m : int
         Maxium energy quantum number.
 
+    banded : bool, optional (default=False)
+        If True, return a BandedOperator instead of a dense matrix.
+
     Returns
     -------
-    sinphi : numpy.array, shape=(2m+1,2m+1)
+    sinphi : numpy.array or BandedOperator, shape=(2m+1,2m+1)
         Matrix representation of operator for y-component of dipole 
         moment projection.
 
     """
+    if banded:
+        return BandedOperator([-1, 1], [np.full(2*m+1, -0.5j),
+                                        np.full(2*m+1, 0.5j)])
     sinphi_input1=np.full((2*m),0.5j)
     sinphi_input2=np.full((2*m),-0.5j)
     sinphi=np.diag(sinphi_input1,k=1)+np.diag(sinphi_input2,k=-1)
     return sinphi
 
-def ddphi(m):
+def ddphi(m, banded=False):
     """Calculates the operator to get the first derivative of phi, 
     used for solving b-vector in solvers.PathToField._get_b method.
 
@@ -53,18 +361,23 @@ def ddphi(m):
     m : int
         Maxium energy quantum number.
 
+    banded : bool, optional (default=False)
+        If True, return a BandedOperator instead of a dense matrix.
+
     Returns
     -------
-    ddphi : numpy.array, shape=(2m+1,2m+1)
+    ddphi : numpy.array or BandedOperator, shape=(2m+1,2m+1)
         Matrix representation of the operator to get the first 
         derivative of phi.
 
     """
     ddphi_input = np.arange(-m,m+1)
+    if banded:
+        return BandedOperator([0], [1j*ddphi_input])
     ddphi = 1j*np.diag(ddphi_input,k=0)
     return ddphi
 
-def d2dphi2(m):
+def d2dphi2(m, banded=False):
     """Calculates the operator to get the second derivative of phi, 
     used for solving b-vector in solvers.PathToField._get_b method.
 
@@ -73,21 +386,163 @@ def d2dphi2(m):
     m : int
         Maxium energy quantum number.
 
+    banded : bool, optional (default=False)
+        If True, return a BandedOperator instead of a dense matrix.
+
     Returns
     -------
-    d2dphi2 : numpy.array, shape=(2m+1,2m+1)
+    d2dphi2 : numpy.array or BandedOperator, shape=(2m+1,2m+1)
         Matrix representation of the operator to get the second 
         derivative of phi.
 
     """
     d2dphi2_input = np.arange(-m,m+1)**2
+    if banded:
+        return BandedOperator([0], [-1*d2dphi2_input])
     d2dphi2 = -1*np.diag(d2dphi2_input,k=0)
     return d2dphi2
 
-def d2dt2(x,dt):
-    """Calculate second derivative of a sequence of scalar numbers. 
-    Assume the time differecne between two adjacent points is the 
-    same throughout the entire sequence. 
+@functools.lru_cache(maxsize=8)
+def angular_basis(m, n_grid):
+    """Get the shared, read-only transformation from energy to angular 
+    representation.
+
+    Parameters
+    ----------
+    m : int
+        Maxium energy quantum number.
+
+    n_grid : int
+        Number of equally spaced angles phi in [0, 2*pi).
+
+    Returns
+    -------
+    wave_trans : numpy.array, shape=(2m+1,n_grid)
+        Basis functions exp(i*k*phi)/sqrt(2*pi) of each energy 
+        quantum number (one per row) evaluated at the angles.
+
+    """
+    phi = np.linspace(0, 2 * np.pi, n_grid, endpoint=False)
+    wave_trans = np.empty((2 * m + 1, n_grid), dtype=np.complex64)
+    for l in range(2 * m + 1):
+        wave_trans[l, :] = 1 / np.sqrt(2 * np.pi) * \
+                           np.exp(1j * (l - m - 1) * phi)
+    wave_trans.setflags(write=False)
+    return wave_trans
+
+
+def _product(a, b):
+    """Builder of the product of two registered operators."""
+    def build(m, banded):
+        return operator(a, m, banded) @ operator(b, m, banded)
+    return build
+
+
+def _op1(m, banded):
+    cos, sin = operator('cosphi', m, banded), operator('sinphi', m, banded)
+    return (cos + 4*sin@operator('ddphi', m, banded)
+            - 4*cos@operator('d2dphi2', m, banded))
+
+
+def _op2(m, banded):
+    cos, sin = operator('cosphi', m, banded), operator('sinphi', m, banded)
+    return (sin - 4*cos@operator('ddphi', m, banded)
+            - 4*sin@operator('d2dphi2', m, banded))
+
+
+def _energy(m, banded):
+    k2 = np.arange(-m, m+1)**2
+    if banded:
+        return BandedOperator([0], [k2])
+    return np.diag(k2)
+
+
+#: dict; Builders of the operators available from `operator`, keyed 
+#: by name. Each is called as builder(m, banded).
+OPERATORS = {'cosphi': cosphi,
+             'sinphi': sinphi,
+             'ddphi': ddphi,
+             'd2dphi2': d2dphi2,
+             'energy': _energy,
+             'cosphi2': _product('cosphi', 'cosphi'),
+             'sinphi2': _product('sinphi', 'sinphi'),
+             'cosphi_sinphi': _product('cosphi', 'sinphi'),
+             'sinphi_cosphi': _product('sinphi', 'cosphi'),
+             'op1': _op1,
+             'op2': _op2}
+
+
+@functools.lru_cache(maxsize=64)
+def operator(name, m, banded=False):
+    """Get a shared, read-only operator by name.
+
+    Each operator is built once per (name, m, banded) and cached, so 
+    that rotors, solvers and propagators with the same `m` reuse the 
+    same arrays. The arrays are read-only; copy them (or use the 
+    builder functions such as `cosphi`) to obtain a modifiable 
+    matrix.
+
+    Available operators are the builders cosphi, sinphi, ddphi and 
+    d2dphi2, 'energy' (diag(k^2) for k in -m..m, to be scaled by B), 
+    the products 'cosphi2', 'sinphi2', 'cosphi_sinphi' and 
+    'sinphi_cosphi' (e.g. cosphi@sinphi), and 'op1' and 'op2', the 
+    operators of the b-vector in solvers.PathToField._get_b:
+
+    op1 = cosphi + 4*sinphi@ddphi - 4*cosphi@d2dphi2
+    op2 = sinphi - 4*cosphi@ddphi - 4*sinphi@d2dphi2
+
+    Parameters
+    ----------
+    name : str
+        Name of the operator, one of the keys of OPERATORS.
+
+    m : int
+        Maxium energy quantum number.
+
+    banded : bool, optional (default=False)
+        If True, return a BandedOperator instead of a dense matrix.
+
+    Returns
+    -------
+    op : numpy.array or BandedOperator, shape=(2m+1,2m+1)
+        Read-only matrix representation of the operator.
+
+    Raises
+    ------
+    ValueError:
+        If `name` is not a known operator.
+
+    """
+    if name not in OPERATORS:
+        errmsg = ("Unknown operator '" + str(name) + "'. Expect one of "
+                  + ", ".join(sorted(OPERATORS)) + ".")
+        raise ValueError(errmsg)
+    op = OPERATORS[name](m, banded)
+    if banded:
+        op.data.setflags(write=False)
+    else:
+        op.setflags(write=False)
+    return op
+
+
+def _fd_weights(offsets, deriv=2):
+    """Finite-difference weights of the `deriv`-th derivative on a 
+    stencil of integer `offsets` (in units of the step size), found by 
+    matching the Taylor expansion up to order len(offsets)-1.
+
+    """
+    offsets = np.asarray(offsets, dtype=float)
+    k = len(offsets)
+    V = np.vander(offsets, k, increasing=True).T
+    rhs = np.zeros(k)
+    rhs[deriv] = np.prod(np.arange(1, deriv+1))
+    return np.linalg.solve(V, rhs)
+
+
+def d2dt2(x, dt, order=2, method='fd'):
+    """Calculate second derivative of a sequence of numbers or of 
+    several sequences at once. Assume the time differecne between 
+    two adjacent points is the same throughout the entire sequence. 
 
     This is used for solving b-vector in solvers.PathToField._get_b 
     method.
@@ -95,25 +550,66 @@ def d2dt2(x,dt):
     Parameters
     ----------
 
-    x : numpy.array, shape=(n,)
-        An 1-D sequence of numbers.
+    x : numpy.array, shape=(n,) or (n,...)
+        Sequence of numbers. Multidimensional input is differentiated 
+        along the first axis, e.g. both components of a path of shape 
+        (n,2) in one call.
 
     dt : float
         Step size of time, i.e. the time difference between two 
         adjacent numbers in `x`.
 
+    order : int, optional (default=2)
+        Order of accuracy of the central finite-difference stencil, 
+        one of 2, 4 or 6. The first and last order/2 points use 
+        one-sided stencils of order+1 points, so the boundary is one 
+        order less accurate (the same scheme as the original 2nd 
+        order stencil). Ignored if `method` is 'spectral'.
+
+    method : str, optional (default='fd')
+        'fd' for finite differences or 'spectral' for differentiation 
+        by FFT, which is only correct for periodic sequences where 
+        x[n] would equal x[0].
+
     Returns
     -------
-    d2x : numpy.array, shape=(n,)
+    d2x : numpy.array, same shape as `x`
         The second derivative of the original sequence `x`.
 
+    Raises
+    ------
+    ValueError:
+        If `order` or `method` is not supported, or if `x` is shorter 
+        than the stencil.
+
     """
-    # initial step (finite differences method)
-    n=len(x)
-    d2x = np.zeros(n,dtype=float)
-    d2x[0] = (x[2]-2*x[1]+x[0])/(dt**2)
-    for i in range(1,n-1):
-        d2x[i] = ((x[i+1]-x[i])-(x[i]-x[i-1]))/(dt**2)
-    d2x[n-1] = (x[n-3]-2*x[n-2]+x[n-1])/(dt**2)
-    return d2x
+    x = np.asarray(x)
+    n = x.shape[0]
+    if method == 'spectral':
+        shape = (-1,) + (1,)*(x.ndim-1)
+        if np.iscomplexobj(x):
+            k = 2*np.pi*np.fft.fftfreq(n, d=dt).reshape(shape)
+            return np.fft.ifft(-k**2 * np.fft.fft(x, axis=0), axis=0)
+        k = 2*np.pi*np.fft.rfftfreq(n, d=dt).reshape(shape)
+        return np.fft.irfft(-k**2 * np.fft.rfft(x, axis=0), n=n, axis=0)
+    if method != 'fd':
+        raise ValueError("Unknown method '" + str(method)
+                         + "'. Expect 'fd' or 'spectral'.")
+    if order not in (2, 4, 6):
+        raise ValueError("Expect order to be one of 2, 4 or 6.")
+    if n < order + 1:
+        raise ValueError("Expect at least " + str(order+1) + " points.")
 
+    r = order // 2
+    d2x = np.zeros(x.shape, dtype=np.result_type(x, float))
+    # interior (central stencil)
+    for o, w in zip(range(-r, r+1), _fd_weights(range(-r, r+1))):
+        d2x[r:n-r] += w * x[r+o:n-r+o]
+    # boundaries (one-sided stencils, mirrored at the end since the 
+    # weights of an even derivative are symmetric)
+    for i in range(r):
+        offsets = np.arange(order+1) - i
+        for o, w in zip(offsets, _fd_weights(offsets)):
+            d2x[i] += w * x[i+o]
+            d2x[n-1-i] += w * x[n-1-i-o]
+    return d2x / dt**2
@@ -0,0 +1,201 @@
+'''Implementation of class History to record the trajectory of a
+molecule in preallocated arrays.
+
+'''
+
+import numpy as np
+
+
+class History(object):
+    """Array-backed record of time, state and field of a molecule.
+
+    Class History stores the trajectory of a molecule (e.g.,
+    molecule.Rotor) in contiguous arrays that are preallocated and
+    grow geometrically when full, instead of appending one object per
+    time step to Python lists. Recorded values are accessed by
+    channel name ('time', 'state', 'field' and, optionally,
+    'observables' and 'basis') and returned as views without copying.
+
+    Values are pushed to each channel independently. Only every
+    `stride`-th value pushed to a channel is stored, counting from the
+    first one.
+
+    Parameters
+    ----------
+    m: int
+        Maximum energy quantum number.
+
+    capacity: int, optional (default=1024)
+        Number of records to preallocate per channel.
+
+    stride: int, optional (default=1)
+        Record only every `stride`-th value pushed to a channel.
+
+    observables: sequence of operators, optional (default=None)
+        If given, the state vectors are not stored. Instead the
+        expectation values of these operators (real part) are stored
+        in channel 'observables' whenever a state is pushed.
+
+    basis: bool, optional (default=False)
+        If True, the maximum quantum number of the basis in use is 
+        recorded in channel 'basis', for molecules that truncate 
+        their basis adaptively. States are stored padded to 2m+1 
+        amplitudes.
+
+    Attributes
+    ----------
+    m: int
+        Maximum energy quantum number.
+
+    stride: int
+        Record only every `stride`-th value pushed to a channel.
+
+    observables: tuple of operators or None
+        Operators whose expectation values are recorded instead of
+        the state vectors.
+
+    """
+
+    def __init__(self, m, capacity=1024, stride=1, observables=None,
+                 basis=False):
+        if stride < 1:
+            raise ValueError("Expect stride to be a positive integer.")
+        ## Maximum energy quantum number
+        self.m = m
+        ## Record only every `stride`-th value pushed to a channel
+        self.stride = int(stride)
+        ## Operators recorded instead of the state, or None
+        self.observables = None if observables is None else tuple(observables)
+
+        capacity = max(int(capacity), 1)
+        self._buffers = {'time': np.empty(capacity, dtype=float),
+                         'field': np.empty((capacity, 2), dtype=float)}
+        if self.observables is None:
+            self._buffers['state'] = np.empty((capacity, 2*m+1),
+                                              dtype=complex)
+        else:
+            self._buffers['observables'] = np.empty(
+                (capacity, len(self.observables)), dtype=float)
+        if basis:
+            self._buffers['basis'] = np.empty(capacity, dtype=int)
+        # number of values pushed and stored, per channel
+        self._pushed = dict.fromkeys(self._buffers, 0)
+        self._stored = dict.fromkeys(self._buffers, 0)
+
+    def __getitem__(self, channel):
+        """Return a view of the values recorded in a channel."""
+        return self._buffers[channel][:self._stored[channel]]
+
+    def __iter__(self):
+        return iter(self._buffers)
+
+    def __len__(self):
+        return len(self._buffers)
+
+    def keys(self):
+        """Return the names of the recorded channels."""
+        return self._buffers.keys()
+
+    def reserve(self, n):
+        """Make room for `n` values pushed to each channel in total.
+
+        Parameters
+        ----------
+        n: int
+            Total number of values expected per channel.
+
+        """
+        records = -(-int(n) // self.stride)
+        for channel in self._buffers:
+            self._grow(channel, records)
+
+    def append_time(self, time):
+        """Push a time point."""
+        self._push('time', time)
+
+    def append_field(self, field):
+        """Push a field expressed as (e_x, e_y)."""
+        self._push('field', np.real(field))
+
+    def append_state(self, value):
+        """Push the amplitudes of a state, or the expectation values of
+        the observables if states are not stored.
+
+        """
+        if self.observables is None:
+            self._push('state', value)
+        elif self._pushed['observables'] % self.stride == 0:
+            self._push('observables',
+                       [np.real(op.expt(value)) for op in self.observables])
+        else:
+            self._pushed['observables'] += 1
+
+    def append_basis(self, m):
+        """Push the maximum quantum number of the basis in use."""
+        self._push('basis', m)
+
+    def set_last_field(self, field):
+        """Overwrite the most recently pushed field.
+
+        Nothing is written if that field was skipped because of
+        `stride`.
+
+        """
+        channel = 'field'
+        if (self._pushed[channel]-1) % self.stride == 0:
+            self._buffers[channel][self._stored[channel]-1] = np.real(field)
+
+    def counts(self):
+        """Return the numbers of values pushed and stored per channel.
+
+        Returns
+        -------
+        counts: dict
+            (pushed, stored) for each channel name.
+
+        """
+        return {channel: (self._pushed[channel], self._stored[channel])
+                for channel in self._buffers}
+
+    def restore(self, channel, values, pushed):
+        """Replace the values recorded in a channel, e.g. from a 
+        checkpoint.
+
+        Parameters
+        ----------
+        channel: str
+            Channel name.
+
+        values: numpy.array
+            Stored values of the channel, one per row.
+
+        pushed: int
+            Number of values pushed to the channel in total, 
+            including those skipped because of `stride`.
+
+        """
+        self._grow(channel, len(values))
+        self._buffers[channel][:len(values)] = values
+        self._stored[channel] = len(values)
+        self._pushed[channel] = int(pushed)
+
+    def _push(self, channel, value):
+        """Push a value to a channel and store it if due."""
+        pushed = self._pushed[channel]
+        self._pushed[channel] = pushed + 1
+        if pushed % self.stride:
+            return
+        stored = self._stored[channel]
+        self._grow(channel, stored+1)
+        self._buffers[channel][stored] = value
+        self._stored[channel] = stored + 1
+
+    def _grow(self, channel, records):
+        """Reallocate a channel geometrically to hold `records` values."""
+        buffer = self._buffers[channel]
+        if records <= buffer.shape[0]:
+            return
+        capacity = max(records, 2*buffer.shape[0])
+        new = np.empty((capacity,) + buffer.shape[1:], dtype=buffer.dtype)
+        new[:self._stored[channel]] = buffer[:self._stored[channel]]
+        self._buffers[channel] = new
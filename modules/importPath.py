@@ -1,36 +1,11 @@
 import tkinter as tk
 from tkinter import filedialog
 from tkinter import messagebox
-import pandas as pd
 import numpy as np
 import os
 import importlib
-import matplotlib.pyplot as plt
 
-def import_my_module(full_name, path):
-	"""Function for importing a python module from path.
-	
-	Parameters
-	----------
-	full_name : str
-		Name of the module (no file extension)
-	
-	path : str
-		Path to the module (with file extension)
-	
-	Returns
-	-------	
-	mod : object
-		Module object
-	
-	"""
-	from importlib import util
-
-	spec = util.spec_from_file_location(full_name, path)
-	mod = util.module_from_spec(spec)
-
-	spec.loader.exec_module(mod)
-	return mod
+from loadPath import load_path
 
 class import_path(tk.Tk):
 
@@ -200,17 +175,8 @@ class import_path(tk.Tk):
 		if filename == None:
 			filename = filedialog.askopenfilename(initialdir="./", title='Please select a file')
 				
-		#is file an analytic function?
-		#if it is, import user_function() from file and assign output to coordinate_array
-		#else if data, import data
-		filename_no_ext, file_ext = os.path.splitext(filename)
-		if file_ext == '.py':
-			user_module = import_my_module(filename_no_ext, filename)
-			self.coordinate_array = user_module.user_function() #function MUST be named user_function()
-		elif file_ext == '.dat':
-			self.coordinate_array = pd.read_table(filename, sep=" ", header=None)
-		else:
-			raise ValueError("Path provided must be to a file with either the '.py' (function) or '.dat' (data) extenstion")
+		#load_path calls user_function() of a .py file, or reads .dat/.npy data
+		self.coordinate_array = load_path(filename)
 			
 	def finished(self):
 		self.destroy()
@@ -237,6 +203,7 @@ class import_path(tk.Tk):
 		'''Plot coordinates held in coordinate list
 		
 		'''
+		import matplotlib.pyplot as plt
 
 		coords = self.get_coordinates()
 		if len(coords) == 0:
@@ -0,0 +1,267 @@
+'''Time stepping for the rotor with a time-dependent control field.
+
+`cfm4_step` takes a single 4th order step and is used by
+molecule.Rotor.evolve_magnus for fixed steps. In AdaptiveIntegrator the
+state is advanced with a 4th order commutator-free Magnus (CFM4)
+step, built from two exponentials of the rotor hamiltonian evaluated at
+the Gauss-Legendre nodes of the step. The exponential midpoint rule
+(2nd order) is embedded to estimate the local error and to choose the
+next step size. States at the requested output times within a step are
+obtained with a CFM4 step from the beginning of the step to the output
+time, so steps are not tied to the output grid and the dense output is
+of the same order as the steps themselves.
+
+'''
+
+import numpy as np
+
+#: float; Gauss-Legendre nodes of a step (as fractions of the step)
+_NODES = (0.5 - np.sqrt(3)/6, 0.5 + np.sqrt(3)/6)
+#: float; Weights of the fields at the nodes in the CFM4 exponents
+_ALPHA = ((3 - 2*np.sqrt(3))/12, (3 + 2*np.sqrt(3))/12)
+
+
+def gauss_nodes(t, h):
+    """Return the Gauss-Legendre nodes of steps.
+
+    Parameters
+    ----------
+    t: float or numpy.array, shape=(k,)
+        Beginning of the step(s).
+
+    h: float
+        Step size.
+
+    Returns
+    -------
+    nodes: numpy.array, shape=(2,) or (k,2)
+        Times at which the field enters a CFM4 step.
+
+    """
+    return np.add.outer(t, h*np.array(_NODES))
+
+
+def cfm4_step(propagator, ket, e1, e2, h):
+    """Evolve a state by one 4th order commutator-free Magnus (CFM4)
+    step.
+
+    The step is the product of two exponentials of the hamiltonian,
+    each with a constant field that is a linear combination of the
+    fields at the Gauss-Legendre nodes of the step. Its error is 4th
+    order in the step size also for a time-dependent field, whereas
+    holding the field constant over the step is 1st order (2nd order
+    if the field is taken at the middle of the step).
+
+    Parameters
+    ----------
+    propagator: Propagator object
+        Propagator (propagators.Propagator) used for the exponentials.
+
+    ket: numpy.array, shape=(2m+1,)
+        State amplitudes at the beginning of the step.
+
+    e1, e2: numpy.array, shape=(2,)
+        Fields (e_x, e_y) at the nodes returned by `gauss_nodes`.
+
+    h: float
+        Step size.
+
+    Returns
+    -------
+    ket: numpy.array, shape=(2m+1,)
+        State amplitudes at the end of the step.
+
+    """
+    a1, a2 = _ALPHA
+    ket = propagator.propagate(ket, 2*(a2*e1 + a1*e2), h/2)
+    return propagator.propagate(ket, 2*(a1*e1 + a2*e2), h/2)
+
+
+class GridFunction(object):
+    """Piecewise cubic interpolation of values sampled on a uniform
+    time grid.
+
+    Between two samples, the value is given by the Lagrange
+    polynomial through the four nearest samples (two-sided where
+    possible). Times outside of the grid are clipped to its ends.
+
+    Parameters
+    ----------
+    values: numpy.array, shape=(n,...)
+        Samples, one per time point.
+
+    dt: float
+        Time difference between two adjacent samples.
+
+    t0: float, optional (default=0)
+        Time of the first sample.
+
+    """
+
+    def __init__(self, values, dt, t0=0.0):
+        values = np.asarray(values)
+        if values.shape[0] < 2:
+            raise ValueError("Expect at least two samples.")
+        ## Samples
+        self.values = values
+        ## Time difference between two adjacent samples
+        self.dt = dt
+        ## Time of the first sample
+        self.t0 = t0
+
+    def __call__(self, t):
+        """Evaluate the interpolant.
+
+        Parameters
+        ----------
+        t: float or numpy.array, shape=(k,)
+            Time(s) to evaluate at.
+
+        Returns
+        -------
+        values: numpy.array, shape=values.shape[1:] or (k,)+values.shape[1:]
+
+        """
+        n = self.values.shape[0]
+        u = np.clip((np.asarray(t, dtype=float) - self.t0) / self.dt, 0, n-1)
+        if n < 4:
+            i = np.minimum(u.astype(int), n-2)
+            s = u - i
+            w = (1-s, s)
+            offsets = (0, 1)
+        else:
+            i = np.clip(np.floor(u).astype(int), 1, n-3)
+            s = u - i
+            w = (-s*(s-1)*(s-2)/6, (s+1)*(s-1)*(s-2)/2,
+                 -(s+1)*s*(s-2)/2, (s+1)*s*(s-1)/6)
+            offsets = (-1, 0, 1, 2)
+        shape = np.shape(u) + (1,)*(self.values.ndim-1)
+        return sum(np.reshape(wk, shape) * self.values[i+k]
+                   for wk, k in zip(w, offsets))
+
+
+class AdaptiveIntegrator(object):
+    """Adaptive integrator of the Schrodinger equation of a rotor.
+
+    Parameters
+    ----------
+    m: int
+        Maximum energy quantum number.
+
+    propagator: Propagator object
+        Propagator (propagators.Propagator) used for the exponentials
+        of the hamiltonian with a constant field.
+
+    tol: float, optional (default=1e-6)
+        Tolerated local error (2-norm of the state) per step.
+
+    h_max: float, optional (default=None)
+        Largest allowed step. Unbounded by default.
+
+    Attributes
+    ----------
+    nsteps: int
+        Number of accepted steps of the last `solve`.
+
+    nrejected: int
+        Number of rejected steps of the last `solve`.
+
+    """
+
+    def __init__(self, m, propagator, tol=1e-6, h_max=None):
+        if tol <= 0:
+            raise ValueError("Expect tol to be positive.")
+        ## Maximum energy quantum number
+        self.m = m
+        ## Propagator for the exponentials
+        self.propagator = propagator
+        ## Tolerated local error per step
+        self.tol = tol
+        ## Largest allowed step
+        self.h_max = np.inf if h_max is None else h_max
+        ## Number of accepted steps of the last `solve`
+        self.nsteps = 0
+        ## Number of rejected steps of the last `solve`
+        self.nrejected = 0
+
+    def solve(self, ket, field, t_out, progress=None):
+        """Evolve a state from t_out[0] and return it at all t_out.
+
+        Parameters
+        ----------
+        ket: numpy.array, shape=(2m+1,)
+            State amplitudes at t_out[0].
+
+        field: callable
+            field(t) returns the control field (e_x, e_y) at time t,
+            e.g. a GridFunction.
+
+        t_out: numpy.array, shape=(n,)
+            Increasing output times.
+
+        progress: callable, optional (default=None)
+            progress(k) is called after every accepted step, where k 
+            is the number of output times reached so far.
+
+        Returns
+        -------
+        states: numpy.array, shape=(2m+1,n)
+            State amplitudes at the output times.
+
+        """
+        t_out = np.asarray(t_out, dtype=float)
+        states = np.empty((len(ket), len(t_out)), dtype=complex)
+        states[:,0] = ket
+        self.nsteps = self.nrejected = 0
+        if len(t_out) < 2:
+            return states
+        t, t_final = t_out[0], t_out[-1]
+        h = t_out[1] - t_out[0]
+        k = 1
+        while k < len(t_out):
+            h = min(h, self.h_max, t_final - t)
+            ket_new, ket_mid = self._step(ket, field, t, h)
+            err = np.linalg.norm(ket_new - ket_mid)
+            if err > self.tol and h > 1e-12*t_final:
+                self.nrejected += 1
+                h *= max(0.2, 0.9*(self.tol/err)**(1/3))
+                continue
+            # accept and take a CFM4 step from t to the output times
+            # within the step
+            stop = k + np.searchsorted(t_out[k:], t + h*(1+1e-12),
+                                       side='right')
+            if t + h >= t_final:
+                stop = len(t_out)
+            for j in range(k, stop):
+                tau = t_out[j] - t
+                if tau >= h*(1-1e-12):
+                    states[:,j] = ket_new
+                else:
+                    e1, e2 = (np.real(field(node)) for node in gauss_nodes(t, tau))
+                    states[:,j] = cfm4_step(self.propagator, ket, e1, e2, tau)
+            k = stop
+            if progress is not None:
+                progress(k)
+            t += h
+            ket = ket_new
+            self.nsteps += 1
+            h *= min(5.0, 0.9*(self.tol/max(err, 1e-300))**(1/3))
+        return states
+
+    def _step(self, ket, field, t, h):
+        """Take one CFM4 step and the embedded exponential midpoint 
+        step.
+
+        Returns
+        -------
+        ket: numpy.array, shape=(2m+1,)
+            4th order estimate of the state after the step.
+
+        ket_mid: numpy.array, shape=(2m+1,)
+            2nd order estimate of the state after the step.
+
+        """
+        e1, e2, e_mid = (np.real(field(t + c*h)) for c in _NODES + (0.5,))
+        ket4 = cfm4_step(self.propagator, ket, e1, e2, h)
+        ket2 = self.propagator.propagate(ket, e_mid, h)
+        return ket4, ket2
@@ -0,0 +1,81 @@
+'''Functions to load a user path from file without a graphical
+interface.
+
+'''
+
+import os
+import numpy as np
+
+
+def import_my_module(full_name, path):
+    """Function for importing a python module from path.
+
+    Parameters
+    ----------
+    full_name : str
+        Name of the module (no file extension)
+
+    path : str
+        Path to the module (with file extension)
+
+    Returns
+    -------
+    mod : object
+        Module object
+
+    """
+    from importlib import util
+
+    spec = util.spec_from_file_location(full_name, path)
+    mod = util.module_from_spec(spec)
+
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def load_path(filename):
+    """Load the coordinates of a path from file.
+
+    The file is either data ('.dat' text file of two columns separated
+    by spaces or commas, or '.npy' array of shape (n,2)) or a python
+    module ('.py') defining a function user_function() that returns
+    the coordinates.
+
+    Parameters
+    ----------
+    filename : str
+        Filename for user data/user function
+
+    Returns
+    -------
+    coords : numpy.array, shape=(n,2)
+        Coordinates of the path, shifted to start at (0,0).
+
+    Raises
+    ------
+    ValueError:
+        If the file extension is not supported or no coordinates are
+        present.
+
+    """
+    filename_no_ext, file_ext = os.path.splitext(filename)
+    if file_ext == '.py':
+        user_module = import_my_module(filename_no_ext, filename)
+        coords = user_module.user_function() #function MUST be named user_function()
+    elif file_ext == '.dat':
+        with open(filename) as fin:
+            delimiter = ',' if ',' in fin.readline() else None
+        coords = np.loadtxt(filename, delimiter=delimiter, ndmin=2)
+    elif file_ext == '.npy':
+        coords = np.load(filename)
+    else:
+        raise ValueError("Path provided must be to a file with either the '.py' (function), "
+                         "'.dat' or '.npy' (data) extenstion")
+
+    coords = np.array(coords, dtype=float)
+    if len(coords) == 0:
+        raise ValueError("Error: No coordinates present")
+    if coords.ndim != 2 or coords.shape[1] != 2:
+        raise ValueError("Expect coordinates of shape (n,2).")
+    #make sure starts at (0,0)
+    return coords - coords[0]
@@ -7,8 +7,10 @@ import abc
 import numpy as np
 from state import State
 import functions as f
-from scipy import linalg
 import constants as const
+from propagators import make_propagator
+from integrators import cfm4_step
+from history import History
 
 class Molecule(abc.ABC):
     """Abstract base class for molecules (i.e., system of interest)
@@ -39,34 +41,111 @@ class Rotor(Molecule):
 
     Parameters
     ----------
-    m: int
+    m: int, optional (default=constants.m)
         Maximum energy quantum number
 
+    propagator: str, optional (default='exact')
+        Method used to evolve the state over a time step. 'expm' 
+        exponentiates the full hamiltonian at every step at O(m^3) 
+        cost; 'exact' uses the eigendecomposition of its tridiagonal 
+        form at O(m^2) cost and agrees with 'expm' to machine 
+        precision; 'split' uses operator splitting with a 
+        precomputed eigendecomposition of the dipole coupling and is 
+        the fastest; 'krylov' uses a Lanczos approximation at O(m) 
+        cost per step and is the one to use for m in the hundreds.
+
+    substeps: int, optional (default=1)
+        Number of substeps per time step for the 'split' 
+        propagator. Trades speed for accuracy.
+
+    stride: int, optional (default=1)
+        Record only every `stride`-th time point into history.
+
+    record_states: bool, optional (default=True)
+        If False, only the dipole moment projections (<cosphi>, 
+        <sinphi>) are recorded into history instead of the full 
+        state amplitudes.
+
+    adaptive_basis: bool, optional (default=False)
+        If True, `evolve` and `evolve_magnus` propagate only the 
+        amplitudes of quantum numbers -m_active..m_active. The basis 
+        grows when the population of its edge states exceeds 
+        `basis_tol` and shrinks when the population outside a smaller 
+        basis drops far below it. States are kept and recorded padded 
+        to 2m+1 amplitudes, and m_active is recorded in history 
+        channel 'basis'. `m` is the largest basis used.
+
+    basis_tol: float, optional (default=1e-14)
+        Tolerated population of the edge states of the adaptive 
+        basis.
+
+    m_min: int, optional (default=4)
+        Smallest basis (maximum quantum number) of the adaptive 
+        basis.
+
+    B: float, optional (default=constants.B)
+        Rotational constant.
+
+    mu: float, optional (default=constants.mu)
+        Dipole moment.
+
     Attributes
     ----------
+    m: int
+        Maximum energy quantum number.
+
+    B: float
+        Rotational constant.
+
+    mu: float
+        Dipole moment.
+
     state: State object
         Contining amplitudes of basic wave functions for the molecule
 
     field: numpy.array, shape=(2,)
         External control field expresses as (e_x, e_y)
 
-    hamiltonian: numpy.array, shape=(2m+1,2m+1)
-        Matrix representation of molecule-specific Hamiltonian 
-        operator.
+    hamiltonian: BandedOperator, shape=(2m+1,2m+1)
+        Banded representation (functions.BandedOperator) of 
+        molecule-specific Hamiltonian operator H0 + e_x*Hx + e_y*Hy 
+        with the current field. It is assembled from precomputed 
+        parts when accessed, into an operator that is reused (and 
+        overwritten) by later accesses.
 
-    dipole_x: numpy.array, shape=(2m+1,2m+1)
-        Matrix representation of operator for x-projection of dipole 
+    dipole_x: BandedOperator, shape=(2m+1,2m+1)
+        Banded representation of operator for x-projection of dipole 
         moment.
 
-    dipole_y: numpy.array, shape=(2m+1,2m+1)
-        Matrix representation of operator for y-projection of dipole 
+    dipole_y: BandedOperator, shape=(2m+1,2m+1)
+        Banded representation of operator for y-projection of dipole 
         moment.
 
+    propagator: Propagator object
+        Propagator (propagators.Propagator) used by `evolve` for the 
+        full basis.
+
+    m_active: int
+        Maximum quantum number of the basis in use, m unless the 
+        basis is adaptive.
+
+    history: History object
+        Record (history.History) of `time`, `state`, and `field` of 
+        the molecule.
+
     """
 
-    def __init__(self, m):
+    def __init__(self, m=None, propagator='exact', substeps=1, stride=1,
+                 record_states=True, B=None, mu=None, adaptive_basis=False,
+                 basis_tol=1e-14, m_min=4):
+        if m is None:
+            m = const.m
         ## Maximun energy quantum number
         self.m = m
+        ## Rotational constant
+        self.B = const.B if B is None else B
+        ## Dipole moment
+        self.mu = const.mu if mu is None else mu
         ground_state = np.zeros(2*m+1)
         ground_state[m] = 1.0
         ## State object (solver.state.State) containing weights for 
@@ -76,28 +155,50 @@ class Rotor(Molecule):
         ## control field that will change the hamiltonian of the
         ## molecule
         self.field = np.zeros(2)
-        ## Molecule-specific Hamiltonian object, in this case, a 
-        ## RotorH (solver.observable.RotorH).
-        self.hamiltonian = self._get_hamiltonian()
-        self.dipole_x = f.cosphi(self.m)
-        self.dipole_y = f.sinphi(self.m)
+        # field-free part and field couplings of the hamiltonian, 
+        # H = H0 + e_x*Hx + e_y*Hy, as diagonals at offsets (-1,0,1)
+        n = 2*m+1
+        self._hamiltonian_parts = np.zeros((3, 3, n), dtype=complex)
+        self._hamiltonian_parts[0, 1] = self.B*np.arange(-m, m+1)**2
+        self._hamiltonian_parts[1, [0, 2]] = -self.mu*f.operator('cosphi', m, banded=True).data
+        self._hamiltonian_parts[2, [0, 2]] = -self.mu*f.operator('sinphi', m, banded=True).data
+        self._hamiltonian_coefs = np.ones(3, dtype=complex)
+        self._hamiltonian = f.BandedOperator((-1, 0, 1), np.zeros((3, n), dtype=complex))
+        self.dipole_x = f.operator('cosphi', self.m, banded=True)
+        self.dipole_y = f.operator('sinphi', self.m, banded=True)
+        ## Propagator used to evolve the state over a time step
+        self.propagator = make_propagator(propagator, m, substeps,
+                                          self.B, self.mu)
+        ## Whether the basis is truncated adaptively
+        self.adaptive_basis = adaptive_basis
+        ## Tolerated population of the edge states of the basis
+        self.basis_tol = basis_tol
+        ## Smallest maximum quantum number of the adaptive basis
+        self.m_min = min(m_min, m)
+        ## Maximum quantum number of the basis in use
+        self.m_active = self.m_min if adaptive_basis else m
+        # propagators of truncated bases, keyed by maximum quantum number
+        self._propagators = {m: self.propagator}
+        self._propagator_args = (propagator, substeps)
         ## Current time
         self.time = 0.0
-        ## A dictionary for history of `time`, `state`, and `field` 
-        ## of the molecule. Each property's history is recorded as a 
-        ## list, with each element a scalar for `time`, a 
-        ## solver.state.State object for `state`, and a 
-        ## solver.field.Field object for `field`.
-        self.history = {'time':[self.time],
-                        'state':[self.state],
-                        'field':[self.field]}
+        ## History of `time`, `state`, and `field` of the molecule, 
+        ## recorded in preallocated arrays (history.History)
+        observables = None if record_states else (self.dipole_x,
+                                                  self.dipole_y)
+        self.history = History(m, stride=stride, observables=observables,
+                               basis=adaptive_basis)
+        self.history.append_time(self.time)
+        self._append_state(self.state.value)
+        self.history.append_field(self.field)
 
     def evolve(self, dt):
         """Evolve and update the state of molecule using its 
         hamiltonian.
 
-        Method `evolve` invokes the method in hamiltonian to evolve 
-        the molecule state by `dt` forward in time. It then updates 
+        Method `evolve` invokes the propagator to evolve the 
+        molecule state by `dt` forward in time under the current 
+        field. It then updates 
         the time and state, and records them into history. 
 
         Parameters
@@ -107,40 +208,141 @@ class Rotor(Molecule):
 
         """
 
-        #Use haniltonian to evolve the current state 
-        U = linalg.expm((-1j/const.hbar)*self.hamiltonian*dt)
-        weights = U @ self.state.as_ket()
-        state_new = State(self.m, weights)
-        #Update (including writing history) of time and state
-        self.update_state(state_new)
+        #Use the propagator to evolve the current state 
+        if self.adaptive_basis:
+            weights = self._propagate_active(
+                lambda propagator, ket: propagator.propagate(ket, self.field, dt))
+        else:
+            weights = self.propagator.propagate(self.state.value, self.field, dt)
+        #Update (including writing history) of time and state, reusing
+        #the State object
+        self.state.update(weights)
+        self._append_state(weights)
+        self.update_time(self.time+dt)
+
+    def evolve_magnus(self, dt, fields):
+        """Evolve and update the state of molecule over a step in 
+        which the field changes.
+
+        Method `evolve_magnus` takes a 4th order commutator-free 
+        Magnus step (integrators.cfm4_step) with the fields at the 
+        two Gauss-Legendre nodes of the step. The current field is 
+        not changed. It then updates the time and state, and records 
+        them into history.
+
+        Parameters
+        ----------
+        dt: float
+            Step size of time.
+
+        fields: numpy.array, shape=(2,2)
+            Fields (e_x, e_y) at the times integrators.gauss_nodes(
+            self.time, dt).
+
+        """
+
+        if self.adaptive_basis:
+            weights = self._propagate_active(
+                lambda propagator, ket: cfm4_step(propagator, ket, fields[0],
+                                                  fields[1], dt))
+        else:
+            weights = cfm4_step(self.propagator, self.state.value,
+                                fields[0], fields[1], dt)
+        self.state.update(weights)
+        self._append_state(weights)
         self.update_time(self.time+dt)
 
+    def _propagate_active(self, step):
+        """Apply a propagation step to the amplitudes of the basis in 
+        use and adapt the basis to the result.
+
+        Parameters
+        ----------
+        step: callable
+            step(propagator, ket) returns the propagated amplitudes 
+            `ket` of a truncated basis with the given propagator.
+
+        Returns
+        -------
+        weights: numpy.array, shape=(2m+1,)
+            Propagated amplitudes, padded with zeros.
+
+        """
+        m, ma = self.m, self.m_active
+        if ma not in self._propagators:
+            name, substeps = self._propagator_args
+            self._propagators[ma] = make_propagator(name, ma, substeps,
+                                                    self.B, self.mu)
+        window = slice(m-ma, m+ma+1)
+        weights = np.zeros(2*m+1, dtype=complex)
+        weights[window] = step(self._propagators[ma],
+                               self.state.value[window])
+        self._adapt_basis(weights)
+        return weights
+
+    def _adapt_basis(self, weights):
+        """Grow or shrink the basis in use for the amplitudes 
+        `weights`, which are truncated in place when it shrinks.
+
+        """
+        m, ma = self.m, self.m_active
+        population = np.abs(weights)**2
+        if population[m-ma] + population[m+ma] > self.basis_tol:
+            self.m_active = min(m, ma + max(2, ma//2))
+            return
+        smaller = max(self.m_min, (3*ma)//4)
+        if smaller < ma:
+            outside = (population[:m-smaller].sum()
+                       + population[m+smaller+1:].sum())
+            if outside < 1e-3*self.basis_tol:
+                weights[:m-smaller] = 0
+                weights[m+smaller+1:] = 0
+                self.m_active = smaller
+
+    def _fit_basis(self, value):
+        """Choose the adaptive basis for new amplitudes `value`."""
+        k = np.nonzero(np.abs(value)**2 > 1e-3*self.basis_tol)[0] - self.m
+        support = np.abs(k).max() + 2 if len(k) else 0
+        self.m_active = min(self.m, max(self.m_min, support))
+
+    def _append_state(self, value):
+        """Record amplitudes and, for an adaptive basis, its size."""
+        self.history.append_state(value)
+        if self.adaptive_basis:
+            self.history.append_basis(self.m_active)
+
+    @property
+    def hamiltonian(self):
+        """BandedOperator; Rotor hamiltonian with the current field."""
+        return self._get_hamiltonian()
+
     def _get_hamiltonian(self):
         """Calculate rotor hamiltonian with the current control field.
 
+        The precomputed parts H0, Hx and Hy are combined in place, 
+        without temporaries.
+
         Returns
         -------
-        H: numpy.array, shape=(2m+1,2m+1)
-            Matrix representation for Hamiltonian operator.
+        H: BandedOperator, shape=(2m+1,2m+1)
+            Banded representation for Hamiltonian operator.
 
         """
 
-        m = self.m
-        field = self.field
-        H = (const.B*np.diag((np.arange(-m,m+1))**2,k=0)
-            -const.mu*f.cosphi(m)*field[0]
-            -const.mu*f.sinphi(m)*field[1])
+        coefs = self._hamiltonian_coefs
+        coefs[1:] = self.field
+        parts = self._hamiltonian_parts
+        H = self._hamiltonian
+        np.dot(coefs, parts.reshape((3, -1)), out=H.data.reshape(-1))
 
         return H
 
 
     def set_field(self, field):
-        """Set the external field and calculate hamiltonian 
-        accordingly.
+        """Set the external field, and with it the hamiltonian.
 
-        `set_field` will set rotor.field to input field object and 
-        change self.hamiltonian to the new hamiltonian based on the 
-        new field. This DOES NOT add a new value to history but 
+        `set_field` will set rotor.field to input field object, so 
+        that self.hamiltonian is based on the new field. This DOES NOT add a new value to history but 
         instead change the last value of history, and hence should 
         only be used to set the initial field when a rotor object 
         instantiated within a solver. (solvers.FieldToPath or 
@@ -155,9 +357,8 @@ class Rotor(Molecule):
         """
 
         self.field = field
-        self.hamiltonian = self._get_hamiltonian()
         # rewrite history manually
-        self.history['field'][-1] = field
+        self.history.set_last_field(field)
 
     def update_time(self, time):
         """Set and update time of molecule with history appended.
@@ -169,7 +370,7 @@ class Rotor(Molecule):
 
         """
         self.time = time
-        self.history['time'].append(time)
+        self.history.append_time(time)
 
     def update_state(self, state):
         """Set and update state of molecule with history appended.
@@ -181,11 +382,14 @@ class Rotor(Molecule):
 
         """
         self.state = state
-        self.history['state'].append(state)
+        if self.adaptive_basis:
+            self._fit_basis(state.value)
+        self._append_state(state.value)
 
     def update_field(self, field):
-        """Set and update field of molecule with history appended and 
-        hamiltonian recalculated.
+        """Set and update field of molecule with history appended. Only 
+        the field coefficients of the hamiltonian change; it is not 
+        rebuilt.
 
         Parameters
         ----------
@@ -196,9 +400,18 @@ class Rotor(Molecule):
         """
 
         self.field = field
-        self.history['field'].append(field)
-        #calculate and set the new hamiltonian
-        self.hamiltonian = self._get_hamiltonian()
+        self.history.append_field(field)
+
+    def reserve(self, n):
+        """Preallocate history for `n` time points in total.
+
+        Parameters
+        ----------
+        n: int
+            Expected number of time points.
+
+        """
+        self.history.reserve(n)
 
     def get_time_asarray(self):
         """Return history of time as an array.
@@ -206,11 +419,11 @@ class Rotor(Molecule):
         Returns
         -------
         times: numpy.array, shape=(n,)
-            Array containing n time points.
+            Array containing n time points. This is a view of the 
+            history.
 
         """
-        times = [time for time in self.history['time']]
-        return np.stack(times)
+        return self.history['time']
 
     def get_states_asarray(self):
         """Return history of state as an array.
@@ -220,11 +433,28 @@ class Rotor(Molecule):
         states: numpy.array, shape=(2m+1,n)
             State amplitudes of the molecule at each time points. 
             Each column of this returned 2D-array is a state 
-            amplitudes vector.
+            amplitudes vector. This is a view of the history, or None 
+            if states are not recorded.
 
         """
-        states = [state.value.flatten() for state in self.history['state']]
-        return np.stack(states, axis=1)
+        if 'state' not in self.history:
+            return None
+        return self.history['state'].T
+
+    def get_basis_asarray(self):
+        """Return history of the basis in use as an array.
+
+        Returns
+        -------
+        basis: numpy.array, shape=(n,)
+            Maximum quantum number of the basis at each time point, or 
+            None if the basis is not adaptive. States of a smaller 
+            basis are padded with zeros to 2m+1 amplitudes.
+
+        """
+        if 'basis' not in self.history:
+            return None
+        return self.history['basis']
 
     def get_fields_asarray(self):
         """Return history of field as an array.
@@ -233,19 +463,64 @@ class Rotor(Molecule):
         -------
         fields: numpy.array, shape=(n,2)
             Control fields to apply to the molecule. Each row is a 
-            field described as (e_x,e_y) at a time point.
+            field described as (e_x,e_y) at a time point. This is a 
+            view of the history.
 
         """
-        fields = [field.flatten() for field in self.history['field']]
-        return np.stack(fields, axis=0)
-
-
+        return self.history['field']
 
+    def get_path_asarray(self):
+        """Return history of dipole moment projection as an array.
 
+        Returns
+        -------
+        path: numpy.array, shape=(n,2)
+            Expectation values of cosphi and sinphi at each time 
+            point.
 
+        """
+        if 'observables' in self.history:
+            return self.history['observables']
+        return self.get_expt_asarray((self.dipole_x, self.dipole_y)).real
 
+    def get_expt_asarray(self, operators):
+        """Return history of expectation values of observables as an 
+        array.
 
+        Each operator is contracted with all recorded states at once.
 
+        Parameters
+        ----------
+        operators: sequence
+            Observables, each a numpy.array or BandedOperator of 
+            shape (2m+1,2m+1), or the name of an operator of 
+            functions.operator.
 
+        Returns
+        -------
+        expts: numpy.array, shape=(n,len(operators)), dtype=complex
+            Expectation value of each observable at each recorded 
+            time point.
 
+        Raises
+        ------
+        ValueError:
+            If states are not recorded.
 
+        """
+        states = self.get_states_asarray()
+        if states is None:
+            raise ValueError("States are not recorded; expectation values "
+                             "of other observables than the path are "
+                             "not available.")
+        bras = np.conj(states)
+        expts = np.empty((states.shape[1], len(operators)), dtype=complex)
+        for j, operator in enumerate(operators):
+            if isinstance(operator, str):
+                operator = f.operator(operator, self.m, banded=True)
+            if isinstance(operator, f.BandedOperator):
+                ket = operator.matvec(states)
+            else:
+                ket = np.asarray(operator) @ states
+            np.sum(bras*ket, axis=0, out=expts[:,j])
+        return expts
@@ -1,6 +1,253 @@
+import os
+import shutil
+import tempfile
 import numpy as np
-from solvers import FieldToPath
-from joblib import Parallel, delayed
+from solvers import FieldToPath, BatchFieldToPath
+from observers import NullObserver
+from molecule import Rotor
+
+#: int; Default number of samples per task in streaming mode
+STREAM_CHUNKSIZE = 16
+
+
+def _batch_paths(fields, dt, rotor=None):
+    """Calculates the paths for a batch of fields with BatchFieldToPath.
+
+    Parameters
+    ----------
+    fields : numpy.array, shape=(batch,n,2)
+        Noisy fields.
+
+    dt : float
+        Difference of time between two adjacent time points.
+
+    rotor : dict, optional(default=None)
+        Keyword arguments m, B and mu of BatchFieldToPath.
+
+    Returns
+    ----------
+    path : numpy.array, shape=(batch,n,2)
+        Paths calculated from the fields.
+
+    """
+    path_solver = BatchFieldToPath(np.asarray(fields), dt, observer=NullObserver(),
+                                   **(rotor or {}))
+    path_solver.solve()
+    return path_solver.export()[1]
+
+
+def _noisy_fields(field, variance, seed, start, stop):
+    """Draws the noisy fields `start` to `stop` (exclusive).
+
+    Sample i is drawn from its own Philox generator seeded by the 
+    i-th child of `seed` (spawn key seed.spawn_key + (i,)), so any 
+    range of samples can be generated independently, e.g. by a worker, 
+    and each sample is the same however the samples are split up.
+
+    Parameters
+    ----------
+    field : numpy.array, shape=(n,2)
+        Control fields without noise.
+
+    variance : float
+        Scale of the relative noise.
+
+    seed : numpy.random.SeedSequence
+        Root of the generator streams.
+
+    start, stop : integer
+        Range of samples to draw.
+
+    Returns
+    ----------
+    noisy_field : numpy.array, shape=(stop-start,n,2)
+        Noisy fields, one per sample.
+
+    """
+    field = np.real(field)
+    noisy_field = np.empty((stop - start,) + field.shape)
+    for i in range(start, stop):
+        child = np.random.SeedSequence(seed.entropy, spawn_key=seed.spawn_key + (i,))
+        rng = np.random.Generator(np.random.Philox(child))
+        noisy_field[i - start] = rng.normal(0, variance, field.shape)
+    noisy_field += 1
+    noisy_field *= field
+    return noisy_field
+
+
+def _calc_chunk(field, variance, seed, path_file, start, stop, dt, rotor=None):
+    """Worker task: draws the noisy fields `start` to `stop` and writes 
+    their paths into a memory-mapped file, so that neither the fields 
+    nor the results are pickled.
+
+    Parameters
+    ----------
+    field, variance, seed :
+        See _noisy_fields.
+
+    path_file : str
+        .npy file to write paths into, shape=(numfield,n,2).
+
+    start, stop : integer
+        Range of samples to solve.
+
+    dt : float
+        Difference of time between two adjacent time points.
+
+    rotor : dict, optional(default=None)
+        Keyword arguments m, B and mu of BatchFieldToPath.
+
+    """
+    path = np.load(path_file, mmap_mode='r+')
+    path[start:stop] = _batch_paths(_noisy_fields(field, variance, seed, start, stop), dt, rotor)
+    path.flush()
+
+
+def _stream_chunk(field, variance, seed, start, stop, dt, rotor=None):
+    """Worker task: draws the noisy fields `start` to `stop` and returns 
+    their paths, shape=(stop-start,n,2).
+
+    """
+    return _batch_paths(_noisy_fields(field, variance, seed, start, stop), dt, rotor)
+
+
+class OnlineStatistics(object):
+    """Running mean and variance of a stream of equally shaped samples.
+
+    Samples are folded in one batch at a time with Welford's algorithm 
+    (in the pairwise form of Chan et al. for batches), so only the 
+    count, the mean and the sum of squared deviations are kept.
+
+    Parameters
+    ----------
+    shape : tuple
+        Shape of a single sample.
+
+    Attributes
+    ----------
+    count : integer
+        Number of samples folded in.
+
+    mean : numpy.array, shape=shape
+        Running mean.
+
+    """
+
+    def __init__(self, shape):
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self._m2 = np.zeros(shape)
+
+    def update(self, samples):
+        """Folds a batch of samples into the statistics.
+
+        Parameters
+        ----------
+        samples : numpy.array, shape=(k,)+shape
+            Batch of k samples.
+
+        """
+        samples = np.real(samples)
+        k = samples.shape[0]
+        if k == 0:
+            return
+        batch_mean = samples.mean(axis=0)
+        batch_m2 = ((samples - batch_mean)**2).sum(axis=0)
+        total = self.count + k
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * (k / total)
+        self._m2 = self._m2 + batch_m2 + delta**2 * (self.count * k / total)
+        self.count = total
+
+    @property
+    def variance(self):
+        """numpy.array; Running (population) variance."""
+        if self.count == 0:
+            return np.full(self._m2.shape, np.nan)
+        return self._m2 / self.count
+
+
+class P2Quantile(object):
+    """Streaming estimate of a quantile with the P-square algorithm of 
+    Jain and Chlamtac, applied independently to every element of 
+    equally shaped samples.
+
+    The estimator keeps five markers per element, so its memory does not 
+    grow with the number of samples.
+
+    Parameters
+    ----------
+    p : float
+        Quantile to estimate, in (0,1).
+
+    shape : tuple
+        Shape of a single sample.
+
+    """
+
+    def __init__(self, p, shape):
+        if not 0 < p < 1:
+            raise ValueError("Expect quantile to be in (0,1).")
+        self.p = p
+        self.count = 0
+        self._heights = np.zeros((5,) + tuple(shape))
+        self._positions = np.tile(np.arange(5.).reshape((5,) + (1,)*len(shape)),
+                                  (1,) + tuple(shape))
+        self._desired = np.array([0, 2*p, 4*p, 2+2*p, 4])
+        self._increment = np.array([0, p/2, p, (1+p)/2, 1])
+
+    def update(self, samples):
+        """Folds a batch of samples into the estimate.
+
+        Parameters
+        ----------
+        samples : numpy.array, shape=(k,)+shape
+            Batch of k samples.
+
+        """
+        for x in np.real(samples):
+            self._add(x)
+
+    def _add(self, x):
+        q, n = self._heights, self._positions
+        if self.count < 5:
+            q[self.count] = x
+            self.count += 1
+            if self.count == 5:
+                q.sort(axis=0)
+            return
+        self.count += 1
+        # cell containing x, extending the extreme markers if needed
+        np.minimum(q[0], x, out=q[0])
+        np.maximum(q[4], x, out=q[4])
+        for i in range(1, 4):
+            n[i][x < q[i]] += 1
+        n[4] += 1
+        desired = self._desired + (self.count-5) * self._increment
+        for i in range(1, 4):
+            d = desired[i] - n[i]
+            move = (((d >= 1) & (n[i+1] - n[i] > 1))
+                    | ((d <= -1) & (n[i-1] - n[i] < -1)))
+            if not move.any():
+                continue
+            d = np.where(move, np.sign(d), 0)
+            parabolic = q[i] + d / (n[i+1] - n[i-1]) * (
+                (n[i] - n[i-1] + d) * (q[i+1] - q[i]) / (n[i+1] - n[i])
+                + (n[i+1] - n[i] - d) * (q[i] - q[i-1]) / (n[i] - n[i-1]))
+            neighbour = np.where(d > 0, q[i+1], q[i-1])
+            distance = np.where(d > 0, n[i+1], n[i-1]) - n[i]
+            linear = q[i] + d * (neighbour - q[i]) / distance
+            ok = (q[i-1] < parabolic) & (parabolic < q[i+1])
+            q[i] = np.where(move, np.where(ok, parabolic, linear), q[i])
+            n[i] += d
+
+    @property
+    def value(self):
+        """numpy.array; Current estimate of the quantile."""
+        if self.count < 5:
+            return np.quantile(self._heights[:self.count], self.p, axis=0)
+        return self._heights[2].copy()
+
 
 class NoiseAnalyser(object):
     """Class for doing some noise analysis for a given field to calculate the mean and variance for the output path. 
@@ -32,6 +279,34 @@ class NoiseAnalyser(object):
     processors : int, optional(default=4)
         Number of proccessors for the parallelizing this part of the code.  
 
+    chunksize : int, optional(default=None)
+        Number of samples solved together by a worker per task. Default to 
+        an even split of the samples over the processors, or at most 
+        STREAM_CHUNKSIZE in streaming mode.
+
+    streaming : bool, optional(default=False)
+        If True, the paths are not stored. Noisy fields are generated and solved 
+        one wave of chunks at a time and every finished path is folded into 
+        running statistics, so at most processors*chunksize paths are held at 
+        once and memory does not grow with numfield.
+
+    quantiles : sequence of float, optional(default=None)
+        Quantiles of the path to estimate in streaming mode with P-square sketches.
+
+    seed : int or numpy.random.SeedSequence, optional(default=None)
+        Seed of the noise. Every sample is drawn from its own generator stream 
+        derived from the seed, so results are the same for a given seed 
+        regardless of `processors` and `chunksize`. Default to fresh entropy.
+
+    m : int, optional(default=constants.m)
+        Maximum energy quantum number of the rotor.
+
+    B : float, optional(default=constants.B)
+        Rotational constant of the rotor.
+
+    mu : float, optional(default=constants.mu)
+        Dipole moment of the rotor.
+
     Attributes
     ----------
     n : integer
@@ -52,11 +327,16 @@ class NoiseAnalyser(object):
     processors : int, optional(default=4)
         Number of proccessors for the parallelizing this part of the code.  
 
+    chunksize : int
+        Number of samples solved together by a worker per task.
+
     path : numpy.arrray shape(n,2*numfield)
-        Matrix that contains all paths that are calculate from noisy fields.
+        Matrix that contains all paths that are calculate from noisy fields. 
+        None until calc_path is called; never set in streaming mode.
 
     noisy_field : numpy.arrray shape(n,2*numfield)
-        Matrix that contains all noisy field controls.
+        Matrix that contains all noisy field controls. Only set by calc_noisy_field; 
+        the workers of calc_path draw their noisy fields themselves.
 
     pathmean : numpy.array, shape(n,2)
         Mean path which is calculated from all paths that are output of PathToField solver.
@@ -64,16 +344,36 @@ class NoiseAnalyser(object):
     pathvar : numpy.array, shape(n,2)
         Variance of the noisy field.
 
+    pathquantiles : numpy.array, shape(len(quantiles),n,2)
+        Estimated quantiles of the path, only calculated in streaming mode.
+
+    seed : numpy.random.SeedSequence
+        Root of the generator streams of the samples. Its `entropy` 
+        and `spawn_key` reproduce the noise.
+
     
     """
 
-    def __init__(self,smoothfield,dt,variance,numfield,processors=4):
+    def __init__(self,smoothfield,dt,variance,numfield,processors=4,chunksize=None,
+                 streaming=False,quantiles=None,seed=None,m=None,B=None,mu=None):
         self.field=smoothfield
         self.dt=dt
         self.numfield=numfield
         self.variance=variance
         self.processors = processors
-        self.path=np.empty((len(self.field), 2 * self.numfield),dtype=complex)
+        if chunksize is None:
+            chunksize = -(-numfield // max(processors, 1))
+            if streaming:
+                chunksize = min(chunksize, STREAM_CHUNKSIZE)
+        self.chunksize = max(int(chunksize), 1)
+        self.streaming = streaming
+        self.quantiles = [] if quantiles is None else list(quantiles)
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed = seed
+        # rotor parameters, passed on to the solvers of the workers
+        self._rotor = {'m': m, 'B': B, 'mu': mu}
+        self.path = None
         
  
     def calc_noisy_field(self):
@@ -81,15 +381,22 @@ class NoiseAnalyser(object):
         distribution to be added to the control field.
 
         """
-        noisy_field=np.empty((len(self.field), 2 * self.numfield), dtype=complex)
-        for i in range(self.numfield):
-            sx=np.random.normal(0, self.variance, len(self.field))
-            sy=np.random.normal(0, self.variance, len(self.field))
-            noisy_field[:,0+i*2]=self.field[:,0]+np.transpose(sx)*self.field[:,0]
-            noisy_field[:,1+i*2]=self.field[:,1]+np.transpose(sy)*self.field[:,1]
-            
-        self.noisy_field = noisy_field.astype(float)
-       
+        n = len(self.field)
+        noisy_field = self._noisy_fields(0, self.numfield)
+        self.noisy_field = noisy_field.transpose((1, 0, 2)).reshape((n, 2 * self.numfield))
+
+    def _noisy_fields(self, start, stop):
+        """Draws the noisy fields `start` to `stop` (exclusive) from their 
+        generator streams.
+
+        Returns
+        ----------
+        noisy_field : numpy.array, shape=(stop-start,n,2)
+            Noisy fields, one per sample.
+
+        """
+        return _noisy_fields(self.field, self.variance, self.seed, start, stop)
+
      
     def calc_a_path(self, i):
         """Calculates the path from PathToField for one noisy field. 
@@ -107,45 +414,103 @@ class NoiseAnalyser(object):
 
         """
         #def calc_a_path(i):
-        path_solver = FieldToPath(self.noisy_field[:,[i*2,i*2+1]], self.dt)
+        path_solver = FieldToPath(self._noisy_fields(i, i+1)[0], self.dt,
+                                  molecule=Rotor(**self._rotor),
+                                  observer=NullObserver())
         # Then invoke the solve() method of the path_solver object
         path_solver.solve()
         return path_solver.export()[1]
 
+    def calc_paths(self, start, stop):
+        """Calculates the paths for the noisy fields `start` to `stop` 
+        (exclusive) at once with BatchFieldToPath, in this process. 
+        analyze uses calc_path instead, which solves the chunks in 
+        worker processes; calc_paths is the in-process alternative, 
+        e.g. for a subset of the samples or where joblib is unavailable.
+
+        Parameters
+        ----------
+        start : integer
+            First noisy field.
+
+        stop : integer
+            One past the last noisy field.
+
+        Returns
+        ----------
+        path : numpy.array, shape=(n,2*(stop-start))
+            matrix containing the paths in the same layout as `path`.
+
+        """
+        n = len(self.field)
+        path = _batch_paths(self._noisy_fields(start, stop), self.dt, self._rotor)
+        return path.transpose((1, 0, 2)).reshape((n, 2*(stop-start)))
+
     def calc_path(self):
-        """Parallel version of calc_a_path to calculate the path for all noisy fields. 
-        
+        """Parallel version of calc_paths to calculate the path for all noisy fields. 
+        Each worker task draws `chunksize` noisy fields from their generator streams 
+        and solves them at once; the resulting paths are shared with the workers 
+        through a memory-mapped file in a temporary folder.
+
+        """
+        n = len(self.field)
+        folder = tempfile.mkdtemp(prefix='noiseAnalyzer_')
+        try:
+            path_file = os.path.join(folder, 'path.npy')
+            path = np.lib.format.open_memmap(path_file, mode='w+', dtype=float,
+                                             shape=(self.numfield, n, 2))
+            del path
+            from joblib import Parallel, delayed
+            starts = range(0, self.numfield, self.chunksize)
+            Parallel(n_jobs=self.processors)(
+                delayed(_calc_chunk)(self.field, self.variance, self.seed, path_file, start,
+                                     min(start + self.chunksize, self.numfield), self.dt,
+                                     self._rotor)
+                for start in starts)
+            path = np.asarray(np.load(path_file, mmap_mode='r'))
+            # the reshape of the transposed view copies into memory
+            self.path = path.transpose((1, 0, 2)).reshape((n, 2 * self.numfield))
+            del path
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def calc_path_streaming(self):
+        """Streaming version of calc_path and calc_statistic. Noisy fields are drawn 
+        by the workers for one wave of `processors` chunks at a time and solved in 
+        parallel, and the resulting paths are folded sample by sample, in order, into 
+        running mean, variance and quantile estimates instead of being stored.
 
         """
-        noisy_paths = Parallel(n_jobs=self.processors)(delayed(self.calc_a_path)(i) for i in range(0,self.numfield))
-        for i in range(0, len(noisy_paths)):
-            self.path[:,[i*2,i*2+1]] = noisy_paths[i]
+        n = len(self.field)
+        stats = OnlineStatistics((n, 2))
+        sketches = [P2Quantile(q, (n, 2)) for q in self.quantiles]
+        chunks = [(start, min(start + self.chunksize, self.numfield))
+                  for start in range(0, self.numfield, self.chunksize)]
+        from joblib import Parallel, delayed
+        with Parallel(n_jobs=self.processors) as parallel:
+            for w in range(0, len(chunks), self.processors):
+                wave = chunks[w:w + self.processors]
+                for paths in parallel(delayed(_stream_chunk)(self.field, self.variance, self.seed,
+                                                             start, stop, self.dt, self._rotor)
+                                      for start, stop in wave):
+                    # fold one sample at a time so that the result does not depend on the chunks
+                    for path in paths:
+                        stats.update(path[np.newaxis])
+                        for sketch in sketches:
+                            sketch.update(path[np.newaxis])
+        self.pathmean = stats.mean
+        self.pathvar = stats.variance
+        self.pathquantiles = np.array([sketch.value for sketch in sketches]).reshape((-1, n, 2))
  
     def calc_statistic(self):
         """Calculate the mean path from the calculated path from noisy fields. This method also calcules a matrix with the same dimension as the path that shows the variance of each point cooridante variance from the mean path.
        
 
         """
-        xcollec= np.zeros((len(self.path),self.numfield))
-        ycollec= np.zeros((len(self.path),self.numfield))
-        for j in range(len(self.path)):
-            for i in range(2*self.numfield):
-                mod=i%2
-                if mod==0:
-                    xcollec[j,int(i/2)]=self.path[j,i]
-                else:
-                    ycollec[j,int((i-1)/2)]=self.path[j,i]
-        pathxmean = np.zeros(len(self.path))
-        pathymean = np.zeros_like(pathxmean)
-        pathxvar = np.zeros_like(pathxmean)
-        pathyvar = np.zeros_like(pathxmean)
-        for i in range(len(self.path)):
-            pathxmean[i]=sum(xcollec[i,:])/self.numfield
-            pathymean[i]=sum(ycollec[i,:])/self.numfield
-            pathxvar[i] =np.var(xcollec[i,:])
-            pathyvar[i] =np.var(ycollec[i,:])
-        self.pathmean = np.stack((pathxmean,pathymean),axis=1)
-        self.pathvar = np.stack((pathxvar,pathyvar),axis=1)
+        # columns alternate x and y of each sample
+        collec = np.real(self.path).reshape((len(self.path), self.numfield, 2))
+        self.pathmean = collec.sum(axis=1)/self.numfield
+        self.pathvar = np.var(collec, axis=1)
 
     def analyze(self):
         """ This is a wraper of other member method to do the statistics.    
@@ -159,9 +524,11 @@ class NoiseAnalyser(object):
             variance of the path from noisy fields.
 
         """
-        self.calc_noisy_field()
-        self.calc_path()
-        self.calc_statistic()
+        if self.streaming:
+            self.calc_path_streaming()
+        else:
+            self.calc_path()
+            self.calc_statistic()
 
         return self.pathmean.astype(float), self.pathvar.astype(float)
 
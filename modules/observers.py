@@ -0,0 +1,173 @@
+'''Observers of the progress of a solver (solvers.Solver).
+
+A solver runs its time steps in chunks of `Observer.every` steps and
+hands an observer a Progress event after each chunk, so the steps
+themselves are not slowed down by progress reporting. NullObserver
+asks for no events at all and the steps run in a single plain loop.
+
+'''
+
+import abc
+import time
+import logging
+from collections import namedtuple
+
+#: Progress event of a solver. `step` of `total` steps are done after
+#: `elapsed` seconds, at `rate` steps per second since the (re)start,
+#: and `eta` seconds are left. `field_norm` is the norm of the current
+#: control field in atomic units, and `det` the determinant of matrix A
+#: of PathToField (None for other solvers).
+Progress = namedtuple('Progress', ['step', 'total', 'elapsed', 'rate', 'eta',
+                                   'field_norm', 'det'])
+
+
+class Observer(abc.ABC):
+    """Abstract base class for an observer of a solver.
+
+    Parameters
+    ----------
+    every: int or None, optional (default=None)
+        Number of steps between two progress events. No events are
+        sent if None.
+
+    min_interval: float, optional (default=0)
+        Skip events that are due less than `min_interval` seconds
+        after the last one sent.
+
+    Attributes
+    ----------
+    every: int or None
+        Number of steps between two progress events.
+
+    min_interval: float
+        Least time in seconds between two progress events.
+
+    """
+
+    def __init__(self, every=None, min_interval=0.0):
+        if every is not None and every < 1:
+            raise ValueError("Expect every to be a positive integer or None.")
+        ## Number of steps between two progress events
+        self.every = None if every is None else int(every)
+        ## Least time in seconds between two progress events
+        self.min_interval = min_interval
+        self._last = -float('inf')
+
+    def start(self, initial, total):
+        """Called before the first step.
+
+        Parameters
+        ----------
+        initial: int
+            Number of steps done before, e.g. when resuming.
+
+        total: int
+            Total number of steps.
+
+        """
+        self._last = -float('inf')
+
+    def due(self, final=False):
+        """Return True if an event is to be sent now. The final event
+        after the last step is always sent."""
+        now = time.perf_counter()
+        if not final and now - self._last < self.min_interval:
+            return False
+        self._last = now
+        return True
+
+    @abc.abstractmethod
+    def update(self, progress):
+        """Receive a Progress event."""
+        pass
+
+    def close(self):
+        """Called after the last step."""
+        pass
+
+
+class NullObserver(Observer):
+    """Observer that receives no events and adds no overhead."""
+
+    def __init__(self):
+        super().__init__(None)
+
+    def update(self, progress):
+        pass
+
+
+class TqdmObserver(Observer):
+    """Observer showing a tqdm progress bar with the field norm and
+    the determinant of A as postfix.
+
+    Parameters
+    ----------
+    every: int, optional (default=100)
+        Number of steps between two updates of the bar.
+
+    min_interval: float, optional (default=0.1)
+        Least time in seconds between two updates of the bar.
+
+    **kwargs:
+        Passed on to tqdm.tqdm.
+
+    """
+
+    def __init__(self, every=100, min_interval=0.1, **kwargs):
+        super().__init__(every, min_interval)
+        self._kwargs = kwargs
+        self._bar = None
+
+    def start(self, initial, total):
+        super().start(initial, total)
+        import tqdm
+        self._bar = tqdm.tqdm(initial=initial, total=total, **self._kwargs)
+
+    def update(self, progress):
+        postfix = {'field': '{:.3e}'.format(progress.field_norm)}
+        if progress.det is not None:
+            postfix['det'] = '{:.3e}'.format(progress.det)
+        self._bar.set_postfix(postfix, refresh=False)
+        self._bar.update(progress.step - self._bar.n)
+
+    def close(self):
+        if self._bar is not None:
+            self._bar.close()
+            self._bar = None
+
+
+class LoggingObserver(Observer):
+    """Observer writing progress events to a logger.
+
+    Parameters
+    ----------
+    every: int, optional (default=1000)
+        Number of steps between two log records.
+
+    min_interval: float, optional (default=10)
+        Least time in seconds between two log records.
+
+    logger: logging.Logger, optional (default=None)
+        Logger to write to. Default to the logger of this module.
+
+    level: int, optional (default=logging.INFO)
+        Level of the log records.
+
+    """
+
+    def __init__(self, every=1000, min_interval=10.0, logger=None,
+                 level=logging.INFO):
+        super().__init__(every, min_interval)
+        ## Logger written to
+        self.logger = logging.getLogger(__name__) if logger is None else logger
+        ## Level of the log records
+        self.level = level
+
+    def update(self, progress):
+        message = "step %d/%d, %.1f steps/s, eta %.0f s, |field| %.3e"
+        args = [progress.step, progress.total, progress.rate, progress.eta,
+                progress.field_norm]
+        if progress.det is not None:
+            message += ", det(A) %.3e"
+            args.append(progress.det)
+        self.logger.log(self.level, message, *args)
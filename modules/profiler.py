@@ -0,0 +1,205 @@
+'''Opt-in profiler of the hot paths of the solvers.
+
+Profiler replaces the profiled methods on their classes with timing
+wrappers while it is enabled and puts the original methods back when
+it is disabled, so the methods cost nothing extra when not profiled.
+For every method it counts the calls and accumulates the total time
+spent in it and its self time, i.e. the total time minus the time spent
+in other profiled methods called from it. Only the current process is
+profiled, not e.g. joblib workers.
+
+Example::
+
+    with Profiler() as profiler:
+        solver.solve()
+    print(profiler.table())
+
+'''
+
+import json
+import time
+import importlib
+
+#: list; Methods profiled by default, as (module, class, method)
+TARGETS = [
+    ('solvers', 'PathToField', '_get_field'),
+    ('solvers', 'PathToField', '_get_system'),
+    ('molecule', 'Rotor', 'evolve'),
+    ('molecule', 'Rotor', 'evolve_magnus'),
+    ('molecule', 'Rotor', 'update_field'),
+    ('molecule', 'Rotor', 'set_field'),
+    ('molecule', 'Rotor', '_get_hamiltonian'),
+    ('molecule', 'Rotor', '_append_state'),
+    ('propagators', 'ExpmPropagator', 'propagate'),
+    ('propagators', 'ExactPropagator', 'propagate'),
+    ('propagators', 'SplitOperatorPropagator', 'propagate'),
+    ('propagators', 'KrylovPropagator', 'propagate'),
+    ('state', 'State', 'update'),
+    ('state', 'State', 'get_expt'),
+    ('functions', 'BandedOperator', 'expt'),
+    ('functions', 'BandedStack', 'expt'),
+    ('history', 'History', '_push'),
+]
+
+
+class Profiler(object):
+    """Call counts and timers of methods in the solver hot paths.
+
+    Parameters
+    ----------
+    targets: list of tuples, optional (default=TARGETS)
+        Methods to profile, as (module, class, method) names.
+
+    Attributes
+    ----------
+    targets: list of tuples
+        Methods profiled.
+
+    wall: float
+        Time in seconds the profiler has been enabled.
+
+    """
+
+    def __init__(self, targets=None):
+        ## Methods profiled, as (module, class, method)
+        self.targets = list(TARGETS if targets is None else targets)
+        ## Time in seconds the profiler has been enabled
+        self.wall = 0.0
+        # [calls, total time, self time] per method
+        self._stats = {}
+        # (class, method name, original or None) of the wrapped methods
+        self._patched = []
+        # time spent in profiled callees, per active call
+        self._children = []
+        self._start = None
+
+    @property
+    def enabled(self):
+        """True while the methods are wrapped."""
+        return self._start is not None
+
+    def enable(self):
+        """Wrap the target methods and start the wall clock."""
+        if self.enabled:
+            return
+        try:
+            for module, cls_name, name in self.targets:
+                cls = getattr(importlib.import_module(module), cls_name)
+                original = cls.__dict__.get(name)
+                label = cls_name + '.' + name
+                setattr(cls, name, self._wrap(getattr(cls, name), label))
+                self._patched.append((cls, name, original))
+        except Exception:
+            # leave no method wrapped if a target does not resolve
+            self._restore()
+            raise
+        self._start = time.perf_counter()
+
+    def disable(self):
+        """Put the original methods back and stop the wall clock."""
+        if not self.enabled:
+            return
+        self.wall += time.perf_counter() - self._start
+        self._start = None
+        self._restore()
+
+    def _restore(self):
+        """Put the original methods back on their classes."""
+        for cls, name, original in reversed(self._patched):
+            if original is None:
+                delattr(cls, name)
+            else:
+                setattr(cls, name, original)
+        self._patched = []
+
+    def reset(self):
+        """Clear all counts and timers."""
+        self._stats.clear()
+        self.wall = 0.0
+        if self.enabled:
+            self._start = time.perf_counter()
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def _wrap(self, func, label):
+        """Return a wrapper of `func` that records its calls under
+        `label`."""
+        stats = self._stats
+        children = self._children
+        clock = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            children.append(0.0)
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                inner = children.pop()
+                record = stats.get(label)
+                if record is None:
+                    record = stats[label] = [0, 0.0, 0.0]
+                record[0] += 1
+                record[1] += elapsed
+                record[2] += elapsed - inner
+                if children:
+                    children[-1] += elapsed
+        wrapper.__wrapped__ = func
+        wrapper.__name__ = getattr(func, '__name__', label)
+        wrapper.__doc__ = getattr(func, '__doc__', None)
+        return wrapper
+
+    def stats(self):
+        """Return the counts and timers.
+
+        Returns
+        -------
+        stats: dict
+            For each called method ('Class.method'), a dict with the
+            number of `calls` and the `total` and `self` time in
+            seconds.
+
+        """
+        return {label: {'calls': calls, 'total': total, 'self': own}
+                for label, (calls, total, own) in self._stats.items()}
+
+    def to_json(self, indent=None):
+        """Return the counts and timers and the wall time as JSON."""
+        wall = self.wall
+        if self.enabled:
+            wall += time.perf_counter() - self._start
+        return json.dumps({'wall': wall, 'methods': self.stats()},
+                          indent=indent, sort_keys=True)
+
+    def table(self, sort='self'):
+        """Return the counts and timers as a text table.
+
+        Parameters
+        ----------
+        sort: str, optional (default='self')
+            Column to sort by in descending order, 'calls', 'total'
+            or 'self'.
+
+        Returns
+        -------
+        table: str
+
+        """
+        data = json.loads(self.to_json())
+        wall = data['wall']
+        rows = sorted(data['methods'].items(), key=lambda item: -item[1][sort])
+        lines = ["{:<34}{:>10}{:>12}{:>12}{:>12}{:>8}".format(
+            "method", "calls", "total [s]", "self [s]", "per call", "self%")]
+        for label, record in rows:
+            per_call = record['total']/record['calls']
+            share = 100*record['self']/wall if wall > 0 else 0.0
+            lines.append("{:<34}{:>10d}{:>12.4f}{:>12.4f}{:>10.2f}us{:>7.1f}%"
+                         .format(label, record['calls'], record['total'],
+                                 record['self'], 1e6*per_call, share))
+        lines.append("{:<34}{:>10}{:>12.4f}".format("wall", "", wall))
+        return "\n".join(lines)
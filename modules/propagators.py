@@ -0,0 +1,494 @@
+'''Implementation of propagators used by molecule.Rotor to evolve its
+state over a single time step with the control field held constant.
+
+scipy is imported on first use so that importing this module (and 
+molecule and solvers with it) stays cheap. A propagator then keeps 
+scipy.linalg as an attribute, so the import is not repeated per step.
+
+'''
+
+import abc
+import numpy as np
+import functions as f
+import constants as const
+
+
+def _real_matmul(A, x):
+    """Multiply a real matrix with a complex vector without casting the
+    matrix to complex.
+
+    Parameters
+    ----------
+    A: numpy.array, shape=(N,N)
+        Real matrix.
+
+    x: numpy.array, shape=(N,) or (N,k)
+        Complex vector or matrix.
+
+    Returns
+    -------
+    y: numpy.array, shape=(N,) or (N,k)
+        Complex result A @ x.
+
+    """
+    x = np.ascontiguousarray(x, dtype=complex)
+    y = A @ x.view(float).reshape((x.shape[0], -1))
+    return y.view(complex).reshape(x.shape)
+
+
+class _ScipyLinalg(object):
+    """Descriptor that imports scipy.linalg on first access and caches 
+    it in the instance, so later accesses are plain attribute lookups.
+
+    """
+
+    def __get__(self, obj, cls):
+        from scipy import linalg
+        if obj is not None:
+            obj.__dict__['_linalg'] = linalg
+        return linalg
+
+
+#: int; Largest basis size (2m+1) for which ExactPropagator.propagate_batch
+#: uses a batched dense eigendecomposition instead of one tridiagonal
+#: eigendecomposition per state
+_DENSE_BATCH_MAX = 65
+
+
+class Propagator(abc.ABC):
+    """Abstract base class for propagators of a rotor.
+
+    A propagator applies the unitary operator exp(-i H dt / hbar) to
+    a state vector, where the rotor hamiltonian
+
+    H = B*diag(k^2) - mu*(e_x*cosphi + e_y*sinphi)
+
+    is evaluated with a control field that is constant over the step.
+
+    Parameters
+    ----------
+    m: int
+        Maximum energy quantum number.
+
+    B: float, optional (default=constants.B)
+        Rotational constant.
+
+    mu: float, optional (default=constants.mu)
+        Dipole moment.
+
+    """
+
+    # scipy.linalg, imported on first use
+    _linalg = _ScipyLinalg()
+
+    def __init__(self, m, B=None, mu=None):
+        ## Maximum energy quantum number
+        self.m = m
+        ## Rotational constant
+        self.B = const.B if B is None else B
+        ## Dipole moment
+        self.mu = const.mu if mu is None else mu
+        ## Diagonal of the field-free hamiltonian B*diag(k^2)
+        self._energy = self.B * np.arange(-m, m+1)**2
+
+    def __getstate__(self):
+        # modules cannot be pickled; scipy.linalg is imported again
+        state = self.__dict__.copy()
+        state.pop('_linalg', None)
+        return state
+
+    @abc.abstractmethod
+    def propagate(self, ket, field, dt):
+        """Evolve a state vector by `dt` forward in time.
+
+        Parameters
+        ----------
+        ket: numpy.array, shape=(2m+1,)
+            State amplitudes at the beginning of the step.
+
+        field: numpy.array, shape=(2,)
+            External field expressed as (e_x, e_y), held constant
+            over the step.
+
+        dt: float
+            Step size of time.
+
+        Returns
+        -------
+        ket: numpy.array, shape=(2m+1,)
+            State amplitudes at the end of the step.
+
+        """
+        pass
+
+    def propagate_batch(self, kets, fields, dt):
+        """Evolve several state vectors by `dt` forward in time, each 
+        under its own field.
+
+        Parameters
+        ----------
+        kets: numpy.array, shape=(2m+1,k)
+            State amplitudes at the beginning of the step, one state 
+            per column.
+
+        fields: numpy.array, shape=(k,2)
+            External field for each state expressed as (e_x, e_y).
+
+        dt: float
+            Step size of time.
+
+        Returns
+        -------
+        kets: numpy.array, shape=(2m+1,k)
+            State amplitudes at the end of the step.
+
+        """
+        out = np.empty(kets.shape, dtype=complex)
+        for i in range(kets.shape[1]):
+            out[:,i] = self.propagate(kets[:,i], fields[i], dt)
+        return out
+
+    def propagate_times(self, ket, field, dts):
+        """Evolve a state vector forward in time by each of several 
+        time differences under the same constant field.
+
+        Parameters
+        ----------
+        ket: numpy.array, shape=(2m+1,)
+            State amplitudes at the beginning.
+
+        field: numpy.array, shape=(2,)
+            External field expressed as (e_x, e_y).
+
+        dts: numpy.array, shape=(k,)
+            Time differences.
+
+        Returns
+        -------
+        kets: numpy.array, shape=(2m+1,k)
+            State amplitudes after each time difference.
+
+        """
+        out = np.empty((len(ket), len(dts)), dtype=complex)
+        for i, dt in enumerate(dts):
+            out[:,i] = self.propagate(ket, field, dt)
+        return out
+
+    def _field_phase(self, field):
+        """Split the field into its amplitude and the diagonal phase
+        transformation that makes the coupling real.
+
+        With theta the polar angle of the field,
+        e_x*cosphi + e_y*sinphi = D^+ (|e|*cosphi) D
+        where D = diag(exp(i*k*theta)).
+
+        """
+        ex, ey = float(np.real(field[0])), float(np.real(field[1]))
+        theta = np.arctan2(ey, ex)
+        phase = np.exp(1j * theta * np.arange(-self.m, self.m+1))
+        return np.hypot(ex, ey), phase
+
+    def _field_phases(self, fields):
+        """Batched version of `_field_phase` for fields of shape (k,2).
+
+        Returns the amplitudes with shape (k,) and the diagonals of 
+        the phase transformations as columns of shape (2m+1,k).
+
+        """
+        fields = np.real(fields)
+        theta = np.arctan2(fields[:,1], fields[:,0])
+        phases = np.exp(1j * np.multiply.outer(np.arange(-self.m, self.m+1),
+                                               theta))
+        return np.hypot(fields[:,0], fields[:,1]), phases
+
+
+class ExpmPropagator(Propagator):
+    """Propagator using a dense matrix exponential of the full
+    hamiltonian at every step.
+
+    This is the reference implementation and costs O(m^3) per step, 
+    which is impractical for m in the hundreds.
+
+    Parameters
+    ----------
+    m: int
+        Maximum energy quantum number.
+
+    B, mu: float, optional
+        Rotational constant and dipole moment, see Propagator.
+
+    """
+
+    def __init__(self, m, B=None, mu=None):
+        super().__init__(m, B, mu)
+        self._h0 = self.B * f.operator('energy', m)
+        self._hx = -self.mu * f.operator('cosphi', m)
+        self._hy = -self.mu * f.operator('sinphi', m)
+        # preallocated hamiltonian and coupling term
+        self._H = np.empty((2*m+1, 2*m+1), dtype=complex)
+        self._coupling = np.empty((2*m+1, 2*m+1), dtype=complex)
+
+    def propagate(self, ket, field, dt):
+        # H = H0 + e_x*Hx + e_y*Hy, assembled in place
+        H = np.multiply(self._hx, field[0], out=self._H)
+        H += self._h0
+        H += np.multiply(self._hy, field[1], out=self._coupling)
+        H *= (-1j/const.hbar)*dt
+        U = self._linalg.expm(H)
+        return U @ ket
+
+
+class ExactPropagator(Propagator):
+    """Propagator using the eigendecomposition of the real symmetric
+    tridiagonal form of the hamiltonian.
+
+    The field is rotated onto the x-axis by a diagonal phase
+    transformation, after which the hamiltonian is real, symmetric
+    and tridiagonal. Its eigendecomposition costs O(m^2) and gives
+    the propagator to machine precision.
+
+    Parameters
+    ----------
+    m: int
+        Maximum energy quantum number.
+
+    B, mu: float, optional
+        Rotational constant and dipole moment, see Propagator.
+
+    """
+
+    def __init__(self, m, B=None, mu=None):
+        super().__init__(m, B, mu)
+        # preallocated off-diagonal of the tridiagonal hamiltonian
+        self._offdiag = np.empty(2*m)
+
+    def propagate(self, ket, field, dt):
+        amplitude, phase = self._field_phase(field)
+        if amplitude == 0:
+            return np.exp((-1j/const.hbar)*self._energy*dt) * ket
+        offdiag = self._offdiag
+        offdiag.fill(-0.5*self.mu*amplitude)
+        w, v = self._linalg.eigh_tridiagonal(self._energy, offdiag)
+        x = _real_matmul(v.T, phase * ket)
+        x *= np.exp((-1j/const.hbar)*w*dt)
+        return np.conj(phase) * _real_matmul(v, x)
+
+    def propagate_times(self, ket, field, dts):
+        # a single eigendecomposition serves all time differences
+        amplitude, phase = self._field_phase(field)
+        dts = np.asarray(dts, dtype=float)
+        if amplitude == 0:
+            return np.exp((-1j/const.hbar)*np.multiply.outer(self._energy, dts)) * ket[:,None]
+        offdiag = self._offdiag
+        offdiag.fill(-0.5*self.mu*amplitude)
+        w, v = self._linalg.eigh_tridiagonal(self._energy, offdiag)
+        x = _real_matmul(v.T, phase * ket)
+        x = x[:,None] * np.exp((-1j/const.hbar)*np.multiply.outer(w, dts))
+        return np.conj(phase)[:,None] * _real_matmul(v, x)
+
+    def propagate_batch(self, kets, fields, dt):
+        n = 2*self.m + 1
+        if n > _DENSE_BATCH_MAX:
+            # a dense eigendecomposition per state costs O(m^3)
+            return super().propagate_batch(kets, fields, dt)
+        amplitudes, phases = self._field_phases(fields)
+        T = np.zeros((len(amplitudes), n, n))
+        i = np.arange(n)
+        T[:, i, i] = self._energy
+        T[:, i[:-1], i[1:]] = -0.5*self.mu*amplitudes[:,None]
+        T[:, i[1:], i[:-1]] = -0.5*self.mu*amplitudes[:,None]
+        w, v = np.linalg.eigh(T)
+        x = np.einsum('bji,jb->ib', v, phases * kets)
+        x *= np.exp((-1j/const.hbar)*w.T*dt)
+        return np.conj(phases) * np.einsum('bij,jb->ib', v, x)
+
+
+class SplitOperatorPropagator(Propagator):
+    """Propagator using symmetric (Strang) splitting between the
+    field-free hamiltonian and the dipole coupling.
+
+    The field-free part B*diag(k^2) is diagonal and the coupling is a
+    phase-rotated multiple of cosphi, whose eigendecomposition is
+    computed once at construction. A step therefore only costs two
+    real matrix-vector products per substep. The local error is
+    O((dt/substeps)^3).
+
+    Parameters
+    ----------
+    m: int
+        Maximum energy quantum number.
+
+    substeps: int, optional (default=1)
+        Number of splitting substeps per time step. Larger values
+        are more accurate but proportionally slower.
+
+    B, mu: float, optional
+        Rotational constant and dipole moment, see Propagator.
+
+    """
+
+    def __init__(self, m, substeps=1, B=None, mu=None):
+        super().__init__(m, B, mu)
+        if substeps < 1:
+            raise ValueError("Expect substeps to be a positive integer.")
+        self.substeps = int(substeps)
+        self._cos_w, self._cos_v = self._linalg.eigh_tridiagonal(
+            np.zeros(2*m+1), np.full(2*m, 0.5))
+
+    def propagate(self, ket, field, dt):
+        amplitude, phase = self._field_phase(field)
+        h = dt / self.substeps
+        half = np.exp((-0.5j/const.hbar)*self._energy*h)
+        coupling = np.exp((1j/const.hbar)*self.mu*amplitude*self._cos_w*h)
+        x = phase * half * ket
+        for s in range(self.substeps):
+            if s > 0:
+                x *= half**2
+            x = _real_matmul(self._cos_v.T, x)
+            x *= coupling
+            x = _real_matmul(self._cos_v, x)
+        return np.conj(phase) * half * x
+
+    def propagate_batch(self, kets, fields, dt):
+        amplitudes, phases = self._field_phases(fields)
+        h = dt / self.substeps
+        half = np.exp((-0.5j/const.hbar)*self._energy*h)[:,None]
+        coupling = np.exp((1j/const.hbar)*self.mu*h
+                          * np.multiply.outer(self._cos_w, amplitudes))
+        x = phases * half * kets
+        for s in range(self.substeps):
+            if s > 0:
+                x *= half**2
+            x = _real_matmul(self._cos_v.T, x)
+            x *= coupling
+            x = _real_matmul(self._cos_v, x)
+        return np.conj(phases) * half * x
+
+
+class KrylovPropagator(Propagator):
+    """Propagator using the Lanczos (Krylov subspace) approximation of
+    the propagator applied to the state.
+
+    The hamiltonian is rotated to its real tridiagonal form as in
+    ExactPropagator, and the state is propagated within the Krylov
+    subspace spanned by repeated products of the hamiltonian with it.
+    The subspace is extended until both the a posteriori estimate 
+    beta_j*|c_j| and the change of the result from the previous 
+    subspace drop below `tol`. The first alone can be small long 
+    before convergence, e.g. for large steps. A step costs O(k**2*m)
+    for the fully reorthogonalized Lanczos basis, where k is the
+    dimension of the subspace (typically 10 to 30 for the states
+    reached by a control field), so this is the fastest accurate
+    propagator for m in the hundreds. Steps that would need more than
+    `maxiter` basis vectors fall back to ExactPropagator.
+
+    Parameters
+    ----------
+    m: int
+        Maximum energy quantum number.
+
+    B, mu: float, optional
+        Rotational constant and dipole moment, see Propagator.
+
+    tol: float, optional (default=1e-12)
+        Tolerated error per step, as 2-norm relative to the norm of 
+        the state. Below about 1e-13 round-off dominates for large m.
+
+    maxiter: int, optional (default=64)
+        Largest dimension of the Krylov subspace.
+
+    """
+
+    def __init__(self, m, B=None, mu=None, tol=1e-12, maxiter=64):
+        super().__init__(m, B, mu)
+        self.tol = tol
+        self.maxiter = max(1, min(int(maxiter), 2*m+1))
+        self._exact = ExactPropagator(m, self.B, self.mu)
+        # preallocated Lanczos basis, one vector per row
+        self._basis = np.empty((self.maxiter, 2*m+1), dtype=complex)
+        self._alpha = np.empty(self.maxiter)
+        self._beta = np.empty(self.maxiter)
+
+    def propagate(self, ket, field, dt):
+        amplitude, phase = self._field_phase(field)
+        if amplitude == 0:
+            return np.exp((-1j/const.hbar)*self._energy*dt) * ket
+        eigh_tridiagonal = self._linalg.eigh_tridiagonal
+        offdiag = -0.5*self.mu*amplitude
+        x = phase * ket
+        norm = np.linalg.norm(x)
+        if norm == 0:
+            return np.zeros_like(x)
+        V, alpha, beta = self._basis, self._alpha, self._beta
+        V[0] = x / norm
+        previous = np.zeros(0, dtype=complex)
+        for j in range(self.maxiter):
+            v = V[j]
+            w = self._energy * v
+            w[1:] += offdiag * v[:-1]
+            w[:-1] += offdiag * v[1:]
+            alpha[j] = np.vdot(v, w).real
+            # full reorthogonalization against the basis
+            w -= (V[:j+1].conj() @ w) @ V[:j+1]
+            beta[j] = np.linalg.norm(w)
+            s, u = eigh_tridiagonal(alpha[:j+1], beta[:j])
+            c = u @ (np.exp((-1j/const.hbar)*s*dt) * u[0])
+            # the change from the result of the previous subspace 
+            # estimates the error of that result, and so bounds the 
+            # error of this one
+            change = np.inf
+            if j:
+                change = np.hypot(np.linalg.norm(c[:j] - previous), abs(c[j]))
+            if max(beta[j]*abs(c[j]), change) < self.tol or beta[j] < 1e-300:
+                return np.conj(phase) * (norm * (c @ V[:j+1]))
+            previous = c
+            if j+1 < self.maxiter:
+                V[j+1] = w / beta[j]
+        return self._exact.propagate(ket, field, dt)
+
+
+#: dict; Propagators available to molecule.Rotor, keyed by name
+PROPAGATORS = {'expm': ExpmPropagator,
+               'exact': ExactPropagator,
+               'split': SplitOperatorPropagator,
+               'krylov': KrylovPropagator}
+
+
+def make_propagator(name, m, substeps=1, B=None, mu=None):
+    """Create a propagator by name.
+
+    Parameters
+    ----------
+    name: str
+        One of 'expm', 'exact', 'split' or 'krylov'.
+
+    m: int
+        Maximum energy quantum number.
+
+    substeps: int, optional (default=1)
+        Number of substeps per time step, only used by the 'split'
+        propagator.
+
+    B: float, optional (default=constants.B)
+        Rotational constant.
+
+    mu: float, optional (default=constants.mu)
+        Dipole moment.
+
+    Returns
+    -------
+    propagator: Propagator object
+
+    Raises
+    ------
+    ValueError:
+        If `name` is not a known propagator.
+
+    """
+    if name not in PROPAGATORS:
+        errmsg = ("Unknown propagator '" + str(name) + "'. Expect one of "
+                  + ", ".join(sorted(PROPAGATORS)) + ".")
+        raise ValueError(errmsg)
+    if name == 'split':
+        return SplitOperatorPropagator(m, substeps, B, mu)
+    return PROPAGATORS[name](m, B, mu)
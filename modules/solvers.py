@@ -1,7 +1,9 @@
-'''Module solvers implements two classes to calculate 
+'''Module solvers implements classes to calculate 
 
-    1. control fields for a given path (PathToField), and 
-    2. resulting path from a given field (FieldToPath). 
+    1. control fields for a given path (PathToField), 
+    2. resulting path from a given field (FieldToPath), and 
+    3. resulting paths from many given fields at once 
+       (BatchFieldToPath). 
 
 '''
 
@@ -9,10 +11,13 @@ import numpy as np
 import math
 import functions as f
 import constants as const
-from state import State
 from molecule import Rotor
+from propagators import make_propagator
+from integrators import AdaptiveIntegrator, GridFunction, gauss_nodes
+from checkpoint import Checkpoint
+from observers import Progress, TqdmObserver
 import abc
-import tqdm
+import time
 
 class Solver(abc.ABC):
     """Abstract base class for a solver used for quantum control.
@@ -34,6 +39,82 @@ class Solver(abc.ABC):
         """Export the calculated results as arrays."""
         pass
 
+    def _run(self, step, start=1, checkpoint=None):
+        """Run the time steps `start` to n-1 of a solver.
+
+        The steps are run in plain loops over chunks that end where 
+        a progress event (see observers.Observer) or a checkpoint is 
+        due, so neither costs anything per step.
+
+        Parameters
+        ----------
+        step: callable
+            step(j) advances the solver to the j-th time point.
+
+        start: int, optional (default=1)
+            First time point to advance to.
+
+        checkpoint: checkpoint.Checkpoint, optional (default=None)
+            If given, the molecule is checkpointed every 
+            `checkpoint.interval` steps and at the end.
+
+        """
+        observer = self.observer
+        every = observer.every
+        interval = None if checkpoint is None else checkpoint.interval
+        total = self.n - 1
+        observer.start(start-1, total)
+        begin = time.perf_counter()
+        done = start - 1
+        while done < total:
+            stop = total
+            for k in (every, interval):
+                if k is not None:
+                    stop = min(stop, (done//k + 1)*k)
+            for j in range(done+1, stop+1):
+                step(j)
+            done = stop
+            if checkpoint is not None and checkpoint.due(done):
+                checkpoint.save(done+1, self.molecule)
+            if every is not None and (done % every == 0 or done == total) \
+                    and observer.due(done == total):
+                observer.update(self._progress(done, total, start-1, begin))
+        if checkpoint is not None and not checkpoint.due(total):
+            checkpoint.save(self.n, self.molecule)
+        observer.close()
+
+    def _progress(self, done, total, initial, begin):
+        """Return the Progress event after `done` of `total` steps, 
+        `initial` of which were done before the run started at 
+        `begin`."""
+        elapsed = time.perf_counter() - begin
+        rate = (done - initial)/elapsed if elapsed > 0 else float('inf')
+        eta = (total - done)/rate if rate > 0 else float('inf')
+        field_norm, det = self._metrics(done)
+        return Progress(done, total, elapsed, rate, eta, field_norm, det)
+
+    def _metrics(self, j):
+        """Return the norm of the current field and the determinant 
+        of A (None if not applicable) at the j-th time point."""
+        return float(np.linalg.norm(np.real(self.molecule.field))), None
+
+    def _checkpointed_solve(self, step, checkpoint, interval):
+        """Run all time steps, checkpointing into a new file 
+        `checkpoint` (if not None)."""
+        if checkpoint is None:
+            self._run(step)
+            return
+        checkpoint = Checkpoint(checkpoint, interval)
+        checkpoint.start(1, self.molecule)
+        self._run(step, 1, checkpoint)
+
+    def _resume(self, step, checkpoint, interval):
+        """Continue the time steps from the last checkpoint in the 
+        file `checkpoint`."""
+        checkpoint = Checkpoint(checkpoint, interval)
+        start = checkpoint.load(self.molecule)
+        self._run(step, start, checkpoint)
+
 class PathToField(Solver):
     """PathToField is a solver that solves the control fields for a 
     given path of dipole moment projection.
@@ -56,7 +137,13 @@ class PathToField(Solver):
 
     molecule: Molecule object, optional (default=Rotor)
         System of interest. Default to a Rotor molecule with a system 
-        dimension of m=8 specified in constants.py.
+        dimension of m=8 specified in constants.py. Pass e.g. 
+        Rotor(m=128, B=..., mu=...) for another basis size or other 
+        molecular constants.
+
+    observer: Observer object, optional (default=TqdmObserver())
+        Receives progress events of `solve` (see observers). Pass 
+        observers.NullObserver() to run without progress reporting.
 
     Attributes
     ----------
@@ -75,9 +162,12 @@ class PathToField(Solver):
     time: numpy.array, shape=(n,)
         Time vector in atomic units.
 
+    observer: Observer object
+        Observer of the progress of `solve`.
+
     """
 
-    def __init__(self, path_desired, dt=1000, molecule=None):
+    def __init__(self, path_desired, dt=1000, molecule=None, observer=None):
         # Create a Rotor object as the system of interest if not 
         # provided by the user
         if molecule is None:
@@ -85,7 +175,9 @@ class PathToField(Solver):
             ## Default value is a rotor (solver.molecule.Rotor)
             self.molecule = Rotor(const.m)
         else:
-            self.molecule = rotor
+            self.molecule = molecule
+        ## Observer of the progress of `solve` (observers.Observer)
+        self.observer = TqdmObserver() if observer is None else observer
 
         ## Path specified
         self.path = path_desired
@@ -97,41 +189,84 @@ class PathToField(Solver):
         self._t_final = self.n * self.dt
         ## Time vector in unit of ?
         self.time = np.arange(self._t_final, step=self.dt, dtype=float)
-        self._ddpath = np.stack((f.d2dt2(self.path[:,0], self.dt),
-                                 f.d2dt2(self.path[:,1], self.dt)), axis=1)
+        self._ddpath = f.d2dt2(self.path, self.dt)
 
         # operators used only by private methods within class instance
+        # (banded, so that expectation values cost O(m), and shared 
+        # between instances with the same m)
         m = self.molecule.m
-        self._op1 = (f.cosphi(m)
-                     + 4*f.sinphi(m)@f.ddphi(m)
-                     - 4*f.cosphi(m)@f.d2dphi2(m))
-        self._op2 = (f.sinphi(m)
-                     - 4*f.cosphi(m)@f.ddphi(m)
-                     - 4*f.sinphi(m)@f.d2dphi2(m))
-        self._cosphi2 = f.cosphi(m) @ f.cosphi(m)
-        self._sinphi2 = f.sinphi(m) @ f.sinphi(m)
-        self._cosphi_sinphi = f.cosphi(m) @ f.sinphi(m)
-        self._sinphi_cosphi = f.sinphi(m) @ f.cosphi(m)
+        self._op1 = f.operator('op1', m, banded=True)
+        self._op2 = f.operator('op2', m, banded=True)
+        self._cosphi2 = f.operator('cosphi2', m, banded=True)
+        self._sinphi2 = f.operator('sinphi2', m, banded=True)
+        self._cosphi_sinphi = f.operator('cosphi_sinphi', m, banded=True)
+        self._sinphi_cosphi = f.operator('sinphi_cosphi', m, banded=True)
+        # all moments needed per step, evaluated in a single pass
+        self._moments = f.BandedStack([self._sinphi2, self._cosphi2,
+                                       self._cosphi_sinphi,
+                                       self._sinphi_cosphi,
+                                       self._op1, self._op2])
+
+        self.molecule.reserve(self.n)
 
         #calc and set initial field, but not using molecule.update_field()
         field = self._get_field(0, real=True)
         self.molecule.set_field(field)
 
-    def solve(self):
+    def solve(self, checkpoint=None, interval=1000):
         """Calculate the control field required for each time step.
+
+        Parameters
+        ----------
+        checkpoint: str, optional (default=None)
+            If given, the state of the solve is written to this file 
+            (see checkpoint.Checkpoint) every `interval` steps, so 
+            that an interrupted solve can be continued with `resume`.
+
+        interval: int, optional (default=1000)
+            Number of steps between two checkpoints.
+
         """
 
-        for j in tqdm.tqdm(range(1,self.n)):
-            self.molecule.evolve(self.dt)
-            field = self._get_field(j, real=True)
-            self.molecule.update_field(field)
+        self._checkpointed_solve(self._step, checkpoint, interval)
 
         # self._velidate()
 
-    def export(self):
+    def resume(self, checkpoint, interval=1000):
+        """Continue an interrupted solve from its last checkpoint.
+
+        The solver has to be set up like the interrupted one. The 
+        result is identical to that of an uninterrupted solve.
+
+        Parameters
+        ----------
+        checkpoint: str
+            Checkpoint file written by `solve`.
+
+        interval: int, optional (default=1000)
+            Number of steps between two further checkpoints.
+
+        """
+
+        self._resume(self._step, checkpoint, interval)
+
+    def _step(self, j):
+        """Evolve to the j-th time point and calculate the field."""
+        self.molecule.evolve(self.dt)
+        field = self._get_field(j, real=True)
+        self.molecule.update_field(field)
+
+    def export(self, observables=None):
         """Export calculated time vector, fields, path, and states 
         as np.ndarray.
 
+        Parameters
+        ----------
+        observables: sequence, optional (default=None)
+            Observables (see Rotor.get_expt_asarray) whose 
+            expectation values at every time point are returned in 
+            addition.
+
         Returns
         -------
         time: numpy.array, shape=(n,)
@@ -145,7 +280,12 @@ class PathToField(Solver):
             Resulting path based on the calculated fields.
 
         states: numpy.array, shape=(2m+1,n)
-            State amplitudes of the system at every time point.
+            State amplitudes of the system at every recorded time 
+            point, or None if the molecule records only its path.
+
+        expts: numpy.array, shape=(n,len(observables))
+            Expectation values of `observables`. Only returned if 
+            `observables` is given.
 
         """
 
@@ -158,14 +298,11 @@ class PathToField(Solver):
         field_const = 5.142 * 10**11 * 10**(-10) #amplitude in V/angstrom
         fields = fields * field_const
 
-        path = np.zeros((self.n,2))
-        oper_x = self.molecule.dipole_x
-        oper_y = self.molecule.dipole_y
-        states_list = self.molecule.history['state']
-        for i in range(self.n):
-            path[i,0] = states_list[i].get_expt(oper_x).real
-            path[i,1] = states_list[i].get_expt(oper_y).real
+        path = self.molecule.get_path_asarray()
 
+        if observables is not None:
+            expts = self.molecule.get_expt_asarray(observables)
+            return time, fields, path, states, expts
         return time, fields, path, states
     
     def _get_field(self, j, real=False):
@@ -188,40 +325,60 @@ class PathToField(Solver):
 
         """
 
-        field = self._get_Ainv() @ self._get_b(j)
+        A_inv, b = self._get_system(j)
+        field = A_inv @ b
         if real:
             field = field.real
         return field.flatten()
 
+    def _get_system(self, j):
+        """Calculate inverse of matrix A and b vector from a single 
+        pass over the current state.
+
+        Parameters
+        ----------
+        j: int
+            System is at the j-th time point.
+
+        Returns
+        -------
+        A_inv: numpy.array, shape=(2,2)
+            Inverse of matrix A.
+
+        b: numpy.array, shape=(2,)
+            b vector.
+
+        """
+        sin2, cos2, cos_sin, sin_cos, op1, op2 = self._moments.expt(
+            self.molecule.state.value)
+        B, mu = self.molecule.B, self.molecule.mu
+        c = 2*B*mu/const.hbar**2
+        det = c**2 * (sin2*cos2 - sin_cos**2)
+        A_inv = c/det * np.array([[cos2, cos_sin],
+                                  [sin_cos, sin2]])
+        c = B**2/const.hbar**2
+        b = np.array([self._ddpath[j,0] + np.real(c*op1),
+                      self._ddpath[j,1] + np.real(c*op2)])
+        return A_inv, b
+
+    def _metrics(self, j):
+        return super()._metrics(j)[0], float(np.real(self._get_det()))
+
     def _get_det(self):
         """Calculate determinant of matrix A"""
-        state = self.molecule.state
-        c = 4*const.B**2*const.mu**2/const.hbar**4
-        det = (c * (state.get_expt(self._sinphi2)
-                   * state.get_expt(self._cosphi2)
-                   - state.get_expt(self._sinphi_cosphi)**2 ))
+        sin2, cos2, _, sin_cos, _, _ = self._moments.expt(
+            self.molecule.state.value)
+        c = 4*(self.molecule.B*self.molecule.mu)**2/const.hbar**4
+        det = c * (sin2*cos2 - sin_cos**2)
         return det
 
     def _get_Ainv(self):
         """Calculate inverse of matrix A"""
-        state = self.molecule.state
-        c = 2*const.B*const.mu/const.hbar**2
-        a11 = c * state.get_expt(self._sinphi2)
-        a12 = -c * state.get_expt(self._cosphi_sinphi)
-        a21 = -c * state.get_expt(self._sinphi_cosphi)
-        a22 = c * state.get_expt(self._cosphi2)
-        det = self._get_det()
-        A_inv = 1/det * np.array([[a22, -a12],
-                                  [-a21, a11]])
-        return A_inv
+        return self._get_system(0)[0]
 
     def _get_b(self, i):
         """Calculate b vector"""
-        state = self.molecule.state
-        c = const.B**2/const.hbar**2
-        b1 = self._ddpath[i,0] + np.real(c*state.get_expt(self._op1))
-        b2 = self._ddpath[i,1] + np.real(c*state.get_expt(self._op2))
-        return np.array([b1,b2])
+        return self._get_system(i)[1]
 
 
 class FieldToPath(Solver):
@@ -245,7 +402,29 @@ class FieldToPath(Solver):
 
     molecule: Molecule object, optional (default=Rotor)
         System of interest. Default to a Rotor molecule with a system 
-        dimension of m=8 specified in constants.py.
+        dimension of m=8 specified in constants.py. Pass e.g. 
+        Rotor(m=128, B=..., mu=...) for another basis size or other 
+        molecular constants.
+
+    integrator: str, optional (default='fixed')
+        'fixed' evolves the molecule by `dt` per time point with the 
+        field held constant over the step, which is 1st order in the 
+        time variation of the field. 'magnus4' also takes one step 
+        per time point, but interpolates the field within the step 
+        and evolves with Rotor.evolve_magnus, which is 4th order; 
+        `dt` can be much larger at the same accuracy. 'adaptive' uses 
+        integrators.AdaptiveIntegrator: the field is interpolated 
+        between time points, steps of variable size are taken with 
+        local error control, and the state is interpolated onto the 
+        time points. For slowly varying fields it takes far fewer 
+        steps than there are time points.
+
+    tol: float, optional (default=1e-6)
+        Tolerated local error per step of the 'adaptive' integrator.
+
+    observer: Observer object, optional (default=TqdmObserver())
+        Receives progress events of `solve` (see observers). Pass 
+        observers.NullObserver() to run without progress reporting.
 
     Attributes
     ----------
@@ -267,9 +446,16 @@ class FieldToPath(Solver):
     path: numpy.array, shape=(n,2)
         Resulting path of molecule's dipole moment projection.
 
+    nsteps: int
+        Number of steps taken by `solve`.
+
+    observer: Observer object
+        Observer of the progress of `solve`.
+
     """
 
-    def __init__(self, fields, dt=1000, molecule=None):
+    def __init__(self, fields, dt=1000, molecule=None, integrator='fixed',
+                 tol=1e-6, observer=None):
         # Create a Rotor object as the system of interest if not 
         # provided by the user
         if molecule is None:
@@ -277,7 +463,19 @@ class FieldToPath(Solver):
             ## Default: a Rotor object with quantum number = const.m
             self.molecule = Rotor(const.m)
         else:
-            self.molecule = rotor
+            self.molecule = molecule
+        if integrator not in ('fixed', 'magnus4', 'adaptive'):
+            errmsg = ("Unknown integrator '" + str(integrator)
+                      + "'. Expect 'fixed', 'magnus4' or 'adaptive'.")
+            raise ValueError(errmsg)
+        ## Integrator used by `solve`, 'fixed', 'magnus4' or 'adaptive'
+        self.integrator = integrator
+        ## Tolerated local error per step of the adaptive integrator
+        self.tol = tol
+        ## Observer of the progress of `solve` (observers.Observer)
+        self.observer = TqdmObserver() if observer is None else observer
+        ## Number of steps taken by `solve`
+        self.nsteps = 0
         ## Number of time points
         self.n = fields.shape[0]
         ## An nx2 np.ndarray containing the given field.
@@ -295,24 +493,124 @@ class FieldToPath(Solver):
         self.time = np.arange(self._t_final, step=self.dt, dtype=float)
         self.time_in_ps = self.time * 2.418e-5 #time in picoseconds
 
+        self.molecule.reserve(self.n)
+
         #get and set initial field, but not using molecule.update_field()
         field = self._fields_list[0]
         self.molecule.set_field(field)
 
-    def solve(self):
+    def solve(self, checkpoint=None, interval=1000):
         """Calculate path of rotor dipole moment projection from 
         given fields.
 
+        Parameters
+        ----------
+        checkpoint: str, optional (default=None)
+            If given, the state of the solve is written to this file 
+            (see checkpoint.Checkpoint) every `interval` steps, so 
+            that an interrupted solve can be continued with `resume`. 
+            Not supported by the 'adaptive' integrator.
+
+        interval: int, optional (default=1000)
+            Number of steps between two checkpoints.
+
+        """
+
+        if self.integrator == 'adaptive':
+            if checkpoint is not None:
+                raise ValueError("Checkpoints are not supported by the "
+                                 "'adaptive' integrator.")
+            self._solve_adaptive()
+            return
+        self._checkpointed_solve(self._get_step(), checkpoint, interval)
+        self.nsteps = self.n - 1
+
+    def resume(self, checkpoint, interval=1000):
+        """Continue an interrupted solve from its last checkpoint.
+
+        The solver has to be set up like the interrupted one. The 
+        result is identical to that of an uninterrupted solve.
+
+        Parameters
+        ----------
+        checkpoint: str
+            Checkpoint file written by `solve`.
+
+        interval: int, optional (default=1000)
+            Number of steps between two further checkpoints.
+
         """
 
-        for i in tqdm.tqdm(range(1,self.n)):
-            self.molecule.evolve(self.dt)
+        if self.integrator == 'adaptive':
+            raise ValueError("Checkpoints are not supported by the "
+                             "'adaptive' integrator.")
+        self._resume(self._get_step(), checkpoint, interval)
+        self.nsteps = self.n - 1
+
+    def _metrics(self, j):
+        # the prescribed field, also while the adaptive integrator runs
+        return float(np.linalg.norm(self.fields[j])), None
+
+    def _get_step(self):
+        """Return the function that evolves the molecule to the i-th 
+        time point with the 'fixed' or 'magnus4' integrator."""
+        if self.integrator == 'magnus4':
+            fields = GridFunction(self.fields, self.dt, self.time[0])
+            node_fields = fields(gauss_nodes(self.time[:-1], self.dt))
+            def step(i):
+                self.molecule.evolve_magnus(self.dt, node_fields[i-1])
+                self.molecule.set_field(self._fields_list[i])
+        else:
+            def step(i):
+                self.molecule.evolve(self.dt)
+                self.molecule.set_field(self._fields_list[i])
+        return step
+
+    def _solve_adaptive(self):
+        """Solve with adaptive steps and record the interpolated 
+        states at the time points into the history of the molecule. 
+        Progress events are sent as the steps pass the time points.
+
+        """
+        m = self.molecule.m
+        fields = GridFunction(self.fields, self.dt, self.time[0])
+        integrator = AdaptiveIntegrator(m, self.molecule.propagator, self.tol)
+        observer = self.observer
+        every, total = observer.every, self.n - 1
+        observer.start(0, total)
+        begin = time.perf_counter()
+        # time point after which the next progress event is due
+        due = [every]
+
+        def progress(k):
+            done = int(k) - 1
+            if done >= due[0] or done == total:
+                due[0] = (done//every + 1)*every
+                if observer.due(done == total):
+                    observer.update(self._progress(done, total, 0, begin))
+
+        states = integrator.solve(self.molecule.state.value, fields, self.time,
+                                  None if every is None else progress)
+        observer.close()
+        self.nsteps = integrator.nsteps
+        state = self.molecule.state
+        for i in range(1, self.n):
+            state.update(states[:,i])
+            self.molecule.update_state(state)
+            self.molecule.update_time(self.time[i])
             self.molecule.set_field(self._fields_list[i])
 
-    def export(self):
+    def export(self, observables=None):
         """Export calculated time vector, fields, and states as 
         np.ndarray.
 
+        Parameters
+        ----------
+        observables: sequence, optional (default=None)
+            Observables (see Rotor.get_expt_asarray) whose 
+            expectation values at every time point are returned in 
+            addition.
+
         Returns
         -------
         time: numpy.array, shape=(n,)
@@ -322,34 +620,163 @@ class FieldToPath(Solver):
             Resulting path of molecule's dipole moment projection.
 
         states: numpy.array, shape=(2m+1,n)
-            State amplitudes of the system at every time point.
+            State amplitudes of the system at every recorded time 
+            point, or None if the molecule records only its path.
+
+        expts: numpy.array, shape=(n,len(observables))
+            Expectation values of `observables`. Only returned if 
+            `observables` is given.
         
         """
 
         time = self.molecule.get_time_asarray()
         # time = self.time
         states = self.molecule.get_states_asarray()
-        states_list = self.molecule.history['state']
-        path = np.zeros((self.n,2))
-        oper_x = self.molecule.dipole_x
-        oper_y = self.molecule.dipole_y
-        for i in range(self.n):
-            path[i,0] = states_list[i].get_expt(oper_x).real
-            path[i,1] = states_list[i].get_expt(oper_y).real
+        path = self.molecule.get_path_asarray()
 
+        if observables is not None:
+            expts = self.molecule.get_expt_asarray(observables)
+            return time, path, states, expts
         return time, path, states
 
 
+class BatchFieldToPath(Solver):
+    """Calculate the resulting paths from many sets of control fields 
+    at once.
 
+    Class BatchFieldToPath solves the same problem as FieldToPath for 
+    a batch of field realizations (e.g., noisy copies of a field). 
+    All states are advanced in lockstep as the columns of a single 
+    (2m+1,batch) matrix with batched propagators, so the Python 
+    overhead per time step is shared by the whole batch. Only the 
+    paths are kept, not the state history.
 
+    Parameters
+    ----------
+    fields: numpy.array, shape=(batch,n,2)
+        Prescribed sets of control fields to apply to the molecule, 
+        in unit of V/angstrom.
 
+    dt: float, optional (default=1000)
+        Difference of time between two adjacent time points.
 
+    m: int, optional (default=constants.m)
+        Maximum energy quantum number.
 
+    propagator: str, optional (default='exact')
+        Propagator used to evolve the states, see molecule.Rotor. 
+        'split' is the fastest for large batches.
 
+    substeps: int, optional (default=1)
+        Number of substeps per time step for the 'split' propagator.
 
+    B: float, optional (default=constants.B)
+        Rotational constant.
 
+    mu: float, optional (default=constants.mu)
+        Dipole moment.
 
+    observer: Observer object, optional (default=TqdmObserver())
+        Receives progress events of `solve` (see observers). Pass 
+        observers.NullObserver() to run without progress reporting.
 
+    Attributes
+    ----------
+    batch: int
+        Number of field realizations.
 
+    n: int
+        Number of time points.
+
+    fields: numpy.array, shape=(batch,n,2)
+        Control fields in atomic units.
+
+    dt: float
+        Delta t between two adjacent time points.
+
+    time: numpy.array, shape=(n,)
+        Time vector in atomic units.
 
+    states: numpy.array, shape=(2m+1,batch)
+        Current state amplitudes, one column per field realization.
 
+    path: numpy.array, shape=(batch,n,2)
+        Resulting paths of molecule's dipole moment projection.
+
+    observer: Observer object
+        Observer of the progress of `solve`.
+
+    """
+
+    def __init__(self, fields, dt=1000, m=None, propagator='exact',
+                 substeps=1, B=None, mu=None, observer=None):
+        if fields.ndim != 3 or fields.shape[2] != 2:
+            errmsg = "Expect fields to have shape (batch,n,2)."
+            raise ValueError(errmsg)
+        if m is None:
+            m = const.m
+        ## Number of field realizations
+        self.batch = fields.shape[0]
+        ## Observer of the progress of `solve` (observers.Observer)
+        self.observer = TqdmObserver() if observer is None else observer
+        ## Number of time points
+        self.n = fields.shape[1]
+        field_const = 5.142 * 10**11 * 10**(-10) #amplitude in V/angstrom
+        ## Control fields in atomic units
+        self.fields = fields/field_const
+        ## Time difference between two adjacent time points.
+        self.dt = dt
+        ## Time vector containing all time points.
+        self.time = self.dt * np.arange(self.n, dtype=float)
+        self._propagator = make_propagator(propagator, m, substeps, B, mu)
+        self._dipole_x = f.operator('cosphi', m, banded=True)
+        self._dipole_y = f.operator('sinphi', m, banded=True)
+        ## Current states, starting from the ground state
+        self.states = np.zeros((2*m+1, self.batch), dtype=complex)
+        self.states[m] = 1.0
+        ## Resulting paths
+        self.path = np.zeros((self.batch, self.n, 2))
+        self._record(0)
+
+    def solve(self):
+        """Calculate paths of rotor dipole moment projection from 
+        all given fields.
+
+        """
+
+        self._run(self._step)
+
+    def _step(self, i):
+        """Evolve all states to the i-th time point."""
+        self.states = self._propagator.propagate_batch(
+            self.states, self.fields[:,i-1], self.dt)
+        self._record(i)
+
+    def _metrics(self, i):
+        # mean over the batch of the norm of the fields of the last step
+        norm = np.linalg.norm(self.fields[:,i-1], axis=1).mean()
+        return float(norm), None
+
+    def export(self):
+        """Export calculated time vector and paths as np.ndarray.
+
+        Returns
+        -------
+        time: numpy.array, shape=(n,)
+            Time vector based on dt.
+
+        path: numpy.array, shape=(batch,n,2)
+            Resulting path of molecule's dipole moment projection for 
+            each field realization.
+
+        """
+
+        return self.time, self.path
+
+    def _record(self, i):
+        """Store the dipole moment projection of all states at the 
+        i-th time point.
+
+        """
+        self.path[:,i,0] = self._dipole_x.expt(self.states).real
+        self.path[:,i,1] = self._dipole_y.expt(self.states).real
@@ -37,8 +37,17 @@ class State(object):
         Amplitude of each basic wave function. Default to None which 
         will generate an amplitude-vector for the ground state.
 
+    Notes
+    -----
+    A State is created or updated at every time step of a solver, so 
+    it is kept small: it has no instance dictionary, `as_bra` and 
+    `as_ket` return views where possible, and `update` replaces the 
+    amplitudes without validation.
+
     """
 
+    __slots__ = ('m', 'value')
+
     def __init__(self, m, value=None):
         ## Maximun energy quantum number
         self.m = m
@@ -53,7 +62,7 @@ class State(object):
         elif not isinstance(value, np.ndarray):
             errmsg = "Expect np.array to be input."
             raise TypeError(errmsg)
-        elif value.size is not (2*m+1):
+        elif value.size != 2*m+1:
             errmsg = "Expect input to have " + str(2*m+1) + " elements."
             raise ValueError(errmsg)
         else: 
@@ -70,7 +79,7 @@ class State(object):
 
         """
 
-        return np.conj(self.value).reshape((1,2*self.m+1))
+        return np.conj(self.value)[np.newaxis,:]
 
     def as_ket(self):
         """Returns the state amplitudes vector, known as `ket`.
@@ -78,11 +87,27 @@ class State(object):
         Returns
         -------
         numpy.array, shape=(2m+1,1)
-            Vector of state amplitudes.
+            Vector of state amplitudes. This is a view of `value`.
+
+        """
+
+        return self.value[:,np.newaxis]
+
+    def update(self, value):
+        """Replace the state amplitudes.
+
+        Unlike the constructor, `value` is neither checked nor 
+        copied, so that a molecule can reuse its State object at 
+        every time step.
+
+        Parameters
+        ----------
+        value: numpy.array, shape=(2m+1,)
+            New amplitude of each basic wave function.
 
         """
 
-        return self.value.reshape((2*self.m+1,1))
+        self.value = value
 
     def get_expt(self, operator):
         """Calculates the expectation value of an observable for the 
@@ -95,18 +120,19 @@ class State(object):
 
         Parameters
         ----------
-        operator: numpy.array, shape=(2m+1,2m+1)
+        operator: numpy.array or BandedOperator, shape=(2m+1,2m+1)
             The matrix representation of a specific observable of 
-            interest.
+            interest. A functions.BandedOperator is evaluated in 
+            O(m) operations.
 
         Returns
         -------
-        expt: float
+        expt: complex
             A scalar of the calculated expectation value for the 
             observable described by the input operator.
 
         """
 
-        expt = self.as_bra() @ operator @ self.as_ket()
-        expt = np.asscalar(expt)
-        return expt
+        if hasattr(operator, 'expt'):
+            return operator.expt(self.value)
+        return np.vdot(self.value, operator @ self.value)
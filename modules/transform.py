@@ -1,19 +1,26 @@
 import numpy as np
-import scipy
-from scipy.signal import savgol_filter as savitzky_golay
 import math
 import constants as const
 
-def transform_path(path):
+def transform_path(path, return_time=False, B=None):
     """Processes user defined input path by interpolating (in
         a manner that creates a higher density of points at early times) and
         smoothing using a savitzky-golay filter for compatibility with solver.
         
+        Both axes are processed together with array operations, so paths 
+        with millions of points are transformed quickly.
+        
         Parameters
         ----------
         path : numpy.array, shape=(n,2)
         Matrix representation of the path.
         
+        return_time : bool, optional (default=False)
+        If True, also return the time grid of the new path.
+        
+        B : float, optional (default=constants.B)
+        Rotational constant, which sets the time scale of the path.
+        
         Returns
         -------
         new_path : numpy.array, shape=(n2,2)
@@ -24,43 +31,49 @@ def transform_path(path):
         dt : float
         Time step size.
         
+        t : numpy.array, shape=(n2,)
+        Time of each point of `new_path`, only returned if `return_time` 
+        is True.
+        
         """
     
     # Confine path to remain in circle with radius TOL (physical limit is 1)
     TOL = 0.5;
     if (np.amax(abs(path[:,0]))>TOL or np.amax(abs(path[:,1]))>TOL):
-        x = path[:,0]*(TOL/np.amax(abs(path[:,0])))
-        y = path[:,1]*(TOL/np.amax(abs(path[:,1])))
-        path = np.column_stack((x,y))
+        path = path*(TOL/np.amax(abs(path), axis=0))
     
     # Calculate approximate length of path
-    lengthxy=0
-    for k in range(1,len(path)):
-        lengthxy = math.sqrt((path[k,0]-path[k-1,0])**2+(path[k,1]-path[k-1,1])**2)+lengthxy
+    segments = np.diff(path, axis=0)
+    lengthxy = np.hypot(segments[:,0], segments[:,1]).sum()
     
     # Create new time array based on length of path
     dt = 1000
-    Trot = 2*math.pi*const.hbar/const.B
+    if B is None:
+        B = const.B
+    Trot = 2*math.pi*const.hbar/B
     max_t = 10*lengthxy*Trot/(2*math.pi)
     t = np.arange(0,max_t,dt)
     max_t = t[-1]
     
     # Use sigmoid function to create higher density of points at early times
     t_sigmoid = np.linspace(-5,0,len(t))
-    sigmoid = np.exp(t_sigmoid)[:]/(np.exp(t_sigmoid)[:]+1)
+    sigmoid = np.exp(t_sigmoid)/(np.exp(t_sigmoid)+1)
     sigmoid = sigmoid*(1/(sigmoid[-1]-sigmoid[0]))
-    sigmoid = t[-1]*(sigmoid[:]+(1-sigmoid[-1]));
+    sigmoid = t[-1]*(sigmoid+(1-sigmoid[-1]));
     
-    # Interpolate paths using sigmoid
-    t_raw = np.linspace(0,1,len(path))
-    t_raw = t_raw*max_t
-    Ox = np.interp(sigmoid, t_raw, path[:,0])
-    Oy = np.interp(sigmoid, t_raw, path[:,1])
+    # Interpolate both axes of the path using sigmoid. The raw path is 
+    # evenly spaced over [0,max_t], so the bracketing points are found 
+    # by division instead of a search.
+    position = np.clip(sigmoid*((len(path)-1)/max_t), 0, len(path)-1)
+    left = np.minimum(position.astype(int), len(path)-2)
+    weight = (position - left)[:,None]
+    new_path = (1-weight)*path[left] + weight*path[left+1]
     
     # Smooth interpolated paths using savitzky-golay filter
-    Ox = savitzky_golay(Ox, 8*math.floor(len(Ox)/len(path[:,0]))+1, 5)
-    Oy = savitzky_golay(Oy, 8*math.floor(len(Ox)/len(path[:,0]))+1, 5)
-    
-    new_path = np.stack((Ox,Oy)).T
+    from scipy.signal import savgol_filter as savitzky_golay
+    new_path = savitzky_golay(new_path, 8*math.floor(len(new_path)/len(path))+1,
+                              5, axis=0)
     
+    if return_time:
+        return new_path, dt, t
     return new_path, dt
@@ -2,6 +2,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 
 import constants
+import functions as f
 
 
 class Visualization:
@@ -61,7 +62,11 @@ class Visualization:
     def __init__(self, dat):
         self.t = dat.t
         self.state = dat.state
-        self.m = constants.m
+        # the basis size of the run, if its states are available
+        if dat.state is None:
+            self.m = constants.m
+        else:
+            self.m = (np.shape(dat.state)[0] - 1) // 2
         self.field = dat.field
         self.cos_phi_actual = dat.path_actual[:, 0]
         self.sin_phi_actual = dat.path_actual[:, 1]
@@ -93,21 +98,13 @@ class Visualization:
 
         """
         # calculate probability density
-        # get equally spaced points in [0, 2 * pi)
-        phi = np.linspace(0, 2 * np.pi, n_grid, endpoint=False)
-
-        # initialize arrays
-        # energy to anuglar representation transformation
-        # wave_trans of shape (2m+1, len(phi))
-        wave_trans = np.empty((2 * self.m + 1, len(phi)),
-                              dtype=np.complex64)
-
-        for l in range(2 * self.m + 1):
-            wave_trans[l, :] = 1 / np.sqrt(2 * np.pi) * \
-                               np.exp(1j * (l - self.m - 1) * phi)
+        # energy to anuglar representation transformation at equally
+        # spaced points in [0, 2 * pi)
+        # wave_trans of shape (2m+1, n_grid)
+        wave_trans = f.angular_basis(self.m, n_grid)
 
         # state of shape (2m+1, len(t))
-        # proba of shape (len(phi), len(t))
+        # proba of shape (n_grid, len(t))
         proba = np.flip(np.abs(np.dot(wave_trans.T, self.state)) ** 2,
                         axis = 0)
 
@@ -0,0 +1,37 @@
+'''Fixtures shared by the unittests and the benchmarks.
+
+'''
+
+import sys
+from os.path import dirname, abspath, join
+sys.path.append(join(dirname(dirname(abspath(__file__))), "modules"))
+import numpy as np
+import constants as const
+
+#: float; Duration of rotating_pulse (two rotor periods) in atomic units
+PULSE_DURATION = 4*np.pi*const.hbar/const.B
+
+
+def rotating_pulse(t, amplitude=5e-5, duration=PULSE_DURATION):
+    """Control field rotating at 2.5*B/hbar with a sin^2 envelope.
+
+    Parameters
+    ----------
+    t: numpy.array, shape=(n,)
+        Time points in atomic units.
+
+    amplitude: float, optional (default=5e-5)
+        Peak amplitude in V/angstrom.
+
+    duration: float, optional (default=PULSE_DURATION)
+        Duration of the envelope.
+
+    Returns
+    -------
+    fields: numpy.array, shape=(n,2)
+        Fields (e_x, e_y) in V/angstrom.
+
+    """
+    w = 2.5*const.B/const.hbar
+    envelope = amplitude*np.sin(np.pi*t/duration)**2
+    return envelope[:,None] * np.stack((np.cos(w*t), np.sin(w*t)), axis=1)
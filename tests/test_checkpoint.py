@@ -0,0 +1,125 @@
+'''Unittests for checkpoint.py
+
+'''
+
+import sys
+import os
+import shutil
+import tempfile
+from os.path import dirname, abspath, join
+sys.path.append(join(dirname(dirname(abspath(__file__))), "modules"))
+import unittest
+from unittest import mock
+import numpy as np
+import solvers as s
+from molecule import Rotor
+from checkpoint import Checkpoint
+from helpers import PULSE_DURATION, rotating_pulse
+
+
+def interrupt_after(molecule, steps):
+    """Make the molecule raise KeyboardInterrupt when it is evolved
+    for the (steps+1)-th time."""
+    for name in ('evolve', 'evolve_magnus'):
+        method = getattr(molecule, name)
+        def evolve(*args, method=method):
+            if molecule.history.counts()['time'][0] > steps:
+                raise KeyboardInterrupt
+            return method(*args)
+        setattr(molecule, name, evolve)
+
+
+class test_Checkpoint(unittest.TestCase):
+    """Testing class for checkpointed solves."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = join(self.tmpdir, 'solve.ckpt')
+        n = 60
+        self.dt = PULSE_DURATION/n
+        self.fields = rotating_pulse(np.arange(n)*self.dt)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _resumed(self, make_solver, steps, interval, truncate=0):
+        """Solve with checkpoints, interrupted after `steps` steps,
+        and resume in a new solver."""
+        solver = make_solver()
+        interrupt_after(solver.molecule, steps)
+        with self.assertRaises(KeyboardInterrupt):
+            solver.solve(checkpoint=self.filename, interval=interval)
+        if truncate:
+            with open(self.filename, 'r+b') as fout:
+                fout.truncate(os.path.getsize(self.filename) - truncate)
+        solver = make_solver()
+        solver.resume(self.filename, interval=interval)
+        return solver
+
+    def test_field_to_path(self):
+        """A resumed FieldToPath solve equals an uninterrupted one."""
+        for integrator in ('fixed', 'magnus4'):
+            make_solver = lambda: s.FieldToPath(self.fields, self.dt,
+                                                integrator=integrator)
+            solver = make_solver()
+            solver.solve()
+            expected = solver.export()
+            for truncate in (0, 10):
+                resumed = self._resumed(make_solver, 25, 10, truncate)
+                for a, b in zip(resumed.export(), expected):
+                    np.testing.assert_array_equal(a, b)
+
+    def test_path_to_field(self):
+        """A resumed PathToField solve equals an uninterrupted one,
+        also for an adaptive basis."""
+        solver = s.FieldToPath(self.fields, self.dt)
+        solver.solve()
+        path = solver.export()[1]
+        for adaptive_basis in (False, True):
+            make_solver = lambda: s.PathToField(
+                path, self.dt, Rotor(adaptive_basis=adaptive_basis, stride=2))
+            solver = make_solver()
+            solver.solve()
+            expected = solver.export()
+            resumed = self._resumed(make_solver, 33, 7, truncate=3)
+            for a, b in zip(resumed.export(), expected):
+                np.testing.assert_array_equal(a, b)
+            np.testing.assert_array_equal(
+                resumed.molecule.get_basis_asarray(),
+                solver.molecule.get_basis_asarray())
+
+    def test_start_atomic(self):
+        """An interrupted start leaves the previous file untouched and 
+        no partial file behind."""
+        solver = s.FieldToPath(self.fields, self.dt)
+        solver.solve(checkpoint=self.filename, interval=10)
+        with open(self.filename, 'rb') as fin:
+            content = fin.read()
+        checkpoint = Checkpoint(self.filename)
+        def interrupted(fout, step, molecule):
+            fout.write(b'partial')
+            raise KeyboardInterrupt
+        checkpoint._write = interrupted
+        with self.assertRaises(KeyboardInterrupt):
+            checkpoint.start(1, s.FieldToPath(self.fields, self.dt).molecule)
+        with open(self.filename, 'rb') as fin:
+            self.assertEqual(fin.read(), content)
+        self.assertEqual(os.listdir(self.tmpdir), ['solve.ckpt'])
+        # an error opening the temporary file is not masked
+        with mock.patch('checkpoint.open', create=True,
+                        side_effect=PermissionError):
+            with self.assertRaises(PermissionError):
+                checkpoint.start(1, s.FieldToPath(self.fields, self.dt).molecule)
+
+    def test_incomplete(self):
+        """A file without a complete checkpoint is rejected, and the
+        adaptive integrator refuses to checkpoint."""
+        open(self.filename, 'wb').close()
+        self.assertRaises(ValueError, Checkpoint(self.filename).load, Rotor())
+        solver = s.FieldToPath(self.fields, self.dt, integrator='adaptive')
+        self.assertRaises(ValueError, solver.solve, self.filename)
+        self.assertRaises(ValueError, Checkpoint, self.filename, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,8 @@
 '''
 
 import sys
+import tempfile
+import importlib.util
 from os.path import dirname, abspath, join
 sys.path.append(join(dirname(dirname(abspath(__file__))), "modules"))
 import unittest
@@ -46,6 +48,85 @@ class test_DataContainer(unittest.TestCase):
         path = np.arange(4).reshape((1,4))
         self.assertRaises(ValueError, DataContainer, path)
 
+    def _filled(self):
+        """DataContainer with every attribute set."""
+        path = np.array([np.arange(10), np.arange(1,11)]).T
+        data = DataContainer(path)
+        rng = np.random.RandomState(0)
+        data.t = data._t_atomic / 2
+        data.field = rng.normal(size=(data.n,2)).astype(complex)
+        data.path_actual = rng.normal(size=(data.n,2))
+        data.state = rng.normal(size=(17,data.n)) + 1j*rng.normal(size=(17,data.n))
+        data.noise_stat_mean = rng.normal(size=(data.n,2))
+        data.noise_stat_var = rng.normal(size=(data.n,2))
+        return data
+
+    def _assert_same(self, loaded, data):
+        self.assertEqual(loaded.n, data.n)
+        self.assertEqual(loaded.dt_atomic, data.dt_atomic)
+        for name in ('path_desired', '_t_atomic', 't', 'field', 'path_actual',
+                     'state', 'noise_stat_mean', 'noise_stat_var'):
+            np.testing.assert_array_equal(np.asarray(getattr(loaded, name)),
+                                          getattr(data, name))
+
+    def test_save_load(self):
+        """Save and load all attributes as .npz and as a directory of
+        memory-mapped .npy files.
+
+        """
+        data = self._filled()
+        with tempfile.TemporaryDirectory() as folder:
+            for name in ('data.npz', 'data'):
+                data.save(join(folder, name))
+                loaded = DataContainer.load(join(folder, name))
+                self._assert_same(loaded, data)
+            self.assertIsInstance(loaded.state, np.memmap)
+            loaded = DataContainer.load(join(folder, 'data'), mmap=False)
+            self.assertNotIsInstance(loaded.state, np.memmap)
+
+    def test_save_load_lazy(self):
+        """Arrays of a .npz archive are read on first access, and 
+        saving a directory again drops arrays that are None now."""
+        data = self._filled()
+        with tempfile.TemporaryDirectory() as folder:
+            data.save(join(folder, 'data.npz'))
+            loaded = DataContainer.load(join(folder, 'data.npz'))
+            self.assertNotIn('state', vars(loaded))
+            np.testing.assert_array_equal(loaded.state, data.state)
+            self.assertIn('state', vars(loaded))
+            self.assertIsNotNone(loaded._store)
+            loaded.close()
+            self.assertIsNone(loaded._store)
+            self._assert_same(loaded, data)
+
+            data.save(join(folder, 'data'))
+            data.state = None
+            data.save(join(folder, 'data'))
+            self.assertIsNone(DataContainer.load(join(folder, 'data')).state)
+
+    def test_save_load_unsolved(self):
+        """Attributes that are not calculated yet stay None."""
+        data = DataContainer(np.array([np.arange(10), np.arange(1,11)]).T)
+        with tempfile.TemporaryDirectory() as folder:
+            data.save(join(folder, 'data.npz'))
+            loaded = DataContainer.load(join(folder, 'data.npz'))
+        self.assertIsNone(loaded.state)
+        self.assertIsNone(loaded.t)
+
+    @unittest.skipIf(importlib.util.find_spec('h5py') is None, "requires h5py")
+    def test_save_load_h5(self):
+        """Save and load all attributes as HDF5."""
+        data = self._filled()
+        with tempfile.TemporaryDirectory() as folder:
+            data.save(join(folder, 'data.h5'))
+            loaded = DataContainer.load(join(folder, 'data.h5'))
+            self._assert_same(loaded, data)
+            loaded.close()
+            data.state = np.zeros((17, 0))
+            data.save(join(folder, 'empty.h5'))
+            loaded = DataContainer.load(join(folder, 'empty.h5'), mmap=False)
+            self.assertEqual(loaded.state.shape, (17, 0))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -48,6 +48,50 @@ class test_Functions(unittest.TestCase):
         for i in range(0,2*m+1):
             self.assertEqual(d2dphi2[i,i],-1*abs(i-8)**2)
 
+    def test_banded_operators(self):
+        """check banded operators agree with the dense matrices"""
+        m=8
+        for op in (f.cosphi, f.sinphi, f.ddphi, f.d2dphi2):
+            banded = op(m, banded=True)
+            self.assertEqual(banded.shape,(2*m+1,2*m+1))
+            np.testing.assert_array_equal(banded.toarray(), op(m))
+
+    def test_banded_arithmetic(self):
+        """check matvec, expectation value, product and sum of 
+        banded operators"""
+        m=8
+        ket = np.arange(2*m+1) + 1j*np.arange(2*m+1)[::-1]
+        cos, sin = f.cosphi(m, banded=True), f.sinphi(m, banded=True)
+        dd = f.ddphi(m, banded=True)
+        op = cos + 4*sin@dd - 2*cos@cos
+        dense = f.cosphi(m) + 4*f.sinphi(m)@f.ddphi(m) - 2*f.cosphi(m)@f.cosphi(m)
+        np.testing.assert_array_almost_equal(op.toarray(), dense)
+        np.testing.assert_array_almost_equal(op.matvec(ket), dense@ket)
+        np.testing.assert_array_almost_equal(op@np.stack((ket,2*ket),axis=1),
+                                             dense@np.stack((ket,2*ket),axis=1))
+        self.assertAlmostEqual(op.expt(ket), np.conj(ket)@dense@ket)
+        self.assertEqual(op[0,2], dense[0,2])
+        self.assertEqual(op[5,0], 0)
+        np.testing.assert_array_equal(
+            f.BandedOperator.from_dense(dense).toarray(), dense)
+
+    def test_operator_registry(self):
+        """check cached operators are shared, read-only and agree with 
+        the builders"""
+        m=4
+        op = f.operator('cosphi2', m)
+        self.assertIs(f.operator('cosphi2', m), op)
+        np.testing.assert_array_almost_equal(op, f.cosphi(m)@f.cosphi(m))
+        self.assertRaises(ValueError, op.__setitem__, (0,0), 1.)
+        for name in f.OPERATORS:
+            banded = f.operator(name, m, banded=True)
+            self.assertFalse(banded.data.flags.writeable)
+            np.testing.assert_array_almost_equal(banded.toarray(),
+                                                 f.operator(name, m))
+        op1 = f.cosphi(m) + 4*f.sinphi(m)@f.ddphi(m) - 4*f.cosphi(m)@f.d2dphi2(m)
+        np.testing.assert_array_almost_equal(f.operator('op1', m), op1)
+        self.assertRaises(ValueError, f.operator, 'tanphi', m)
+
     def test_d2dt2(self):
         """check d2di2 function"""
         dt = 1
@@ -79,6 +123,37 @@ class test_Functions(unittest.TestCase):
         #compare calculated result with expected result
         np.testing.assert_array_almost_equal(d2dt2, d2dt2_truth)
 
+        #both components in one call
+        np.testing.assert_array_almost_equal(f.d2dt2(path,dt), d2dt2_truth)
+
+    def test_d2dt2_order(self):
+        """check higher order stencils and one-sided boundaries"""
+        t = np.linspace(0, 2, 201)
+        dt = t[1] - t[0]
+        x = np.stack((np.sin(3*t), np.exp(t)), axis=1)
+        ddx_truth = np.stack((-9*np.sin(3*t), np.exp(t)), axis=1)
+        errors = [np.abs(f.d2dt2(x, dt, order=order) - ddx_truth).max()
+                  for order in (2, 4, 6)]
+        self.assertLess(errors[1], errors[0]/100)
+        self.assertLess(errors[2], errors[1]/100)
+        # polynomials of degree order+1 are exact in the interior
+        # and of degree order at the boundaries
+        x = np.linspace(-1, 1, 11)
+        for order in (4, 6):
+            np.testing.assert_array_almost_equal(
+                f.d2dt2(x**order, x[1]-x[0], order=order),
+                order*(order-1)*x**(order-2))
+        self.assertRaises(ValueError, f.d2dt2, x, 1, order=3)
+        self.assertRaises(ValueError, f.d2dt2, x, 1, method='cubic')
+
+    def test_d2dt2_spectral(self):
+        """check spectral second derivative of a periodic sequence"""
+        t = np.linspace(0, 2*np.pi, 64, endpoint=False)
+        x = np.stack((np.sin(2*t), np.cos(t)), axis=1)
+        ddx_truth = np.stack((-4*np.sin(2*t), -np.cos(t)), axis=1)
+        np.testing.assert_array_almost_equal(
+            f.d2dt2(x, t[1], method='spectral'), ddx_truth)
+
 
 
 if __name__ == '__main__':
@@ -0,0 +1,80 @@
+'''Unittests for history.py
+
+'''
+
+import sys
+from os.path import dirname, abspath, join
+sys.path.append(join(dirname(dirname(abspath(__file__))), "modules"))
+import unittest
+import numpy as np
+import functions as f
+from history import History
+
+
+class test_History(unittest.TestCase):
+    """Testing class for History."""
+
+    def test_grow(self):
+        """Records beyond the initial capacity are kept in order."""
+        m = 2
+        history = History(m, capacity=2)
+        for i in range(10):
+            history.append_time(float(i))
+            history.append_state(np.full(2*m+1, i, dtype=complex))
+            history.append_field(np.array([i, -i]))
+        np.testing.assert_array_equal(history['time'], np.arange(10))
+        self.assertEqual(history['state'].shape, (10, 2*m+1))
+        np.testing.assert_array_equal(history['state'][:,0], np.arange(10))
+        np.testing.assert_array_equal(history['field'][:,1], -np.arange(10))
+
+    def test_view(self):
+        """Recorded values are returned without copying."""
+        history = History(1, capacity=4)
+        history.reserve(8)
+        history.append_time(1.0)
+        first = history['time']
+        for i in range(7):
+            history.append_time(2.0)
+        self.assertTrue(np.shares_memory(first, history['time']))
+
+    def test_stride(self):
+        """Only every stride-th value is stored."""
+        history = History(1, stride=3)
+        for i in range(7):
+            history.append_time(float(i))
+            history.append_field(np.array([i, i]))
+        np.testing.assert_array_equal(history['time'], [0., 3., 6.])
+        history.set_last_field(np.array([-1., -1.]))
+        np.testing.assert_array_equal(history['field'][-1], [-1., -1.])
+        history.append_field(np.array([7, 7]))
+        history.set_last_field(np.array([-2., -2.]))
+        np.testing.assert_array_equal(history['field'][-1], [-1., -1.])
+
+    def test_basis(self):
+        """The size of an adaptive basis is recorded on request."""
+        history = History(2)
+        self.assertNotIn('basis', history)
+        history = History(2, basis=True, stride=2)
+        for m in (1, 2, 2):
+            history.append_basis(m)
+        np.testing.assert_array_equal(history['basis'], [1, 2])
+
+    def test_observables(self):
+        """Expectation values are recorded instead of states."""
+        m = 2
+        ops = (f.cosphi(m, banded=True), f.sinphi(m, banded=True))
+        history = History(m, observables=ops)
+        self.assertNotIn('state', history)
+        ket = np.zeros(2*m+1, dtype=complex)
+        ket[m:m+2] = np.sqrt(0.5)
+        history.append_state(ket)
+        np.testing.assert_array_almost_equal(history['observables'],
+                                             [[0.5, 0.]])
+
+    def test_invalid_stride(self):
+        """Raise ValueError for a non-positive stride."""
+        self.assertRaises(ValueError, History, 1, stride=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+'''Unittests for integrators.py
+
+'''
+
+import sys
+from os.path import dirname, abspath, join
+sys.path.append(join(dirname(dirname(abspath(__file__))), "modules"))
+import unittest
+import numpy as np
+import constants as const
+from propagators import make_propagator
+from integrators import AdaptiveIntegrator, GridFunction, cfm4_step, gauss_nodes
+
+
+class test_GridFunction(unittest.TestCase):
+    """Testing class for GridFunction."""
+
+    def test_cubic(self):
+        """Cubic polynomials are interpolated exactly, also near the 
+        ends of the grid."""
+        t = np.linspace(0, 2, 11)
+        values = np.stack((t**3 - t, 2*t**2), axis=1)
+        g = GridFunction(values, t[1]-t[0])
+        s = np.array([0.05, 0.93, 1.41, 1.97])
+        np.testing.assert_array_almost_equal(
+            g(s), np.stack((s**3 - s, 2*s**2), axis=1))
+        np.testing.assert_array_almost_equal(g(0.93), g(s)[1])
+        np.testing.assert_array_almost_equal(g(5.), values[-1])
+
+    def test_short(self):
+        """Fewer than four samples are interpolated linearly."""
+        g = GridFunction(np.array([0., 1.]), 2.)
+        self.assertAlmostEqual(g(0.5), 0.25)
+        self.assertRaises(ValueError, GridFunction, np.zeros(1), 1.)
+
+
+class test_AdaptiveIntegrator(unittest.TestCase):
+    """Testing class for AdaptiveIntegrator."""
+
+    def setUp(self):
+        """Ground state and a smoothly rotating field."""
+        m = 4
+        self.m = m
+        self.ket = np.zeros(2*m+1, dtype=complex)
+        self.ket[m] = 1.0
+        w = 3*const.B
+        self.field = lambda t: 0.0003*np.array([np.cos(w*t), np.sin(w*t)])
+        self.t = np.linspace(0, 1e6, 501)
+        self.propagator = make_propagator('exact', m)
+
+    def _reference(self, n):
+        """Fixed CFM4 steps."""
+        ket = self.ket.copy()
+        h = self.t[-1]/n
+        states = [ket]
+        for i in range(n):
+            e1, e2 = (self.field(t) for t in gauss_nodes(i*h, h))
+            ket = cfm4_step(self.propagator, ket, e1, e2, h)
+            states.append(ket)
+        return np.array(states).T
+
+    def test_solve(self):
+        """Adaptive solution agrees with a fine fixed-step solution 
+        within the tolerance at all output times, also those inside 
+        a step, with fewer steps than output times, and tightening 
+        the tolerance takes more steps and reduces the error."""
+        reference = self._reference(10000)[:,::20]
+        nsteps, errors = [], []
+        for tol in (1e-4, 1e-6):
+            integrator = AdaptiveIntegrator(self.m, self.propagator, tol)
+            states = integrator.solve(self.ket, self.field, self.t)
+            self.assertEqual(states.shape, (2*self.m+1, len(self.t)))
+            error = np.linalg.norm(states - reference, axis=0).max()
+            self.assertLess(error, tol)
+            nsteps.append(integrator.nsteps)
+            errors.append(error)
+        self.assertLess(nsteps[0], len(self.t))
+        self.assertLess(nsteps[0], nsteps[1])
+        self.assertLess(errors[1], errors[0])
+
+    def test_order(self):
+        """CFM4 steps converge with 4th order."""
+        integrator = AdaptiveIntegrator(self.m, self.propagator)
+        kets = []
+        for n in (50, 100, 800):
+            ket, h = self.ket, self.t[-1]/n
+            for i in range(n):
+                ket = integrator._step(ket, self.field, i*h, h)[0]
+            kets.append(ket)
+        errors = [np.linalg.norm(ket - kets[-1]) for ket in kets[:2]]
+        self.assertGreater(errors[0]/errors[1], 12)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+'''Unittests for loadPath.py
+
+'''
+
+import sys
+import os
+import tempfile
+from os.path import dirname, abspath, join
+sys.path.append(join(dirname(dirname(abspath(__file__))), "modules"))
+import unittest
+import numpy as np
+from loadPath import load_path
+
+
+class test_loadPath(unittest.TestCase):
+
+    def test_loadFile(self):
+        """Test loading space and comma separated data files"""
+        coords = load_path("example_user_data.dat")
+        np.testing.assert_equal((495,2), coords.shape)
+        np.testing.assert_array_almost_equal([0,0], coords[0])
+        np.testing.assert_array_almost_equal(np.array([142,454])-np.array([148, 443]),
+                                             coords[-1])
+        coords = load_path("transform_data.dat")
+        self.assertEqual(coords.shape[1], 2)
+        np.testing.assert_array_almost_equal([0,0], coords[0])
+
+    def test_loadFunction(self):
+        """Test loading a path from user_function()"""
+        coords = load_path("example_user_function.py")
+        t0 = np.pi/2.0
+        t1 = np.pi*10.0
+        np.testing.assert_array_almost_equal([0,0], coords[0])
+        np.testing.assert_array_almost_equal(np.array([np.cos(t1)*t1,np.sin(t1)*t1])-
+                                             np.array([np.cos(t0)*t0,np.sin(t0)*t0]),
+                                             coords[-1])
+
+    def test_loadNpy(self):
+        """Test loading a .npy array and rejecting other extensions"""
+        path = np.arange(10.).reshape((5,2)) + 1
+        with tempfile.TemporaryDirectory() as folder:
+            np.save(join(folder, 'path.npy'), path)
+            np.testing.assert_array_equal(load_path(join(folder, 'path.npy')),
+                                          path - path[0])
+        self.assertRaises(ValueError, load_path, 'path.txt')
+
+
+if __name__ == '__main__':
+    unittest.main()
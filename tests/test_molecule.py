@@ -10,6 +10,7 @@ import numpy as np
 from molecule import Rotor
 from state import State
 import constants as const
+import functions as f
 
 class test_molecule(unittest.TestCase):
     """Testing class for abstract base class Molecules.
@@ -37,6 +38,34 @@ class test_molecule(unittest.TestCase):
         for attr in self.rotor.history:
             self.assertTrue(len(self.rotor.history[attr]) == 2)
 
+    def test_hamiltonian(self):
+        """Test the hamiltonian follows the field without being rebuilt."""
+
+        m = const.m
+        H0 = const.B*np.diag(np.arange(-m, m+1)**2)
+        H = self.rotor.hamiltonian
+        np.testing.assert_array_almost_equal(H.toarray(), H0)
+        self.rotor.update_field(np.array([0.003, -0.002]))
+        np.testing.assert_array_almost_equal(
+            self.rotor.hamiltonian.toarray(),
+            H0 - const.mu*(0.003*f.cosphi(m) - 0.002*f.sinphi(m)))
+        self.assertIs(self.rotor.hamiltonian, H)
+
+    def test_parameters(self):
+        """Test basis size and molecular constants per rotor."""
+
+        rotor = Rotor()
+        self.assertEqual(rotor.m, const.m)
+        self.assertEqual((rotor.B, rotor.mu), (const.B, const.mu))
+        m, B, mu = 3, 2*const.B, 3*const.mu
+        rotor = Rotor(m, B=B, mu=mu)
+        rotor.update_field(np.array([0.003, -0.002]))
+        np.testing.assert_array_almost_equal(
+            rotor.hamiltonian.toarray(),
+            B*np.diag(np.arange(-m, m+1)**2)
+            - mu*(0.003*f.cosphi(m) - 0.002*f.sinphi(m)))
+        self.assertEqual((rotor.propagator.B, rotor.propagator.mu), (B, mu))
+
     def test_evolve(self):
         """Test evolve function over 5 timesteps and the corresponding
         history of state array generated.
@@ -47,6 +76,77 @@ class test_molecule(unittest.TestCase):
             self.rotor.evolve(0.1)
         self.assertTrue(len(self.rotor.history['state']) == 6)
 
+    def test_evolve_magnus(self):
+        """Test a Magnus step with a constant field agrees with evolve
+        and is recorded into history.
+
+        """
+
+        field = np.array([0.003, -0.002])
+        rotor = Rotor(const.m)
+        rotor.set_field(field)
+        rotor.evolve(1000.)
+        self.rotor.set_field(field)
+        self.rotor.evolve_magnus(1000., np.array([field, field]))
+        np.testing.assert_array_almost_equal(self.rotor.state.value,
+                                             rotor.state.value)
+        self.assertEqual(self.rotor.time, 1000.)
+        self.assertEqual(self.rotor.get_states_asarray().shape, (2*const.m+1,2))
+
+    def test_get_expt_asarray(self):
+        """Test batched expectation values against State.get_expt."""
+
+        field = np.array([0.003, -0.002])
+        self.rotor.set_field(field)
+        for i in range(5):
+            self.rotor.evolve(1000.)
+            self.rotor.update_field(field)
+        operators = (f.cosphi(const.m), 'sinphi',
+                     f.operator('ddphi', const.m, banded=True))
+        expts = self.rotor.get_expt_asarray(operators)
+        states = self.rotor.get_states_asarray()
+        self.assertEqual(expts.shape, (6,3))
+        for i in range(6):
+            ket = states[:,i]
+            for j, op in enumerate((f.cosphi(const.m), f.sinphi(const.m),
+                                    f.ddphi(const.m))):
+                self.assertAlmostEqual(expts[i,j], np.vdot(ket, op @ ket))
+        np.testing.assert_array_almost_equal(self.rotor.get_path_asarray(),
+                                             expts[:,:2].real)
+        rotor = Rotor(const.m, record_states=False)
+        self.assertRaises(ValueError, rotor.get_expt_asarray, ('cosphi',))
+
+    def test_adaptive_basis(self):
+        """Test the adaptive basis grows with the excitation, agrees 
+        with the full basis, and shrinks when the population drains.
+
+        """
+
+        m = 32
+        rotors = [Rotor(m), Rotor(m, adaptive_basis=True)]
+        for rotor in rotors:
+            for i in range(400):
+                t = 1000.*i
+                rotor.update_field(5e-5*np.array([np.cos(2.5*const.B*t),
+                                                   np.sin(2.5*const.B*t)]))
+                rotor.evolve(1000.)
+        full, adaptive = rotors
+        basis = adaptive.get_basis_asarray()
+        self.assertIsNone(full.get_basis_asarray())
+        self.assertEqual(basis.shape, (401,))
+        self.assertEqual(basis[0], 4)
+        self.assertTrue(4 < basis.max() < m)
+        self.assertEqual(adaptive.get_states_asarray().shape, (2*m+1, 401))
+        np.testing.assert_array_almost_equal(adaptive.get_path_asarray(),
+                                             full.get_path_asarray())
+        adaptive.update_state(State(m, np.eye(2*m+1)[m]))
+        self.assertEqual(adaptive.m_active, 4)
+        adaptive.m_active = 16
+        adaptive.update_field(np.zeros(2))
+        for i in range(5):
+            adaptive.evolve(1000.)
+        self.assertEqual(adaptive.m_active, 4)
+
     def test_get_history_asarray(self):
         """Test function to return history of states as array."""
 
@@ -56,6 +156,25 @@ class test_molecule(unittest.TestCase):
         self.assertEqual(self.rotor.get_states_asarray().shape, (2*const.m+1,6))
         self.assertEqual(self.rotor.get_fields_asarray().shape, (6,2))
 
+    def test_history_options(self):
+        """Test recording every other step and only the path."""
+
+        rotor = Rotor(const.m, stride=2, record_states=False)
+        rotor.set_field(np.array([1e-3, 0.]))
+        for i in range(5):
+            rotor.evolve(1000.)
+        self.assertIsNone(rotor.get_states_asarray())
+        self.assertEqual(rotor.get_time_asarray().shape, (3,))
+        path = rotor.get_path_asarray()
+        self.assertEqual(path.shape, (3,2))
+
+        reference = Rotor(const.m)
+        reference.set_field(np.array([1e-3, 0.]))
+        for i in range(5):
+            reference.evolve(1000.)
+        np.testing.assert_array_almost_equal(path,
+                                             reference.get_path_asarray()[::2])
+
 
 if __name__ == '__main__':
     unittest.main()
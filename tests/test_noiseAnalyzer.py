@@ -2,7 +2,9 @@ import sys
 from os.path import dirname, abspath, join
 sys.path.append(join(dirname(dirname(abspath(__file__))), "modules"))
 import unittest
-from noiseAnalyzer import NoiseAnalyser
+from unittest import mock
+import noiseAnalyzer
+from noiseAnalyzer import NoiseAnalyser, OnlineStatistics, P2Quantile
 import numpy as np
 
 #import other stuff you need
@@ -32,7 +34,111 @@ class test_noiseAnalyzer(unittest.TestCase):
         myNA.calc_statistic()
         np.testing.assert_array_equal( myNA.pathmean,input_path)
         np.testing.assert_array_equal( myNA.pathvar,np.zeros((5,2)))
-        
+
+    def test_calc_path(self):
+        """Test paths solved in chunks by worker processes match solving each noisy field on its own"""
+        input_field = np.sin(np.arange(20)).reshape((10,2))
+        myNA = NoiseAnalyser(input_field, 1000, 0.1, 5, processors=2, chunksize=2)
+        myNA.calc_noisy_field()
+        myNA.calc_path()
+        self.assertEqual(myNA.path.shape, (10,10))
+        self.assertEqual(myNA.path.dtype, float)
+        np.testing.assert_array_almost_equal(myNA.path, myNA.calc_paths(0, 5))
+        for i in range(5):
+            np.testing.assert_array_almost_equal(myNA.path[:,[2*i,2*i+1]], myNA.calc_a_path(i))
+
+    def test_online_statistics(self):
+        """Test running mean, variance and median sketch against numpy on batches of uneven size"""
+        samples = np.random.RandomState(0).normal(size=(2000,3,2))
+        stats = OnlineStatistics((3,2))
+        median = P2Quantile(0.5, (3,2))
+        for start in range(0, 2000, 7):
+            stats.update(samples[start:start+7])
+            median.update(samples[start:start+7])
+        self.assertEqual(stats.count, 2000)
+        np.testing.assert_array_almost_equal(stats.mean, samples.mean(axis=0))
+        np.testing.assert_array_almost_equal(stats.variance, samples.var(axis=0))
+        np.testing.assert_array_almost_equal(median.value, np.median(samples, axis=0), decimal=1)
+
+    def test_streaming(self):
+        """Test streaming statistics match the statistics of the stored paths"""
+        input_field = np.sin(np.arange(20)).reshape((10,2))
+        stored = NoiseAnalyser(input_field, 1000, 0.1, 5, processors=2, chunksize=2, seed=0)
+        mean, var = stored.analyze()
+        streamed = NoiseAnalyser(input_field, 1000, 0.1, 5, processors=2, chunksize=2,
+                                 streaming=True, quantiles=[0.5], seed=0)
+        smean, svar = streamed.analyze()
+        np.testing.assert_array_almost_equal(smean, mean)
+        np.testing.assert_array_almost_equal(svar, var)
+        self.assertEqual(streamed.pathquantiles.shape, (1,10,2))
+
+    def test_streaming_memory(self):
+        """Test the paths held at once in streaming mode do not grow with numfield"""
+        input_field = np.sin(np.arange(20)).reshape((10,2))
+        stream_chunk = noiseAnalyzer._stream_chunk
+        held = []
+        def recorded(*args):
+            paths = stream_chunk(*args)
+            held.append(len(paths))
+            return paths
+        largest = []
+        for numfield in (20, 40):
+            del held[:]
+            myNA = NoiseAnalyser(input_field, 1000, 0.1, numfield, processors=1,
+                                 streaming=True, seed=0)
+            with mock.patch.object(noiseAnalyzer, '_stream_chunk', recorded):
+                myNA.analyze()
+            self.assertEqual(sum(held), numfield)
+            largest.append(max(held))
+        self.assertEqual(largest, [noiseAnalyzer.STREAM_CHUNKSIZE]*2)
+        self.assertEqual(NoiseAnalyser(input_field, 1000, 0.1, 10**6, streaming=True).chunksize,
+                         noiseAnalyzer.STREAM_CHUNKSIZE)
+
+    def test_seed(self):
+        """Test results for a seed are identical for any number of processors and chunks"""
+        input_field = np.sin(np.arange(20)).reshape((10,2))
+        results = []
+        for processors, chunksize, streaming in ((1, None, False), (2, 2, False),
+                                                 (1, None, True), (2, 3, True)):
+            myNA = NoiseAnalyser(input_field, 1000, 0.1, 5, processors=processors,
+                                 chunksize=chunksize, streaming=streaming, seed=7)
+            results.append(myNA.analyze())
+        np.testing.assert_array_equal(results[0], results[1])
+        np.testing.assert_array_equal(results[2], results[3])
+        np.testing.assert_array_almost_equal(results[0], results[2])
+        myNA = NoiseAnalyser(input_field, 1000, 0.1, 5, seed=7)
+        myNA.calc_noisy_field()
+        other = NoiseAnalyser(input_field, 1000, 0.1, 5, seed=8)
+        other.calc_noisy_field()
+        self.assertFalse(np.allclose(myNA.noisy_field, other.noisy_field))
+
+    def test_spawned_seed(self):
+        """Test sibling spawned seeds draw different noise, reproducible from the same spawn"""
+        input_field = np.sin(np.arange(20)).reshape((10,2))
+        noisy_fields = []
+        for seed in np.random.SeedSequence(7).spawn(2) + [np.random.SeedSequence(7).spawn(1)[0]]:
+            myNA = NoiseAnalyser(input_field, 1000, 0.1, 5, seed=seed)
+            myNA.calc_noisy_field()
+            noisy_fields.append(myNA.noisy_field)
+        self.assertFalse(np.allclose(noisy_fields[0], noisy_fields[1]))
+        np.testing.assert_array_equal(noisy_fields[0], noisy_fields[2])
+        results = [NoiseAnalyser(input_field, 1000, 0.1, 4, processors=2, chunksize=2,
+                                 streaming=streaming, seed=seed).analyze()
+                   for seed in np.random.SeedSequence(7).spawn(2) for streaming in (False, True)]
+        np.testing.assert_array_almost_equal(results[0], results[1])
+        self.assertFalse(np.allclose(results[0][0], results[2][0]))
+
+    def test_rotor_parameters(self):
+        """Test the rotor parameters are passed on to the workers"""
+        input_field = np.sin(np.arange(20)).reshape((10,2))
+        myNA = NoiseAnalyser(input_field, 1000, 0.1, 3, processors=2, chunksize=2,
+                             seed=0, m=3, mu=0.5)
+        myNA.calc_path()
+        other = NoiseAnalyser(input_field, 1000, 0.1, 3, seed=0)
+        for i in range(3):
+            np.testing.assert_array_almost_equal(myNA.path[:,[2*i,2*i+1]], myNA.calc_a_path(i))
+        self.assertFalse(np.allclose(myNA.calc_a_path(0), other.calc_a_path(0)))
+
 if __name__ == '__main__':
     unittest.main()
  
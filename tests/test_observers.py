@@ -0,0 +1,106 @@
+'''Unittests for observers.py
+
+'''
+
+import sys
+from os.path import dirname, abspath, join
+sys.path.append(join(dirname(dirname(abspath(__file__))), "modules"))
+import unittest
+import numpy as np
+import solvers as s
+from observers import Observer, NullObserver, LoggingObserver, TqdmObserver
+from helpers import PULSE_DURATION, rotating_pulse
+
+
+class Recorder(Observer):
+    """Observer keeping all events."""
+
+    def __init__(self, every, min_interval=0.0):
+        super().__init__(every, min_interval)
+        self.events = []
+        self.closed = False
+
+    def start(self, initial, total):
+        super().start(initial, total)
+        self.initial, self.total = initial, total
+
+    def update(self, progress):
+        self.events.append(progress)
+
+    def close(self):
+        self.closed = True
+
+
+class test_Observers(unittest.TestCase):
+    """Testing class for the observers of the solvers."""
+
+    def setUp(self):
+        n = 45
+        self.dt = PULSE_DURATION/n
+        self.fields = rotating_pulse(np.arange(n)*self.dt)
+
+    def test_events(self):
+        """Events are sent every `every` steps and after the last
+        step, with the metrics of the solver."""
+        recorder = Recorder(10)
+        solver = s.FieldToPath(self.fields, self.dt, observer=recorder)
+        solver.solve()
+        self.assertEqual((recorder.initial, recorder.total), (0, 44))
+        self.assertEqual([e.step for e in recorder.events], [10, 20, 30, 40, 44])
+        self.assertTrue(recorder.closed)
+        last = recorder.events[-1]
+        self.assertIsNone(last.det)
+        self.assertEqual(last.eta, 0)
+        self.assertAlmostEqual(last.field_norm,
+                               np.linalg.norm(solver.fields[-1]))
+
+        path = solver.export()[1]
+        recorder = Recorder(20)
+        solver = s.PathToField(path, self.dt, observer=recorder)
+        solver.solve()
+        self.assertEqual([e.step for e in recorder.events], [20, 40, 44])
+        self.assertTrue(all(e.det > 0 for e in recorder.events))
+
+        recorder = Recorder(10)
+        solver = s.FieldToPath(self.fields, self.dt, integrator='adaptive',
+                               observer=recorder)
+        solver.solve()
+        steps = [e.step for e in recorder.events]
+        self.assertEqual(steps[-1], 44)
+        self.assertEqual(steps, sorted(set(steps)))
+        self.assertGreater(len(steps), 1)
+        self.assertTrue(recorder.closed)
+
+        recorder = Recorder(7)
+        solver = s.BatchFieldToPath(np.stack((self.fields, 2*self.fields)),
+                                    self.dt, observer=recorder)
+        solver.solve()
+        self.assertEqual(recorder.events[-1].step, 44)
+
+    def test_throttle(self):
+        """Events less than `min_interval` apart are skipped, except
+        the last one."""
+        recorder = Recorder(1, min_interval=3600)
+        s.FieldToPath(self.fields, self.dt, observer=recorder).solve()
+        self.assertEqual([e.step for e in recorder.events], [1, 44])
+
+    def test_results(self):
+        """The observer does not change the results."""
+        paths = []
+        for observer in (NullObserver(), TqdmObserver(every=3, disable=True),
+                         LoggingObserver(every=5, min_interval=0)):
+            solver = s.FieldToPath(self.fields, self.dt, observer=observer)
+            if isinstance(observer, LoggingObserver):
+                with self.assertLogs('observers') as logs:
+                    solver.solve()
+                self.assertEqual(len(logs.records), 9)
+            else:
+                solver.solve()
+            paths.append(solver.export()[1])
+        np.testing.assert_array_equal(paths[0], paths[1])
+        np.testing.assert_array_equal(paths[0], paths[2])
+        self.assertRaises(ValueError, Recorder, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
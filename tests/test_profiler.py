@@ -0,0 +1,85 @@
+'''Unittests for profiler.py
+
+'''
+
+import sys
+import json
+from os.path import dirname, abspath, join
+sys.path.append(join(dirname(dirname(abspath(__file__))), "modules"))
+import unittest
+import numpy as np
+import solvers as s
+from molecule import Rotor
+from observers import NullObserver
+from profiler import Profiler
+from helpers import PULSE_DURATION, rotating_pulse
+
+
+class test_Profiler(unittest.TestCase):
+    """Testing class for Profiler."""
+
+    def setUp(self):
+        self.n = 40
+        self.dt = PULSE_DURATION/self.n
+        fields = rotating_pulse(np.arange(self.n)*self.dt)
+        solver = s.FieldToPath(fields, self.dt, observer=NullObserver())
+        solver.solve()
+        self.path = solver.export()[1]
+
+    def _solve(self):
+        solver = s.PathToField(self.path, self.dt, observer=NullObserver())
+        solver.solve()
+        return solver.export()
+
+    def test_counts(self):
+        """Calls of the hot path are counted and timed."""
+        with Profiler() as profiler:
+            self._solve()
+        stats = profiler.stats()
+        for label in ('Rotor.evolve', 'Rotor.update_field',
+                      'ExactPropagator.propagate', 'State.update'):
+            self.assertEqual(stats[label]['calls'], self.n - 1)
+        # the initial field is solved for as well
+        for label in ('PathToField._get_field', 'BandedStack.expt'):
+            self.assertEqual(stats[label]['calls'], self.n)
+        evolve = stats['Rotor.evolve']
+        self.assertLess(evolve['self'], evolve['total'])
+        self.assertGreaterEqual(profiler.wall, evolve['total'])
+        data = json.loads(profiler.to_json())
+        self.assertEqual(data['methods']['Rotor.evolve']['calls'], self.n - 1)
+        self.assertIn('Rotor.evolve', profiler.table())
+        profiler.reset()
+        self.assertEqual(profiler.stats(), {})
+
+    def test_disabled(self):
+        """Methods are restored when disabled and results are not
+        changed by profiling."""
+        evolve = Rotor.evolve
+        expected = self._solve()
+        profiler = Profiler()
+        profiler.enable()
+        self.assertIsNot(Rotor.evolve, evolve)
+        profiled = self._solve()
+        profiler.disable()
+        self.assertIs(Rotor.evolve, evolve)
+        for a, b in zip(profiled, expected):
+            np.testing.assert_array_equal(a, b)
+        calls = profiler.stats()['Rotor.evolve']['calls']
+        self._solve()
+        self.assertEqual(profiler.stats()['Rotor.evolve']['calls'], calls)
+
+    def test_bad_target(self):
+        """A target which does not resolve leaves no method wrapped."""
+        evolve = Rotor.evolve
+        for target in (('molecule', 'Rotor', 'missing'),
+                       ('molecule', 'Missing', 'evolve'),
+                       ('missing', 'Rotor', 'evolve')):
+            profiler = Profiler([('molecule', 'Rotor', 'evolve'), target])
+            self.assertRaises((AttributeError, ImportError), profiler.enable)
+            self.assertFalse(profiler.enabled)
+            self.assertIs(Rotor.evolve, evolve)
+            self.assertEqual(profiler._patched, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
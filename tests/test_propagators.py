@@ -0,0 +1,153 @@
+'''Unittests for propagators.py
+
+'''
+
+import sys
+from os.path import dirname, abspath, join
+sys.path.append(join(dirname(dirname(abspath(__file__))), "modules"))
+import unittest
+import numpy as np
+import constants as const
+import propagators as p
+from molecule import Rotor
+
+
+class test_Propagators(unittest.TestCase):
+    """Testing class for propagators."""
+
+    def setUp(self):
+        """Create a normalized random state and a field."""
+        m = const.m
+        rng = np.random.RandomState(0)
+        ket = rng.normal(size=2*m+1) + 1j*rng.normal(size=2*m+1)
+        self.ket = ket / np.linalg.norm(ket)
+        self.field = np.array([0.003, -0.002])
+        self.dt = 1000.
+        self.reference = p.ExpmPropagator(m).propagate(self.ket, self.field,
+                                                       self.dt)
+
+    def test_exact(self):
+        """Exact propagator agrees with the matrix exponential."""
+        propagator = p.make_propagator('exact', const.m)
+        ket = propagator.propagate(self.ket, self.field, self.dt)
+        np.testing.assert_array_almost_equal(ket, self.reference, decimal=12)
+
+    def test_exact_zero_field(self):
+        """Exact propagator handles a vanishing field."""
+        propagator = p.make_propagator('exact', const.m)
+        field = np.zeros(2)
+        ket = propagator.propagate(self.ket, field, self.dt)
+        reference = p.ExpmPropagator(const.m).propagate(self.ket, field,
+                                                        self.dt)
+        np.testing.assert_array_almost_equal(ket, reference, decimal=12)
+
+    def test_split(self):
+        """Split-operator propagator converges with substeps and
+        preserves the norm.
+
+        """
+        errors = []
+        for substeps in (1, 10):
+            propagator = p.make_propagator('split', const.m, substeps)
+            ket = propagator.propagate(self.ket, self.field, self.dt)
+            self.assertAlmostEqual(np.linalg.norm(ket), 1.0)
+            errors.append(np.abs(ket - self.reference).max())
+        self.assertLess(errors[1], errors[0]/50)
+        self.assertLess(errors[1], 1e-5)
+
+    def test_batch(self):
+        """Batched propagation agrees with propagating each state."""
+        rng = np.random.RandomState(1)
+        kets = np.stack((self.ket, self.ket[::-1], 1j*self.ket), axis=1)
+        fields = 0.003*rng.normal(size=(3,2))
+        fields[1] = 0.
+        for name in p.PROPAGATORS:
+            propagator = p.make_propagator(name, const.m)
+            batch = propagator.propagate_batch(kets, fields, self.dt)
+            for i in range(3):
+                ket = propagator.propagate(kets[:,i], fields[i], self.dt)
+                np.testing.assert_array_almost_equal(batch[:,i], ket,
+                                                     decimal=12)
+
+    def test_propagate_times(self):
+        """Propagating by several time differences agrees with single
+        propagations, with and without a field."""
+        dts = np.array([0., 250., self.dt])
+        for field in (self.field, np.zeros(2)):
+            for name in ('expm', 'exact'):
+                propagator = p.make_propagator(name, const.m)
+                kets = propagator.propagate_times(self.ket, field, dts)
+                self.assertEqual(kets.shape, (2*const.m+1, 3))
+                for i, dt in enumerate(dts):
+                    np.testing.assert_array_almost_equal(
+                        kets[:,i], propagator.propagate(self.ket, field, dt),
+                        decimal=12)
+
+    def test_krylov(self):
+        """Krylov propagator agrees with the exact one, also for a 
+        large basis and when it falls back to the exact propagator."""
+        for tol in (1e-8, 1e-12):
+            propagator = p.KrylovPropagator(const.m, tol=tol)
+            ket = propagator.propagate(self.ket, self.field, self.dt)
+            self.assertLess(np.linalg.norm(ket - self.reference), tol)
+        propagator = p.KrylovPropagator(const.m, maxiter=2)
+        ket = propagator.propagate(self.ket, self.field, self.dt)
+        np.testing.assert_array_almost_equal(ket, self.reference, decimal=12)
+        # low states of a large basis, for steps of different size; 
+        # the exact propagator agrees with expm to ~1e-15 and is much 
+        # faster for m=512
+        for m, name in ((128, 'expm'), (512, 'exact')):
+            ket = np.zeros(2*m+1, dtype=complex)
+            ket[m-2:m+3] = self.ket[:5] / np.linalg.norm(self.ket[:5])
+            for dt in (100., 5000.):
+                reference = p.make_propagator(name, m).propagate(
+                    ket, self.field, dt)
+                ket_krylov = p.make_propagator('krylov', m).propagate(
+                    ket, self.field, dt)
+                self.assertLess(np.linalg.norm(ket_krylov - reference), 1e-12)
+
+    def test_constants(self):
+        """Propagators use the given rotational constant and dipole 
+        moment instead of the ones in constants.py."""
+        B, mu = 2*const.B, 0.5*const.mu
+        reference = p.ExpmPropagator(const.m, B, mu).propagate(
+            self.ket, self.field, self.dt)
+        self.assertGreater(np.abs(reference - self.reference).max(), 1e-3)
+        for name in p.PROPAGATORS:
+            propagator = p.make_propagator(name, const.m, 8, B=B, mu=mu)
+            ket = propagator.propagate(self.ket, self.field, self.dt)
+            np.testing.assert_array_almost_equal(ket, reference, decimal=4)
+
+    def test_pickle(self):
+        """scipy.linalg is cached on first use and left out when a 
+        propagator is pickled."""
+        import pickle
+        for name in p.PROPAGATORS:
+            propagator = p.make_propagator(name, const.m)
+            ket = propagator.propagate(self.ket, self.field, self.dt)
+            copy = pickle.loads(pickle.dumps(propagator))
+            np.testing.assert_array_equal(
+                copy.propagate(self.ket, self.field, self.dt), ket)
+        self.assertIn('_linalg', propagator.__dict__)
+
+    def test_unknown(self):
+        """Raise ValueError for an unknown propagator."""
+        self.assertRaises(ValueError, p.make_propagator, 'rk4', const.m)
+        self.assertRaises(ValueError, p.make_propagator, 'split', const.m, 0)
+
+    def test_rotor(self):
+        """Rotor evolves identically with the exact and expm
+        propagators.
+
+        """
+        rotors = [Rotor(const.m, propagator=name) for name in ('expm', 'exact')]
+        for rotor in rotors:
+            rotor.set_field(self.field)
+            for i in range(5):
+                rotor.evolve(self.dt)
+        np.testing.assert_array_almost_equal(rotors[0].get_states_asarray(),
+                                             rotors[1].get_states_asarray())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@
 '''
 
 import sys
+import subprocess
 from os.path import dirname, abspath, join
 sys.path.append(join(dirname(dirname(abspath(__file__))), "modules"))
 import numpy as np
@@ -12,6 +13,7 @@ import functions as f
 import constants as const
 import solvers as s
 from molecule import Rotor
+from helpers import PULSE_DURATION, rotating_pulse
 
 class test_PathToField(unittest.TestCase):
     """Testing class for class PathtoField in abstract base 
@@ -73,6 +75,37 @@ class test_PathToField(unittest.TestCase):
         det = fsolver._get_det()
         self.assertTrue(np.isscalar(det))
 
+    def test_get_system(self):
+        """Tests the fused calculation of A inverse and b against
+        separate expectation values with dense operators
+
+        """
+
+        path_desired = np.arange(10).reshape((5,2))
+        fsolver = s.PathToField(path_desired)
+        m = const.m
+        rng = np.random.RandomState(0)
+        value = rng.normal(size=2*m+1) + 1j*rng.normal(size=2*m+1)
+        state = State(m, value/np.linalg.norm(value))
+        fsolver.molecule.state = state
+        cos, sin = f.cosphi(m), f.sinphi(m)
+        op1 = cos + 4*sin@f.ddphi(m) - 4*cos@f.d2dphi2(m)
+        op2 = sin - 4*cos@f.ddphi(m) - 4*sin@f.d2dphi2(m)
+        c = 2*const.B*const.mu/const.hbar**2
+        A = c * np.array([[state.get_expt(sin@sin), -state.get_expt(cos@sin)],
+                          [-state.get_expt(sin@cos), state.get_expt(cos@cos)]])
+        cb = const.B**2/const.hbar**2
+        b = np.array([fsolver._ddpath[3,0] + np.real(cb*state.get_expt(op1)),
+                      fsolver._ddpath[3,1] + np.real(cb*state.get_expt(op2))])
+        det = c**2 * (state.get_expt(sin@sin)*state.get_expt(cos@cos)
+                      - state.get_expt(sin@cos)**2)
+        A_inv = 1/det * np.array([[A[1,1], -A[0,1]],
+                                  [-A[1,0], A[0,0]]])
+        A_inv_fused, b_fused = fsolver._get_system(3)
+        np.testing.assert_allclose(A_inv_fused, A_inv)
+        np.testing.assert_allclose(b_fused, b)
+        np.testing.assert_allclose(fsolver._get_det(), det)
+
     def test_solve(self):
         """Tests solve function to calculate the control
         field required for a time step
@@ -127,8 +160,8 @@ class test_PathToField_sigmoid_path(unittest.TestCase):
         psi0[m] = 1.0
         psi0_ket = psi0.reshape((2*m+1,1))
         psi0_bra = psi0_ket.conj().transpose()
-        dx = np.asscalar(psi0_bra @ f.cosphi(m) @ psi0_ket)
-        dy = np.asscalar(psi0_bra @ f.sinphi(m) @ psi0_ket)
+        dx = (psi0_bra @ f.cosphi(m) @ psi0_ket).item()
+        dy = (psi0_bra @ f.sinphi(m) @ psi0_ket).item()
         path[:,0] = path[:,0] - (path[0,0] - dx).real
         path[:,1] = path[:,1] - (path[0,1] - dy).real
 
@@ -162,6 +195,26 @@ class test_PathToField_sigmoid_path(unittest.TestCase):
         fsolver = s.PathToField(self.path_desired, t_final=self.t_final)
         fsolver.solve()
 
+    def test_basis_size(self):
+        """Test solvers with different basis sizes side by side give 
+        converged fields for a path that stays in low energy states.
+
+        """
+
+        t = np.arange(200)*1000.
+        path = 0.05*np.stack((np.sin(const.w1*t), 1-np.cos(const.w1*t)),
+                             axis=1)
+        fields = []
+        for m in (8, 32):
+            fsolver = s.PathToField(path, 1000.,
+                                    Rotor(m, propagator='krylov'))
+            fsolver.solve()
+            self.assertEqual(fsolver.export()[3].shape, (2*m+1, 200))
+            fields.append(fsolver.export()[1])
+        self.assertGreater(np.abs(fields[0]).max(), 0)
+        np.testing.assert_allclose(fields[0], fields[1], rtol=1e-6,
+                                   atol=1e-6*np.abs(fields[0]).max())
+
 class test_FieldToPath(unittest.TestCase):
     """Testing class for class FieldToPath in abstract base 
     class Solver.
@@ -202,6 +255,68 @@ class test_FieldToPath(unittest.TestCase):
         self.assertEqual(psolver._t_final, dt*n)
         np.testing.assert_array_almost_equal(psolver.time, np.array([0., 20., 40., 60., 80.]))
 
+    def test_export_observables(self):
+        """test export of expectation values of further observables"""
+
+        n = 5
+        fields = 0.01*np.arange(2*n, dtype=float).reshape((n,2))
+        psolver = s.FieldToPath(fields, dt=1000.)
+        psolver.solve()
+        time, path, states, expts = psolver.export(
+            observables=('cosphi', 'sinphi', 'energy'))
+        self.assertEqual(expts.shape, (n,3))
+        np.testing.assert_array_almost_equal(expts[:,:2].real, path)
+        np.testing.assert_array_almost_equal(expts[0], [0, 0, 0])
+
+    def test_solve_adaptive(self):
+        """Test the adaptive integrator against fixed steps with fewer
+        steps than time points.
+
+        """
+
+        n = 2000
+        fields = np.genfromtxt('testdata_solver/fields_real_for_sigmoid_path.txt',
+                               dtype=float, delimiter=',')[0:n,:]
+        dt = 100*const.hbar/const.B/100000
+        fixed = s.FieldToPath(fields, dt=dt)
+        fixed.solve()
+        adaptive = s.FieldToPath(fields, dt=dt, integrator='adaptive',
+                                 tol=1e-6)
+        adaptive.solve()
+        self.assertEqual(fixed.nsteps, n-1)
+        self.assertLess(adaptive.nsteps, n//10)
+        time, path, states = adaptive.export()
+        self.assertEqual(states.shape, (2*const.m+1,n))
+        np.testing.assert_array_almost_equal(time, fixed.export()[0])
+        np.testing.assert_array_almost_equal(path, fixed.export()[1],
+                                             decimal=4)
+        self.assertRaises(ValueError, s.FieldToPath, fields, dt=dt,
+                          integrator='rk')
+
+    def test_solve_magnus4(self):
+        """Test 4th order convergence of the Magnus integrator for a 
+        smooth field, against 1st order of fixed steps.
+
+        """
+
+        errors = {'fixed': [], 'magnus4': []}
+        paths = {}
+        for n in (50, 100, 1600):
+            dt = PULSE_DURATION/n
+            fields = rotating_pulse(np.arange(n)*dt, amplitude=0.0005)
+            for integrator in ('fixed', 'magnus4'):
+                psolver = s.FieldToPath(fields, dt=dt, integrator=integrator)
+                psolver.solve()
+                paths[integrator, n] = psolver.export()[1]
+        reference = paths['magnus4', 1600]
+        for (integrator, n), path in paths.items():
+            if n < 1600:
+                errors[integrator].append(
+                    np.abs(path - reference[::1600//n]).max())
+        self.assertGreater(errors['magnus4'][0]/errors['magnus4'][1], 10)
+        self.assertLess(errors['fixed'][0]/errors['fixed'][1], 3)
+        self.assertLess(errors['magnus4'][0], errors['fixed'][1])
+
 class test_FieldToPath_sigmoid_path(unittest.TestCase):
     """Testing class for class FieldToPath in abstract base 
     class Solver for a particular know given path: a sigmoid path.
@@ -245,6 +360,65 @@ class test_FieldToPath_sigmoid_path(unittest.TestCase):
         np.testing.assert_array_almost_equal(time, self.time)
         np.testing.assert_array_almost_equal(states, self.states_expected)
 
+class test_BatchFieldToPath(unittest.TestCase):
+    """Testing class for class BatchFieldToPath in abstract base 
+    class Solver.
+
+    """
+
+    def setUp(self):
+        """Create a small batch of random fields."""
+
+        rng = np.random.RandomState(0)
+        self.fields = 0.5*rng.normal(size=(3,20,2))
+        self.dt = 1000.
+
+    def test_init(self):
+        """Test shapes and unit conversion at construction."""
+
+        psolver = s.BatchFieldToPath(self.fields, dt=self.dt)
+        self.assertEqual(psolver.batch, 3)
+        self.assertEqual(psolver.n, 20)
+        self.assertEqual(psolver.states.shape, (2*const.m+1,3))
+        self.assertEqual(psolver.path.shape, (3,20,2))
+        self.assertRaises(ValueError, s.BatchFieldToPath, self.fields[0])
+
+    def test_solve(self):
+        """Test batched paths match FieldToPath for each field."""
+
+        for propagator in ('exact', 'split'):
+            psolver = s.BatchFieldToPath(self.fields, dt=self.dt,
+                                         propagator=propagator, substeps=4)
+            psolver.solve()
+            time, paths = psolver.export()
+            self.assertEqual(paths.shape, (3,20,2))
+            for i in range(3):
+                rotor = Rotor(const.m, propagator=propagator, substeps=4)
+                single = s.FieldToPath(self.fields[i], dt=self.dt,
+                                       molecule=rotor)
+                single.solve()
+                time_single, path, states = single.export()
+                np.testing.assert_array_almost_equal(time, time_single)
+                np.testing.assert_array_almost_equal(paths[i], path)
+
+
+class test_Imports(unittest.TestCase):
+    """Testing the cost of importing the solvers."""
+
+    def test_lazy_imports(self):
+        """Importing the solvers and the noise analyser does not load
+        scipy, tqdm or joblib before they are needed.
+
+        """
+        modules = join(dirname(dirname(abspath(__file__))), "modules")
+        script = ("import sys; sys.path.append(" + repr(modules) + "); "
+                  "import noiseAnalyzer, dataContainer; "
+                  "print(sorted(m for m in ('scipy','tqdm','joblib') "
+                  "if m in sys.modules))")
+        out = subprocess.check_output([sys.executable, '-c', script])
+        self.assertEqual(out.decode().strip(), '[]')
+
+
 if __name__ == '__main__':
     unittest.main()
         
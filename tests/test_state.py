@@ -88,6 +88,20 @@ class test_State(unittest.TestCase):
     	expected_result = bra@f.cosphi(const.m)@ket
     	np.testing.assert_array_equal(expectation,expected_result)
 
+    def test_update(self):
+        """Test the state is updated without a new object or instance 
+        dictionary.
+
+        """
+
+        state = State(const.m)
+        value = np.ones(2*const.m+1, dtype=complex)
+        state.update(value)
+        self.assertIs(state.value, value)
+        self.assertFalse(hasattr(state, '__dict__'))
+        self.assertTrue(np.shares_memory(state.as_ket(), value))
+        self.assertAlmostEqual(state.get_expt(np.eye(2*const.m+1)), 2*const.m+1)
+
 
 
 if __name__ == '__main__':
@@ -34,6 +34,17 @@ class test_Transform(unittest.TestCase):
         diff = new_path[:,0]-verify_path[:,0]
         test = diff < 1e-6
         self.assertEqual(True, np.all(test))
+
+    def test_return_time(self):
+        """Test the time grid returned with the transformed path"""
+        t = np.linspace(0, 2*np.pi, 200)
+        rawtrack = 0.2*np.stack((np.cos(t), np.sin(t)), axis=1)
+        new_path, dt = transform_path(rawtrack)
+        new_path_t, dt_t, time = transform_path(rawtrack, return_time=True)
+        np.testing.assert_array_equal(new_path_t, new_path)
+        self.assertEqual(dt_t, dt)
+        self.assertEqual(time.shape, (len(new_path),))
+        np.testing.assert_array_almost_equal(np.diff(time), dt)
          
 if __name__ == '__main__':
     unittest.main()